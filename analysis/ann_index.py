@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Approximate nearest-neighbour index over spore amplitudes — Eidolon Mesh
+=========================================================================
+IVF (inverted file) index for top-k cosine queries in the centred protein
+space used by lens_geometry.py (amplitudes minus barycenter, unit-normalised).
+
+Build: spherical k-means splits the unit directions into `nlist` cells; each
+cell's vectors are stored contiguously (float32) so a probe is one small
+matmul. Query: score the query against the cell centroids, scan the
+`nprobe` best cells exactly, keep top-k with argpartition.
+
+Lens vectors from docs/data/lens_vectors.json are directions in this same
+space and can be searched as-is; a protein's raw amplitude vector goes
+through search_amplitudes() (barycenter is subtracted first).
+
+Usage: py -3 analysis/ann_index.py [--store PATH | --spores PATH]
+                                   [--nlist N] [--eval] [--output PATH]
+"""
+
+import argparse
+import os
+import time
+
+import numpy as np
+
+from lens_geometry import (SPORE_DIR, build_matrix, center_and_normalize,
+                           load_spores, load_store, top_k_cosines)
+
+# ── Config ────────────────────────────────────────────────────────────────────
+
+ANN_PATH = os.path.join(os.path.dirname(__file__), '..', 'docs', 'data', 'ann-ivf.npz')
+ANN_VERSION = 1
+KMEANS_ITERS = 20
+NPROBE_DEFAULT = 8
+EVAL_QUERIES = 500
+EVAL_K = 20
+
+
+def default_nlist(n: int) -> int:
+    """About sqrt(N) cells, so a cell holds ~sqrt(N) spores."""
+    return max(1, int(round(np.sqrt(n))))
+
+
+def _unit_rows(X: np.ndarray) -> np.ndarray:
+    X = np.atleast_2d(X)
+    return X / np.maximum(np.linalg.norm(X, axis=1, keepdims=True), 1e-12)
+
+
+# ── Coarse quantizer ──────────────────────────────────────────────────────────
+
+def spherical_kmeans(X: np.ndarray, k: int, n_iter: int = KMEANS_ITERS,
+                     seed: int = 0) -> tuple[np.ndarray, np.ndarray]:
+    """
+    k-means on the unit sphere (cosine similarity), k-means++ seeded.
+    Returns (unit centroids [k×d], assignment per row).
+    """
+    rng = np.random.default_rng(seed)
+    n = len(X)
+    k = min(k, n)
+    centroids = np.empty((k, X.shape[1]), dtype=X.dtype)
+    centroids[0] = X[rng.integers(n)]
+    best_sim = X @ centroids[0]
+    for c in range(1, k):
+        dist = np.maximum(1.0 - best_sim, 0.0)
+        p = dist / dist.sum() if dist.sum() > 0 else None
+        centroids[c] = X[rng.choice(n, p=p)]
+        best_sim = np.maximum(best_sim, X @ centroids[c])
+
+    assign = np.zeros(n, dtype=np.int64)
+    for it in range(n_iter):
+        new_assign = (X @ centroids.T).argmax(axis=1)
+        if it > 0 and np.array_equal(new_assign, assign):
+            break
+        assign = new_assign
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, X)
+        norms = np.linalg.norm(sums, axis=1, keepdims=True)
+        empty = norms[:, 0] < 1e-12
+        # Re-seed empty cells with the points worst served by their centroid
+        if empty.any():
+            worst = np.argsort((X * centroids[assign]).sum(axis=1))[:empty.sum()]
+            sums[empty] = X[worst]
+            norms[empty] = 1.0
+        centroids = (sums / norms).astype(X.dtype)
+    return centroids, assign
+
+
+# ── Index ─────────────────────────────────────────────────────────────────────
+
+class IVFIndex:
+    """Inverted-file cosine index; rows refer to the build matrix order."""
+
+    def __init__(self, centroids, offsets, rows, vectors, ids, barycenter):
+        self.centroids = centroids      # (nlist, d) float32 unit
+        self.offsets = offsets          # (nlist + 1,) CSR offsets into rows/vectors
+        self.rows = rows                # (N,) original row of each stored vector
+        self.vectors = vectors          # (N, d) float32 unit, grouped by cell
+        self.ids = ids                  # (N,) spore ids in original row order
+        self.barycenter = barycenter    # (d,) float64
+
+    @classmethod
+    def build(cls, A: np.ndarray, ids: list[str], nlist: int | None = None,
+              seed: int = 0) -> 'IVFIndex':
+        """Build from an N×200 amplitude matrix."""
+        unit_dirs, bary = center_and_normalize(A)
+        X = unit_dirs.astype(np.float32)
+        nlist = nlist or default_nlist(len(X))
+        centroids, assign = spherical_kmeans(X, nlist, seed=seed)
+        order = np.argsort(assign, kind='stable')
+        counts = np.bincount(assign, minlength=len(centroids))
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+        return cls(centroids, offsets, order.astype(np.int64), X[order],
+                   np.asarray(ids), bary)
+
+    @property
+    def nlist(self) -> int:
+        return len(self.centroids)
+
+    def probe(self, Q: np.ndarray, nprobe: int) -> np.ndarray:
+        """The nprobe best cells for each (unit) query row: (Q×nprobe)."""
+        nprobe = min(nprobe, self.nlist)
+        cell_scores = Q @ self.centroids.T
+        return np.argpartition(-cell_scores, nprobe - 1, axis=1)[:, :nprobe]
+
+    def search(self, queries: np.ndarray, k: int = EVAL_K,
+               nprobe: int = NPROBE_DEFAULT) -> tuple[np.ndarray, np.ndarray]:
+        """
+        Top-k cosine search for direction vectors (Q×d or d).
+        Returns (cosines [Q×k], rows [Q×k]) best-first; rows index the build
+        matrix (-1 / -inf padding if fewer than k candidates were probed).
+        """
+        Q = _unit_rows(np.asarray(queries, dtype=np.float32))
+        probes = self.probe(Q, nprobe)
+
+        out_cos = np.full((len(Q), k), -np.inf, dtype=np.float32)
+        out_rows = np.full((len(Q), k), -1, dtype=np.int64)
+        for qi, q in enumerate(Q):
+            spans = [np.arange(self.offsets[c], self.offsets[c + 1]) for c in probes[qi]]
+            cand = np.concatenate(spans)
+            if not len(cand):
+                continue
+            cos = self.vectors[cand] @ q
+            kk = min(k, len(cand))
+            top = np.argpartition(-cos, kk - 1)[:kk]
+            top = top[np.argsort(-cos[top])]
+            out_cos[qi, :kk] = cos[top]
+            out_rows[qi, :kk] = self.rows[cand[top]]
+        return out_cos, out_rows
+
+    def search_amplitudes(self, amps: np.ndarray, k: int = EVAL_K,
+                          nprobe: int = NPROBE_DEFAULT) -> tuple[np.ndarray, np.ndarray]:
+        """search() for raw amplitude vectors (barycenter subtracted first)."""
+        return self.search(np.atleast_2d(amps) - self.barycenter, k, nprobe)
+
+    def save(self, path: str = ANN_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        np.savez(path, version=ANN_VERSION, centroids=self.centroids,
+                 offsets=self.offsets, rows=self.rows, vectors=self.vectors,
+                 ids=self.ids, barycenter=self.barycenter)
+
+    @classmethod
+    def load(cls, path: str = ANN_PATH) -> 'IVFIndex':
+        with np.load(path) as data:
+            if int(data['version']) != ANN_VERSION:
+                raise ValueError(f'{path}: unsupported ANN index version {int(data["version"])}')
+            return cls(data['centroids'], data['offsets'], data['rows'],
+                       data['vectors'], data['ids'], data['barycenter'])
+
+
+# ── Exact baseline and recall ─────────────────────────────────────────────────
+
+def exact_search(unit_dirs: np.ndarray, queries: np.ndarray, k: int = EVAL_K
+                 ) -> tuple[np.ndarray, np.ndarray]:
+    """Brute-force top-k cosine (the scan the index replaces)."""
+    return top_k_cosines(queries, unit_dirs, k)
+
+
+def recall_at_k(index: IVFIndex, unit_dirs: np.ndarray, queries: np.ndarray,
+                k: int = EVAL_K, nprobes: tuple[int, ...] = (1, 2, 4, 8, 16, 32)
+                ) -> list[dict]:
+    """
+    recall@k of the index against exact search for each nprobe, with
+    queries/second for both. Returns one dict per nprobe.
+    """
+    t0 = time.perf_counter()
+    _, truth = exact_search(unit_dirs, queries, k)
+    exact_qps = len(queries) / max(time.perf_counter() - t0, 1e-9)
+    results = []
+    for nprobe in nprobes:
+        if nprobe > index.nlist:
+            break
+        t0 = time.perf_counter()
+        _, rows = index.search(queries, k, nprobe)
+        qps = len(queries) / max(time.perf_counter() - t0, 1e-9)
+        hits = sum(len(np.intersect1d(r, t)) for r, t in zip(rows, truth))
+        sizes = np.diff(index.offsets)
+        probes = index.probe(_unit_rows(queries.astype(np.float32)), nprobe)
+        results.append({
+            'nprobe': nprobe,
+            'recall_at_k': hits / (k * len(queries)),
+            'scanned_fraction': float(sizes[probes].sum(axis=1).mean() / len(unit_dirs)),
+            'qps': qps,
+            'exact_qps': exact_qps,
+        })
+    return results
+
+
+def eval_queries(unit_dirs: np.ndarray, n: int = EVAL_QUERIES, seed: int = 1
+                 ) -> np.ndarray:
+    """Half perturbed spore directions (in-distribution), half random directions."""
+    rng = np.random.default_rng(seed)
+    half = n // 2
+    near = unit_dirs[rng.integers(len(unit_dirs), size=half)]
+    near = near + 0.3 * rng.standard_normal(near.shape) / np.sqrt(unit_dirs.shape[1])
+    rand = rng.standard_normal((n - half, unit_dirs.shape[1]))
+    return np.vstack([near, rand])
+
+
+# ── Main ──────────────────────────────────────────────────────────────────────
+
+def main():
+    parser = argparse.ArgumentParser(description='Build / evaluate the IVF ANN index')
+    parser.add_argument('--spores', default=SPORE_DIR)
+    parser.add_argument('--store', default=None,
+                        help='Load from a packed spore store instead of JSON files')
+    parser.add_argument('--nlist', type=int, default=None,
+                        help='Number of IVF cells (default: ~sqrt(N))')
+    parser.add_argument('--output', default=ANN_PATH)
+    parser.add_argument('--eval', action='store_true',
+                        help='Report recall@k vs exact search for several nprobe')
+    parser.add_argument('--k', type=int, default=EVAL_K)
+    args = parser.parse_args()
+
+    if args.store:
+        spores, A = load_store(args.store)
+    else:
+        spores = load_spores(args.spores)
+        A = build_matrix(spores)
+
+    t0 = time.perf_counter()
+    index = IVFIndex.build(A, [s['id'] for s in spores], args.nlist)
+    sizes = np.diff(index.offsets)
+    print(f'Built IVF index: {len(A)} spores, {index.nlist} cells '
+          f'(size min/median/max {sizes.min()}/{int(np.median(sizes))}/{sizes.max()}) '
+          f'in {time.perf_counter() - t0:.2f}s')
+    index.save(args.output)
+    print(f'  Saved: {args.output} ({os.path.getsize(args.output):,} bytes)')
+
+    if args.eval:
+        unit_dirs, _ = center_and_normalize(A)
+        queries = eval_queries(unit_dirs)
+        print(f'\n  recall@{args.k} vs exact scan ({len(queries)} queries):')
+        for r in recall_at_k(index, unit_dirs.astype(np.float32), queries, args.k):
+            print(f"    nprobe={r['nprobe']:3d}  recall={r['recall_at_k']:.3f}  "
+                  f"scanned={r['scanned_fraction']*100:5.1f}%  "
+                  f"{r['qps']:8.0f} q/s  (exact {r['exact_qps']:.0f} q/s)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,368 @@
+#!/usr/bin/env python3
+"""
+Basin clustering of the protein field — Eidolon Mesh
+=====================================================
+Partition the spores into semantic basins by mini-batch k-means over their
+delta-PCA coefficients: amplitudes minus the delta-basis barycenter,
+projected on its leading `--modes` eigenvectors (docs/data/delta-basis.json,
+the basis the tier indexes are encoded in; a PCA of the loaded spores if it
+is missing or does not match).
+
+Fitting: k-means++ seeds on a sample, then mini-batch updates (each batch
+is assigned with one matmul and moves every centroid towards its batch
+mean by 1/count), stopping once an epoch moves the centroids by less than
+--tol. A final full pass assigns every spore (blocked, in a thread pool;
+BLAS releases the GIL) and sets each centroid to its members' exact mean.
+Cost is O(N·k·modes) per pass, so 100k spores fit in seconds.
+
+Output:
+  docs/data/basins.npz   centroids (k×modes), barycenter, components
+                         (modes×200), labels / sqdist per spore, ids,
+                         basis_hash, version
+  docs/data/basins.json  per basin: size, dominant semantic tags, tiers,
+                         spores nearest the centroid
+
+New spores are placed with Basins.assign_amplitudes() (or --assign) against
+the saved centroids without refitting. Basins.route() returns the basins
+nearest a query, the first stage of a cluster-routed search.
+
+Usage: py -3 analysis/basins.py [--store PATH | --spores PATH] [--k 64]
+                                [--modes 32] [--batch 4096] [--workers W]
+                                [--assign] [--output PATH]
+"""
+
+import argparse
+import json
+import os
+import time
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from lens_geometry import (SPORE_DIR, TOP_K_TAGS, build_matrix, build_tag_index,
+                           is_system_tag, load_spores, load_store)
+
+# ── Config ────────────────────────────────────────────────────────────────────
+
+DATA_DIR = os.path.join(os.path.dirname(__file__), '..', 'docs', 'data')
+BASINS_PATH = os.path.join(DATA_DIR, 'basins.npz')
+BASIS_PATH = os.path.join(DATA_DIR, 'delta-basis.json')
+BASINS_VERSION = 1
+K_DEFAULT = 64
+MODES_DEFAULT = 32         # tier-1 modes
+BATCH_DEFAULT = 4096
+MAX_EPOCHS = 20
+TOL_DEFAULT = 1e-4         # centroid shift per epoch, relative to the data variance
+INIT_SAMPLE = 32           # k-means++ seeds from up to INIT_SAMPLE × k spores
+ASSIGN_ROWS = 16384        # spores per block of the full assignment pass
+EXEMPLARS = 5
+
+
+def load_basis(path: str = BASIS_PATH, n_dims: int | None = None
+               ) -> dict | None:
+    """The delta-basis document, or None if missing or of another dimension."""
+    try:
+        with open(path) as f:
+            basis = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if n_dims is not None and len(basis.get('barycenter', ())) != n_dims:
+        return None
+    return basis
+
+
+def local_basis(A: np.ndarray, modes: int) -> dict:
+    """Delta-basis-shaped PCA of the loaded amplitudes (when no basis file fits)."""
+    bary = A.mean(axis=0)
+    _, _, Vt = np.linalg.svd(A - bary, full_matrices=False)
+    return {'barycenter': bary, 'eigenvectors': Vt[:modes], 'basis_hash': ''}
+
+
+# ── Mini-batch k-means ────────────────────────────────────────────────────────
+
+def sq_distances(X: np.ndarray, C: np.ndarray, c_sq: np.ndarray | None = None
+                 ) -> np.ndarray:
+    """Squared Euclidean distances (rows × centroids) via one matmul."""
+    c_sq = (C * C).sum(axis=1) if c_sq is None else c_sq
+    D = X @ C.T
+    D *= -2
+    D += c_sq
+    D += (X * X).sum(axis=1, keepdims=True)
+    return np.maximum(D, 0, out=D)
+
+
+def nearest(X: np.ndarray, C: np.ndarray, c_sq: np.ndarray | None = None
+            ) -> tuple[np.ndarray, np.ndarray]:
+    """(label, squared distance) of each row's nearest centroid."""
+    D = sq_distances(X, C, c_sq)
+    labels = D.argmin(axis=1)
+    return labels, D[np.arange(len(X)), labels]
+
+
+def kmeans_plusplus(X: np.ndarray, k: int, rng: np.random.Generator) -> np.ndarray:
+    """k-means++ seeding: each new centroid drawn with probability ∝ D²."""
+    n = len(X)
+    C = np.empty((k, X.shape[1]), dtype=X.dtype)
+    C[0] = X[rng.integers(n)]
+    best = sq_distances(X, C[:1])[:, 0]
+    for c in range(1, k):
+        total = best.sum()
+        C[c] = X[rng.choice(n, p=best / total) if total > 0 else rng.integers(n)]
+        best = np.minimum(best, sq_distances(X, C[c:c + 1])[:, 0])
+    return C
+
+
+def minibatch_kmeans(X: np.ndarray, k: int, batch: int = BATCH_DEFAULT,
+                     max_epochs: int = MAX_EPOCHS, tol: float = TOL_DEFAULT,
+                     seed: int = 0) -> tuple[np.ndarray, dict]:
+    """
+    Mini-batch k-means (Sculley 2010) on the rows of X.
+    Returns (centroids [k×d], stats).
+    """
+    rng = np.random.default_rng(seed)
+    n = len(X)
+    k = min(k, n)
+    batch = min(batch, n)
+    sample = X[rng.choice(n, size=min(n, INIT_SAMPLE * k), replace=False)]
+    C = kmeans_plusplus(sample, k, rng)
+    counts = np.zeros(k)
+    scale = float(X[:batch].var(axis=0).sum()) or 1.0
+    steps_per_epoch = -(-n // batch)
+    epochs, shift = 0, np.inf
+    for epochs in range(1, max_epochs + 1):
+        start = C.copy()
+        for _ in range(steps_per_epoch):
+            B = X[rng.integers(n, size=batch)]
+            labels, _ = nearest(B, C)
+            m = np.bincount(labels, minlength=k)
+            hit = m > 0
+            sums = np.zeros_like(C)
+            np.add.at(sums, labels, B)
+            counts[hit] += m[hit]
+            # c += (Σ batch members − m·c) / total count
+            C[hit] += (sums[hit] - m[hit, None] * C[hit]) / counts[hit, None]
+        shift = float(((C - start) ** 2).sum(axis=1).mean() / scale)
+        if shift < tol:
+            break
+    return C, {'epochs': epochs, 'steps': epochs * steps_per_epoch, 'batch': batch,
+               'last_shift': shift}
+
+
+def assign_blocks(X: np.ndarray, C: np.ndarray, workers: int | None = None,
+                  rows: int = ASSIGN_ROWS) -> tuple[np.ndarray, np.ndarray]:
+    """nearest() over all rows, in blocks spread across a thread pool."""
+    workers = workers or os.cpu_count() or 1
+    c_sq = (C * C).sum(axis=1)
+    labels = np.empty(len(X), dtype=np.int32)
+    sqdist = np.empty(len(X), dtype=np.float32)
+
+    def job(lo):
+        labels[lo:lo + rows], sqdist[lo:lo + rows] = nearest(X[lo:lo + rows], C, c_sq)
+
+    starts = range(0, len(X), rows)
+    if workers > 1 and len(starts) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            list(pool.map(job, starts))
+    else:
+        for lo in starts:
+            job(lo)
+    return labels, sqdist
+
+
+def member_means(X: np.ndarray, labels: np.ndarray, C: np.ndarray) -> np.ndarray:
+    """Exact mean of each basin's members (empty basins keep their centroid)."""
+    order = np.argsort(labels, kind='stable')
+    counts = np.bincount(labels, minlength=len(C))
+    heads = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    out = C.copy()
+    full = counts > 0
+    out[full] = np.add.reduceat(X[order], heads[full], axis=0) / counts[full, None]
+    return out
+
+
+# ── Model ─────────────────────────────────────────────────────────────────────
+
+class Basins:
+    """Basin centroids in delta-PCA coefficient space plus the spores' labels."""
+
+    def __init__(self, centroids, barycenter, components, labels, sqdist, ids,
+                 basis_hash=''):
+        self.centroids = centroids      # (k, modes) float32
+        self.barycenter = barycenter    # (200,) float64
+        self.components = components    # (modes, 200) float32
+        self.labels = labels            # (N,) int32 basin of each spore
+        self.sqdist = sqdist            # (N,) float32 squared distance to it
+        self.ids = ids                  # (N,) spore ids
+        self.basis_hash = basis_hash
+
+    @classmethod
+    def fit(cls, A: np.ndarray, ids, basis: dict, k: int = K_DEFAULT,
+            modes: int = MODES_DEFAULT, batch: int = BATCH_DEFAULT,
+            tol: float = TOL_DEFAULT, workers: int | None = None,
+            seed: int = 0) -> tuple['Basins', dict]:
+        """Fit on an N×200 amplitude matrix; returns (model, stats)."""
+        t0 = time.perf_counter()
+        components = np.asarray(basis['eigenvectors'][:modes], dtype=np.float32)
+        model = cls(None, np.asarray(basis['barycenter'], dtype=np.float64), components,
+                    None, None, np.asarray(ids), basis.get('basis_hash', ''))
+        X = model.coefficients(A)
+        C, stats = minibatch_kmeans(X, k, batch, tol=tol, seed=seed)
+        labels, _ = assign_blocks(X, C, workers)
+        model.centroids = member_means(X, labels, C)
+        model.labels, model.sqdist = assign_blocks(X, model.centroids, workers)
+        seconds = time.perf_counter() - t0
+        stats.update({'spores': len(X), 'k': len(C), 'modes': components.shape[0],
+                      'inertia': float(model.sqdist.sum(dtype=np.float64)),
+                      'seconds': seconds, 'spores_per_second': len(X) / max(seconds, 1e-9)})
+        return model, stats
+
+    def __len__(self) -> int:
+        return len(self.centroids)
+
+    @property
+    def sizes(self) -> np.ndarray:
+        return np.bincount(self.labels, minlength=len(self.centroids))
+
+    def coefficients(self, A: np.ndarray) -> np.ndarray:
+        """Delta-PCA coefficients (N×modes float32) of raw amplitude rows."""
+        A = np.atleast_2d(A)
+        return ((A - self.barycenter).astype(np.float32)) @ self.components.T
+
+    def assign_amplitudes(self, A: np.ndarray, workers: int | None = None
+                          ) -> tuple[np.ndarray, np.ndarray]:
+        """(basin, squared distance) for raw amplitude rows, without refitting."""
+        return assign_blocks(self.coefficients(A), self.centroids, workers)
+
+    def route(self, amps: np.ndarray, n_basins: int = 4) -> np.ndarray:
+        """The n_basins basins nearest each amplitude row (Q×n_basins), nearest first."""
+        D = sq_distances(self.coefficients(amps), self.centroids)
+        n_basins = min(n_basins, len(self.centroids))
+        top = np.argpartition(D, n_basins - 1, axis=1)[:, :n_basins]
+        return np.take_along_axis(top, np.argsort(np.take_along_axis(D, top, 1), axis=1), 1)
+
+    def members(self, basin: int) -> np.ndarray:
+        """Rows (into ids) of one basin's spores."""
+        return np.flatnonzero(self.labels == basin)
+
+    def save(self, path: str = BASINS_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        np.savez(path, version=BASINS_VERSION, centroids=self.centroids,
+                 barycenter=self.barycenter, components=self.components,
+                 labels=self.labels, sqdist=self.sqdist, ids=self.ids,
+                 basis_hash=self.basis_hash)
+
+    @classmethod
+    def load(cls, path: str = BASINS_PATH) -> 'Basins':
+        with np.load(path) as data:
+            if int(data['version']) != BASINS_VERSION:
+                raise ValueError(f'{path}: unsupported basins version {int(data["version"])}')
+            return cls(data['centroids'], data['barycenter'], data['components'],
+                       data['labels'], data['sqdist'], data['ids'], str(data['basis_hash']))
+
+
+# ── Summary ───────────────────────────────────────────────────────────────────
+
+def basin_summary(model: Basins, spores: list[dict], top_n: int = TOP_K_TAGS) -> dict:
+    """
+    The basins.json document: per basin its size, dominant semantic tags
+    (system tags dropped, as semantic_tags does), tiers and the spores
+    nearest its centroid. Rows of spores follow model.ids.
+    """
+    tag_index = build_tag_index(spores)
+    order = np.lexsort((model.sqdist, model.labels))
+    sizes = model.sizes
+    heads = np.concatenate([[0], np.cumsum(sizes)])
+    basins = []
+    for b in np.argsort(-sizes, kind='stable'):
+        rows = order[heads[b]:heads[b + 1]]
+        basins.append({
+            'basin': int(b),
+            'size': int(sizes[b]),
+            'top_tags': tag_index.tag_counts(rows, exclude=is_system_tag, top_n=top_n),
+            'tiers': Counter(spores[r].get('tier', 'unknown') for r in rows),
+            'rms_distance': float(np.sqrt(model.sqdist[rows].mean())) if len(rows) else 0.0,
+            'exemplars': [spores[r]['id'] for r in rows[:EXEMPLARS]],
+        })
+    return {
+        'version': BASINS_VERSION,
+        'basis_hash': model.basis_hash,
+        'k': len(model),
+        'modes': int(model.components.shape[0]),
+        'spore_count': len(model.labels),
+        'inertia': float(model.sqdist.sum(dtype=np.float64)),
+        'basins': basins,
+    }
+
+
+def save_summary(summary: dict, path: str):
+    with open(path, 'w') as f:
+        json.dump(summary, f, indent=1)
+
+
+# ── Main ──────────────────────────────────────────────────────────────────────
+
+def main():
+    parser = argparse.ArgumentParser(description='Fit / apply semantic basin clustering')
+    parser.add_argument('--spores', default=SPORE_DIR)
+    parser.add_argument('--store', default=None,
+                        help='Load from a packed spore store instead of JSON files')
+    parser.add_argument('--k', type=int, default=K_DEFAULT, help='Number of basins')
+    parser.add_argument('--modes', type=int, default=MODES_DEFAULT,
+                        help='Delta-PCA modes clustered on')
+    parser.add_argument('--batch', type=int, default=BATCH_DEFAULT)
+    parser.add_argument('--tol', type=float, default=TOL_DEFAULT)
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Threads for the full assignment pass (default: all cores)')
+    parser.add_argument('--basis', default=BASIS_PATH,
+                        help='Delta-basis to project on (PCA of the spores if unusable)')
+    parser.add_argument('--assign', action='store_true',
+                        help='Assign the spores to the saved basins instead of refitting')
+    parser.add_argument('--output', default=BASINS_PATH)
+    args = parser.parse_args()
+
+    if args.store:
+        spores, A = load_store(args.store)
+    else:
+        spores = load_spores(args.spores)
+        A = build_matrix(spores)
+    ids = [s['id'] for s in spores]
+
+    if args.assign:
+        model = Basins.load(args.output)
+        known = set(model.ids.tolist())
+        t0 = time.perf_counter()
+        previous = dict(zip(model.ids.tolist(), model.labels.tolist()))
+        model.labels, model.sqdist = model.assign_amplitudes(A, args.workers)
+        model.ids = np.asarray(ids)
+        moved = sum(previous[i] != l for i, l in zip(ids, model.labels.tolist()) if i in previous)
+        print(f'Assigned {len(ids)} spores to {len(model)} saved basins in '
+              f'{time.perf_counter() - t0:.2f}s: {sum(i not in known for i in ids)} new, '
+              f'{moved} moved, {len(known - set(ids))} gone')
+    else:
+        basis = load_basis(args.basis, A.shape[1])
+        if basis is None or len(basis['eigenvectors']) < args.modes:
+            print(f'No usable delta-basis at {args.basis}; using a PCA of the loaded spores')
+            basis = local_basis(A, args.modes)
+        model, stats = Basins.fit(A, ids, basis, args.k, args.modes, args.batch, args.tol,
+                                  args.workers)
+        sizes = model.sizes
+        print(f"Fitted {stats['k']} basins on {stats['spores']} spores × {stats['modes']} modes "
+              f"in {stats['seconds']:.2f}s ({stats['spores_per_second']:,.0f} spores/s; "
+              f"{stats['epochs']} epochs of {stats['steps'] // stats['epochs']} batches)")
+        print(f"  Basin size min/median/max {sizes.min()}/{int(np.median(sizes))}/{sizes.max()}, "
+              f"inertia {stats['inertia']:.4g}")
+
+    model.save(args.output)
+    print(f'  Saved: {args.output} ({os.path.getsize(args.output):,} bytes)')
+    summary = basin_summary(model, spores)
+    summary_path = os.path.splitext(args.output)[0] + '.json'
+    save_summary(summary, summary_path)
+    print(f'  Saved: {summary_path}')
+    for b in summary['basins'][:5]:
+        print(f"    basin {b['basin']:3d}  {b['size']:6d} spores  "
+              f"{', '.join(t for t, _ in b['top_tags'][:5])}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+Global connectome builder — Eidolon Mesh
+========================================
+Materialise the spore-to-spore graph: every spore's top-k cosine
+neighbours in the centred protein space of lens_geometry.py (amplitudes
+minus barycenter, unit-normalised by center_and_normalize).
+
+The all-pairs scan is tiled: a block of rows is scored against the whole
+matrix with one float32 matmul, reduced to its top-k with argpartition and
+dropped, so memory is bounded by the block (sized from --block-mb) and the
+full N×N similarity matrix never exists. Blocks run in a thread pool; BLAS
+and argpartition release the GIL.
+
+Output (docs/data/connectome.npz) is a CSR graph, rows in `ids` order:
+  indptr   int64 (N+1)   row i's edges are indptr[i]:indptr[i+1]
+  indices  int32         neighbour rows, best first
+  weights  float16       cosine similarity of each edge
+  vectors  float32 (N×d) the unit directions the graph was scored on
+  ids, barycenter, k, churn, version
+
+With --update the saved graph is patched instead of rebuilt: spores that
+are new or whose amplitudes changed are scored against the stored vectors
+(one matmul per batch), take their top-k, and enter the lists of existing
+spores they now outrank; spores that are gone are dropped and only the
+spores that pointed at them are rescored. The work is proportional to the
+batch (batch × N pairs), not to N². New spores are centred on the stored
+barycenter; `churn` counts spores added, changed or removed since the last
+full build, and a full rebuild is advised once it passes REBUILD_CHURN of
+the graph.
+
+Usage: py -3 analysis/connectome.py [--store PATH | --spores PATH]
+                                    [--k 16] [--workers W] [--block-mb 256]
+                                    [--update] [--output PATH]
+"""
+
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+
+from lens_geometry import (SPORE_DIR, build_matrix, center_and_normalize,
+                           load_spores, load_store)
+
+# ── Config ────────────────────────────────────────────────────────────────────
+
+CONNECTOME_PATH = os.path.join(os.path.dirname(__file__), '..', 'docs', 'data',
+                               'connectome.npz')
+CONNECTOME_VERSION = 2
+K_DEFAULT = 16
+BLOCK_MB_DEFAULT = 256     # similarity tiles in flight, across all workers
+MAX_BLOCK_ROWS = 4096
+TILE_BYTES = 12            # per scored pair: float32 tile + int64 argpartition result
+REBUILD_CHURN = 0.05       # changed fraction since the last build that calls for a rebuild
+CHANGED_TOL = 1e-5         # max |Δ| of a unit direction still treated as unchanged
+
+
+def block_rows(n: int, workers: int, block_mb: float = BLOCK_MB_DEFAULT) -> int:
+    """Rows per tile so that `workers` (rows × n) tiles fit in block_mb."""
+    rows = int(block_mb * 2 ** 20 / (TILE_BYTES * max(n, 1) * max(workers, 1)))
+    return max(1, min(rows, MAX_BLOCK_ROWS, n))
+
+
+def knn_block(X: np.ndarray, lo: int, hi: int, k: int,
+              Y: np.ndarray | None = None, exclude_self: bool = True
+              ) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Top-k neighbours of rows lo:hi of X among the rows of Y (default X).
+    Returns (indices [b×k] int32, cosines [b×k] float32) best first.
+    """
+    Y = X if Y is None else Y
+    self_rows = np.arange(lo, hi) if exclude_self else None
+    return knn_rows(X[lo:hi] @ Y.T, k, self_rows)
+
+
+def knn_rows(S: np.ndarray, k: int, self_rows: np.ndarray | None = None
+             ) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Top-k columns of each row of a (b×n) similarity tile, best first; row i
+    never picks column self_rows[i]. Overwrites S.
+    """
+    np.negative(S, out=S)                                    # in place: smallest first
+    if self_rows is not None:
+        S[np.arange(len(S)), self_rows] = np.inf
+    top = np.argpartition(S, k - 1, axis=1)[:, :k]
+    vals = np.take_along_axis(S, top, axis=1)
+    order = np.argsort(vals, axis=1)
+    return (np.take_along_axis(top, order, axis=1).astype(np.int32),
+            -np.take_along_axis(vals, order, axis=1))
+
+
+# ── Graph ─────────────────────────────────────────────────────────────────────
+
+class Connectome:
+    """Directed top-k cosine graph over spores in CSR form."""
+
+    def __init__(self, indptr, indices, weights, ids, barycenter, k, vectors, churn=0):
+        self.indptr = indptr            # (N + 1,) int64
+        self.indices = indices          # (E,) int32 neighbour rows
+        self.weights = weights          # (E,) float16 cosines
+        self.ids = ids                  # (N,) spore ids
+        self.barycenter = barycenter    # (d,) float64
+        self.k = k
+        self.vectors = vectors          # (N, d) float32 unit directions
+        self.churn = churn              # spores changed since the last full build
+        self._row_of = None
+
+    @classmethod
+    def build(cls, unit_dirs: np.ndarray, ids, barycenter: np.ndarray,
+              k: int = K_DEFAULT, workers: int | None = None,
+              block_mb: float = BLOCK_MB_DEFAULT,
+              progress=None) -> tuple['Connectome', dict]:
+        """
+        Build from the N×d unit direction matrix (center_and_normalize).
+        Returns (graph, stats) with wall time and pairs scored per second.
+        """
+        X = np.ascontiguousarray(unit_dirs, dtype=np.float32)
+        n = len(X)
+        k = max(0, min(k, n - 1))
+        workers = workers or os.cpu_count() or 1
+        rows = block_rows(n, workers, block_mb)
+        indices = np.empty((n, k), dtype=np.int32)
+        weights = np.empty((n, k), dtype=np.float16)
+
+        def job(lo):
+            hi = min(lo + rows, n)
+            idx, vals = knn_block(X, lo, hi, k)
+            indices[lo:hi] = idx
+            weights[lo:hi] = vals
+            return hi - lo
+
+        t0 = time.perf_counter()
+        done = 0
+        if k:
+            with ThreadPoolExecutor(max_workers=workers) as pool:
+                for m in pool.map(job, range(0, n, rows)):
+                    done += m
+                    if progress is not None:
+                        progress(done, n)
+        secs = time.perf_counter() - t0
+        stats = {'spores': n, 'k': k, 'workers': workers, 'block_rows': rows,
+                 'seconds': secs, 'pairs_per_second': n * n / max(secs, 1e-9),
+                 'edges': n * k}
+        indptr = np.arange(n + 1, dtype=np.int64) * k
+        return cls(indptr, indices.ravel(), weights.ravel(), np.asarray(ids),
+                   np.asarray(barycenter, dtype=np.float64), k, X), stats
+
+    def __len__(self) -> int:
+        return len(self.indptr) - 1
+
+    @property
+    def n_edges(self) -> int:
+        return int(self.indptr[-1])
+
+    def row_of(self, spore_id: str) -> int:
+        if self._row_of is None:
+            self._row_of = {sid: i for i, sid in enumerate(self.ids.tolist())}
+        return self._row_of[spore_id]
+
+    def neighbours(self, row: int) -> tuple[np.ndarray, np.ndarray]:
+        """(neighbour rows, cosines) of one spore, best first."""
+        a, b = self.indptr[row], self.indptr[row + 1]
+        return self.indices[a:b], self.weights[a:b].astype(np.float32)
+
+    def neighbours_of(self, spore_id: str) -> list[tuple[str, float]]:
+        rows, cos = self.neighbours(self.row_of(spore_id))
+        return [(str(self.ids[r]), float(c)) for r, c in zip(rows, cos)]
+
+    def save(self, path: str = CONNECTOME_PATH):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        np.savez(path, version=CONNECTOME_VERSION, indptr=self.indptr,
+                 indices=self.indices, weights=self.weights, ids=self.ids,
+                 barycenter=self.barycenter, k=self.k, vectors=self.vectors,
+                 churn=self.churn)
+
+    @classmethod
+    def load(cls, path: str = CONNECTOME_PATH) -> 'Connectome':
+        with np.load(path) as data:
+            if int(data['version']) != CONNECTOME_VERSION:
+                raise ValueError(f'{path}: unsupported connectome version {int(data["version"])}')
+            return cls(data['indptr'], data['indices'], data['weights'], data['ids'],
+                       data['barycenter'], int(data['k']), data['vectors'], int(data['churn']))
+
+    def directions(self, A: np.ndarray) -> np.ndarray:
+        """Unit directions of amplitude rows, centred on the graph's barycenter."""
+        D = np.atleast_2d(A) - self.barycenter
+        norms = np.linalg.norm(D, axis=1, keepdims=True)
+        return (D / np.where(norms < 1e-10, 1.0, norms)).astype(np.float32)
+
+    def update(self, A: np.ndarray, ids, workers: int | None = None,
+               block_mb: float = BLOCK_MB_DEFAULT) -> tuple['Connectome', dict]:
+        """
+        Patch the graph to the current spores (N×d amplitudes + ids): drop
+        spores that are gone, (re)insert new and changed ones. Returns
+        (new graph, stats); kept spores stay in their old order, inserted
+        ones follow.
+        """
+        t0 = time.perf_counter()
+        k = self.k
+        U = self.directions(A)
+        cur = {sid: i for i, sid in enumerate(ids)}
+        old_ids = self.ids.tolist()
+        at = np.array([cur.get(sid, -1) for sid in old_ids], dtype=np.int64)
+        keep = at >= 0
+        keep[keep] = np.abs(U[at[keep]] - self.vectors[keep]).max(axis=1) <= CHANGED_TOL
+        kept_ids = {old_ids[i] for i in np.flatnonzero(keep)}
+        added = np.array([i for i, sid in enumerate(ids) if sid not in kept_ids], dtype=np.int64)
+        n_kept, n = int(keep.sum()), int(keep.sum()) + len(added)
+        n_changed = int(((at >= 0) & ~keep).sum())
+        if n - 1 < k:
+            raise ValueError(f'{n} spores is too few for a k={k} graph; rebuild instead')
+
+        # Surviving lists, remapped to the new row order (-1 = edge to a dropped spore)
+        new_row = np.full(len(old_ids), -1, dtype=np.int64)
+        new_row[keep] = np.arange(n_kept)
+        old_idx = self.indices.reshape(-1, k)[keep]
+        indices = np.empty((n, k), dtype=np.int32)
+        weights = np.empty((n, k), dtype=np.float32)
+        indices[:n_kept] = new_row[old_idx]
+        weights[:n_kept] = self.weights.reshape(-1, k)[keep]
+        X = np.concatenate([self.vectors[keep], U[added]]).astype(np.float32)
+        scored = 0
+
+        # Inserted spores: top-k over everything, and every (kept j, new i)
+        # pair that may beat j's current k-th neighbour
+        workers = workers or os.cpu_count() or 1
+        rows = block_rows(n, workers, block_mb)
+        floor = weights[:n_kept, -1] - 1e-3          # float16 rounding margin
+
+        def insert(lo):
+            hi = min(lo + rows, len(added))
+            S = X[n_kept + lo:n_kept + hi] @ X.T
+            ii, jj = np.nonzero(S[:, :n_kept] > floor)
+            pairs = (jj, n_kept + lo + ii, S[ii, jj])
+            idx, vals = knn_rows(S, k, np.arange(n_kept + lo, n_kept + hi))
+            indices[n_kept + lo:n_kept + hi] = idx
+            weights[n_kept + lo:n_kept + hi] = vals
+            return pairs
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            found = list(pool.map(insert, range(0, len(added), rows)))
+        scored += len(added) * n
+
+        # Kept spores that lost a neighbour: rescore them in full
+        refill = np.flatnonzero((indices[:n_kept] < 0).any(axis=1))
+        for lo in range(0, len(refill), rows):
+            r = refill[lo:lo + rows]
+            idx, vals = knn_rows(X[r] @ X.T, k, r)
+            indices[r], weights[r] = idx, vals
+        scored += len(refill) * n
+
+        # Reverse edges: merge new candidates into the other kept lists
+        patched = 0
+        if found:
+            jj = np.concatenate([f[0] for f in found])
+            ii = np.concatenate([f[1] for f in found])
+            ss = np.concatenate([f[2] for f in found])
+            fresh = np.ones(n_kept, dtype=bool)
+            fresh[refill] = False
+            sel = fresh[jj]
+            jj, ii, ss = jj[sel], ii[sel], ss[sel]
+            order = np.argsort(jj, kind='stable')
+            jj, ii, ss = jj[order], ii[order], ss[order]
+            bounds = np.flatnonzero(np.diff(jj)) + 1
+            for group in np.split(np.arange(len(jj)), bounds):
+                if not len(group):
+                    continue
+                j = jj[group[0]]
+                cand = np.concatenate([indices[j], ii[group]])
+                # exact weights for the old entries too (stored as float16)
+                cos = X[cand] @ X[j]
+                top = np.argsort(-cos, kind='stable')[:k]
+                if not np.array_equal(cand[top], indices[j]):
+                    indices[j], weights[j] = cand[top], cos[top]
+                    patched += 1
+
+        secs = time.perf_counter() - t0
+        graph = Connectome(np.arange(n + 1, dtype=np.int64) * k, indices.ravel(),
+                           weights.astype(np.float16).ravel(),
+                           np.asarray([old_ids[i] for i in np.flatnonzero(keep)]
+                                      + [ids[i] for i in added]),
+                           self.barycenter, k, X,
+                           self.churn + len(old_ids) - n_kept + len(added) - n_changed)
+        stats = {'spores': n, 'k': k, 'kept': n_kept, 'added': len(added) - n_changed,
+                 'changed': n_changed, 'removed': len(old_ids) - n_kept - n_changed,
+                 'refilled': len(refill),
+                 'reverse_patched': patched, 'seconds': secs,
+                 'pairs_scored': scored, 'pairs_per_second': scored / max(secs, 1e-9),
+                 'churn': graph.churn}
+        return graph, stats
+
+
+def degree_stats(graph: Connectome) -> dict:
+    """In-degree spread (hubs / orphans) and mean edge cosine."""
+    in_deg = np.bincount(graph.indices, minlength=len(graph))
+    return {
+        'mean_cos': float(graph.weights.astype(np.float32).mean()) if graph.n_edges else 0.0,
+        'in_degree_max': int(in_deg.max()) if len(in_deg) else 0,
+        'orphans': int((in_deg == 0).sum()),
+        'mutual_fraction': _mutual_fraction(graph),
+    }
+
+
+def _mutual_fraction(graph: Connectome) -> float:
+    """Fraction of edges i->j whose reverse j->i is also in the graph."""
+    if not graph.n_edges:
+        return 0.0
+    n = len(graph)
+    src = np.repeat(np.arange(n, dtype=np.int64), np.diff(graph.indptr))
+    dst = graph.indices.astype(np.int64)
+    fwd = np.sort(src * n + dst)
+    rev = dst * n + src
+    pos = np.searchsorted(fwd, rev)
+    pos[pos == len(fwd)] = 0
+    return float((fwd[pos] == rev).mean())
+
+
+# ── Main ──────────────────────────────────────────────────────────────────────
+
+def main():
+    parser = argparse.ArgumentParser(description='Build the spore kNN connectome graph')
+    parser.add_argument('--spores', default=SPORE_DIR)
+    parser.add_argument('--store', default=None,
+                        help='Load from a packed spore store instead of JSON files')
+    parser.add_argument('--k', type=int, default=K_DEFAULT, help='Neighbours per spore')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Threads scoring tiles (default: all cores)')
+    parser.add_argument('--block-mb', type=float, default=BLOCK_MB_DEFAULT,
+                        help='Memory for similarity tiles in flight, across workers')
+    parser.add_argument('--update', action='store_true',
+                        help='Patch the saved graph with added/changed/removed spores '
+                             'instead of rebuilding it')
+    parser.add_argument('--output', default=CONNECTOME_PATH)
+    args = parser.parse_args()
+
+    if args.store:
+        spores, A = load_store(args.store)
+    else:
+        spores = load_spores(args.spores)
+        A = build_matrix(spores)
+    ids = [s['id'] for s in spores]
+    del spores
+
+    previous = None
+    if args.update:
+        try:
+            previous = Connectome.load(args.output)
+        except (OSError, ValueError) as e:
+            print(f'Cannot read {args.output} ({e}); building from scratch')
+        if previous is not None and previous.k != args.k:
+            print(f'Saved graph has k={previous.k}, not {args.k}; building from scratch')
+            previous = None
+    if previous is not None:
+        graph, st = previous.update(A, ids, args.workers, args.block_mb)
+        print(f'Updated connectome: {st["added"]} added, {st["changed"]} changed, '
+              f'{st["removed"]} removed; {st["refilled"]} lists rescored, '
+              f'{st["reverse_patched"]} patched with reverse edges')
+        print(f'  {st["spores"]:,} spores, {st["pairs_scored"]:,} pairs scored in '
+              f'{st["seconds"]:.2f}s ({st["pairs_per_second"]:,.0f} pairs/s)')
+        if graph.churn > REBUILD_CHURN * len(graph):
+            print(f'  {graph.churn} spores changed since the last full build '
+                  f'(> {REBUILD_CHURN:.0%}); the barycenter is stale, rebuild without --update')
+        graph.save(args.output)
+        print(f'  Saved: {args.output} ({os.path.getsize(args.output):,} bytes)')
+        return
+
+    unit_dirs, bary = center_and_normalize(A)
+    del A
+
+    def progress(done, n):
+        print(f'\r  {done:,}/{n:,} spores', end='', flush=True)
+
+    graph, st = Connectome.build(unit_dirs, ids, bary, args.k, args.workers,
+                                 args.block_mb, progress)
+    print(f'\nBuilt connectome: {st["spores"]:,} spores, k={st["k"]}, {st["edges"]:,} edges '
+          f'in {st["seconds"]:.2f}s ({st["pairs_per_second"]:,.0f} pairs/s, '
+          f'{st["workers"]} workers, {st["block_rows"]} rows/tile)')
+    deg = degree_stats(graph)
+    print(f'  mean edge cos {deg["mean_cos"]:.3f}, mutual edges {deg["mutual_fraction"]*100:.1f}%, '
+          f'max in-degree {deg["in_degree_max"]}, {deg["orphans"]} spores with no in-edges')
+    graph.save(args.output)
+    print(f'  Saved: {args.output} ({os.path.getsize(args.output):,} bytes)')
+
+
+if __name__ == '__main__':
+    main()
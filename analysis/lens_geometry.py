@@ -15,9 +15,15 @@ What this finds:
   3. Gap directions — where lenses COULD look that nothing has looked at yet
   4. Most irrational proteins (lowest resonance_score = prime-like positions)
   5. Pairwise angles between discovered axes (verify octahedral hypothesis)
-  6. Fibonacci sphere positions (ideal N-lens placement) vs actual coverage
+  6. Coverage map: Monte Carlo over uniform sphere directions — how far each
+     is from its nearest protein, the empty fraction of the sphere per cap
+     radius against a uniform (ideal-placement) cloud of the same size, and
+     the emptiest directions (optionally the Coulomb search's starting point)
 
 Usage: py -3 analysis/lens_geometry.py [--n-lenses 6] [--spores PATH]
+                                      [--store PATH] [--restarts K] [--workers W]
+                                      [--coverage-samples M] [--coverage-seed]
+                                      [--metrics FILE] [--profile FILE]
 """
 
 import json
@@ -26,53 +32,68 @@ import sys
 import argparse
 import math
 from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from itertools import repeat
 
 import numpy as np
 from scipy.spatial.distance import cdist
+from scipy.special import betainc
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'scripts'))
+import instrumentation  # noqa: E402
+import spore_loader  # noqa: E402
+from spore_store import SporeStore  # noqa: E402
+from tags import SYSTEM_TAG_PREFIXES, TagIndex, is_system_tag  # noqa: E402,F401
 
 # ── Config ────────────────────────────────────────────────────────────────────
 
 SPORE_DIR = os.path.join(os.path.dirname(__file__), '..', 'wave-spores')
 N_LENSES_DEFAULT = 6
 N_GAP_SAMPLES = 8000       # random directions to test for gaps
+COVERAGE_CHUNK = 2048      # sample directions per coverage work item
+COVERAGE_TILE_MB = 64      # sample × protein cosine tile per worker
+COVERAGE_KEEP = 32         # emptiest samples kept per chunk
+COVERAGE_CAP_COS = (0.2, 0.25, 0.3, 0.35, 0.4, 0.5)  # cap radii of the empty-cap table
 TOP_K_PROTEINS = 20        # proteins to report near each lens direction
 TOP_K_TAGS = 12            # most common tags to show per direction
 IRRATIONAL_PERCENTILE = 5  # bottom N% by resonance_score = "prime-like"
-
-# Tags to strip before semantic analysis
-SYSTEM_TAG_PREFIXES = (
-    '#embed:', '#dna:', '#synthesis:', '#source:', '#calibration',
-    '#golden_connectome', '#P-series', '#public', '#auto-generated',
-    '#connectome:', '#substrate:', '#file:', '#repo:', '#commit:',
-    '#component:', '#lang:', '#structural-observation', '#attentional-pattern',
-)
+CONVERGE_PATIENCE = 10     # calm Coulomb steps before stopping early
 
 
 # ── Loading ────────────────────────────────────────────────────────────────────
 
-def load_spores(spore_dir: str) -> list[dict]:
-    """Load all wave spore JSON files. Returns list of dicts."""
-    spores = []
-    files = [f for f in os.listdir(spore_dir) if f.endswith('.json')]
-    print(f"Loading {len(files)} spore files from {spore_dir} ...")
-    for fn in files:
-        try:
-            with open(os.path.join(spore_dir, fn)) as f:
-                s = json.load(f)
-            if s.get('amplitudes') and len(s['amplitudes']) == 200:
-                spores.append(s)
-        except Exception:
-            pass
-    print(f"Loaded {len(spores)} valid spores with 200D amplitudes.")
-    return spores
+def load_spores(spore_dir: str, basis_hash: str | None = None,
+                workers: int | None = None) -> list[dict]:
+    """
+    Load and validate all wave spore JSON files (scripts/spore_loader.py).
+    Rejected files are reported with reasons. Returns list of dicts.
+    """
+    print(f"Loading spore files from {spore_dir} ...")
+    result = spore_loader.load_spore_dir(spore_dir, basis_hash=basis_hash, workers=workers)
+    result.report()
+    print(f"Loaded {len(result.spores)} valid spores with 200D amplitudes.")
+    return result.spores
+
+
+def load_store(store_dir: str) -> tuple[list[dict], np.ndarray]:
+    """
+    Load spores from a packed spore store (scripts/spore_store.py).
+    Returns (spores, N×200 float64 amplitude matrix).
+    """
+    store = SporeStore(store_dir)
+    print(f"Loaded {len(store)} spores from store {store_dir} "
+          f"(built {store.header['built_at']}).")
+    return store.spores(), np.asarray(store.amplitudes, dtype=np.float64)
 
 
 def semantic_tags(tags: list[str]) -> list[str]:
     """Filter to semantic-only tags, strip system/dna/embed prefixes."""
-    return [
-        t for t in tags
-        if not any(t.startswith(p) for p in SYSTEM_TAG_PREFIXES)
-    ]
+    return is_system_tag.strip(tags)
+
+
+def build_tag_index(spores: list[dict]) -> TagIndex:
+    """Tag -> spore inverted index over the loaded spores (rows follow spores)."""
+    return TagIndex.build([s['id'] for s in spores], [s.get('tags', []) for s in spores])
 
 
 # ── Core geometry ─────────────────────────────────────────────────────────────
@@ -107,35 +128,215 @@ def pca_of_distribution(A: np.ndarray, n_components: int = 10
     return Vt[:n_components], variance[:n_components] / total_var
 
 
+def top_k_cosines(directions: np.ndarray, unit_dirs: np.ndarray,
+                  top_k: int = TOP_K_PROTEINS) -> tuple[np.ndarray, np.ndarray]:
+    """
+    Batched top-k cosine search for a (Q×200) stack of directions.
+    One unit_dirs @ D.T matmul, then argpartition per column and a sort of
+    only the k survivors. Returns (cosines [Q×k], row indices [Q×k]) best-first.
+    """
+    D = np.atleast_2d(directions)
+    D = D / np.linalg.norm(D, axis=1, keepdims=True)
+    cos = unit_dirs @ D.T                                   # (n_proteins, Q)
+    k = min(top_k, len(unit_dirs))
+    if k < len(unit_dirs):
+        top = np.argpartition(-cos, k - 1, axis=0)[:k]
+    else:
+        top = np.broadcast_to(np.arange(k)[:, None], cos.shape).copy()
+    vals = np.take_along_axis(cos, top, axis=0)
+    order = np.argsort(-vals, axis=0)
+    top = np.take_along_axis(top, order, axis=0)
+    return np.take_along_axis(vals, order, axis=0).T, top.T
+
+
+def proteins_near_directions(directions: np.ndarray,
+                             unit_dirs: np.ndarray,
+                             spores: list[dict],
+                             top_k: int = TOP_K_PROTEINS
+                             ) -> list[list[tuple[float, dict]]]:
+    """Top_k (cosine, spore) hits for each row of a (Q×200) direction stack."""
+    cos, idx = top_k_cosines(directions, unit_dirs, top_k)
+    return [[(float(c), spores[i]) for c, i in zip(crow, irow)]
+            for crow, irow in zip(cos, idx)]
+
+
 def proteins_near_direction(direction: np.ndarray,
                              unit_dirs: np.ndarray,
                              spores: list[dict],
                              top_k: int = TOP_K_PROTEINS
                              ) -> list[tuple[float, dict]]:
     """Return top_k spores most aligned with the given direction vector."""
-    d = direction / np.linalg.norm(direction)
-    cosines = unit_dirs @ d
-    idx = np.argsort(cosines)[::-1][:top_k]
-    return [(float(cosines[i]), spores[i]) for i in idx]
-
-
-def tag_summary(hits: list[tuple[float, dict]], top_n: int = TOP_K_TAGS
-                ) -> dict:
-    """Summarise semantic tags and tiers from a list of (cosine, spore) hits."""
-    all_tags: list[str] = []
-    tiers: list[str] = []
-    for _, s in hits:
-        all_tags.extend(semantic_tags(s.get('tags', [])))
-        tiers.append(s.get('tier', 'unknown'))
+    return proteins_near_directions(direction, unit_dirs, spores, top_k)[0]
+
+
+def tag_summary(hits: list[tuple[float, dict]], top_n: int = TOP_K_TAGS,
+                tag_index: TagIndex | None = None) -> dict:
+    """
+    Summarise semantic tags and tiers from a list of (cosine, spore) hits.
+    With a tag_index over the spores, tags are counted from its postings.
+    """
+    if tag_index is not None:
+        rows = tag_index.rows_of([s['id'] for _, s in hits])
+        top_tags = tag_index.tag_counts(rows[rows >= 0], exclude=is_system_tag, top_n=top_n)
+    else:
+        all_tags: list[str] = []
+        for _, s in hits:
+            all_tags.extend(semantic_tags(s.get('tags', [])))
+        top_tags = Counter(all_tags).most_common(top_n)
     return {
-        'top_tags': Counter(all_tags).most_common(top_n),
-        'tiers': Counter(tiers),
+        'top_tags': top_tags,
+        'tiers': Counter(s.get('tier', 'unknown') for _, s in hits),
         'mean_coherence': float(np.mean([s['coherence_score'] for _, s in hits])),
         'mean_resonance': float(np.mean([
             s.get('resonance_score', 0.9) for _, s in hits])),
     }
 
 
+# ── Coverage map — Monte Carlo over the sphere ────────────────────────────────
+
+def sample_max_cosines(unit_dirs: np.ndarray, n_samples: int = N_GAP_SAMPLES,
+                       seed: int = 0, workers: int | None = None,
+                       keep: int = COVERAGE_KEEP, chunk: int = COVERAGE_CHUNK,
+                       tile_mb: float = COVERAGE_TILE_MB
+                       ) -> tuple[np.ndarray, np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Draw n_samples uniform directions on the unit sphere and find each
+    one's nearest protein (max cosine) by blocked matmul + argmax: a chunk
+    of samples is scored against a block of proteins at a time, so memory
+    stays at one (chunk × block) float32 tile per worker. Chunks run in a
+    thread pool (BLAS and the reductions release the GIL); chunk c draws
+    from its own seeded stream, so results do not depend on workers.
+
+    Returns (max_cos [M], nearest protein row [M], the emptiest sampled
+    directions [≤ keep per chunk × d] and their max_cos), emptiest first.
+    """
+    P = np.ascontiguousarray(unit_dirs, dtype=np.float32)
+    n, dims = P.shape
+    block = max(1, min(n, int(tile_mb * 2 ** 20 / (4 * chunk))))
+    max_cos = np.empty(n_samples, dtype=np.float32)
+    nearest = np.empty(n_samples, dtype=np.int32)
+
+    def job(c):
+        lo = c * chunk
+        m = min(chunk, n_samples - lo)
+        S = np.random.default_rng([seed, c]).standard_normal((m, dims)).astype(np.float32)
+        S /= np.linalg.norm(S, axis=1, keepdims=True)
+        best = np.full(m, -np.inf, dtype=np.float32)
+        arg = np.zeros(m, dtype=np.int32)
+        for plo in range(0, n, block):
+            tile = S @ P[plo:plo + block].T
+            i = tile.argmax(axis=1)
+            v = tile[np.arange(m), i]
+            better = v > best
+            best[better], arg[better] = v[better], i[better] + plo
+        max_cos[lo:lo + m], nearest[lo:lo + m] = best, arg
+        k = min(keep, m)
+        low = np.argpartition(best, k - 1)[:k] if k < m else np.arange(m)
+        return S[low], best[low]
+
+    chunks = range(-(-n_samples // chunk))
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(chunks) > 1:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            kept = list(pool.map(job, chunks))
+    else:
+        kept = [job(c) for c in chunks]
+    dirs = np.concatenate([d for d, _ in kept])
+    cos = np.concatenate([v for _, v in kept])
+    order = np.argsort(cos, kind='stable')
+    return max_cos, nearest, dirs[order], cos[order]
+
+
+def uniform_empty_fraction(cap_cos: float, n_points: int, dims: int) -> float:
+    """
+    Expected fraction of the sphere with no point within the cap cos ≥ cap_cos
+    for n_points uniformly random directions in `dims` dimensions: the
+    isotropic reference the actual coverage is compared against.
+    """
+    if cap_cos <= 0:
+        return 0.0
+    cap_area = 0.5 * betainc((dims - 1) / 2, 0.5, 1 - cap_cos ** 2)
+    return float(np.exp(n_points * np.log1p(-cap_area)))
+
+
+def spread_directions(dirs: np.ndarray, n: int, min_angle_deg: float = 60.0
+                      ) -> np.ndarray:
+    """
+    Greedily pick n of the (emptiest-first) dirs at least min_angle_deg
+    apart (sign-insensitive), topping up in order if too few qualify.
+    """
+    limit = math.cos(math.radians(min_angle_deg))
+    chosen: list[int] = []
+    for i in range(len(dirs)):
+        if len(chosen) == n:
+            break
+        if not chosen or np.abs(dirs[chosen] @ dirs[i]).max() < limit:
+            chosen.append(i)
+    rest = [i for i in range(len(dirs)) if i not in chosen]
+    return dirs[chosen + rest[:n - len(chosen)]]
+
+
+def coverage_map(unit_dirs: np.ndarray, spores: list[dict],
+                 n_samples: int = N_GAP_SAMPLES, n_emptiest: int = 10,
+                 cap_cos: tuple[float, ...] = COVERAGE_CAP_COS, seed: int = 0,
+                 workers: int | None = None) -> tuple[dict, np.ndarray]:
+    """
+    Monte Carlo coverage of the unit sphere by the protein cloud: the
+    nearest-protein histogram of uniform sample directions, the empty
+    fraction of the sphere for several cap radii (with its binomial standard
+    error and the uniform-cloud reference), and the emptiest directions.
+    Returns (report dict, emptiest directions [≤ n_samples × d], emptiest first).
+    """
+    n, dims = unit_dirs.shape
+    max_cos, nearest, dirs, dir_cos = sample_max_cosines(
+        unit_dirs, n_samples, seed, workers, keep=max(COVERAGE_KEEP, n_emptiest))
+    counts, edges = np.histogram(max_cos, bins=np.linspace(0, 1, 51))
+    caps = []
+    for t in cap_cos:
+        p = float((max_cos < t).mean())
+        caps.append({
+            'cos': t,
+            'angle_deg': math.degrees(math.acos(t)),
+            'empty_fraction': p,
+            'stderr': math.sqrt(p * (1 - p) / n_samples),
+            'uniform_empty_fraction': uniform_empty_fraction(t, n, dims),
+        })
+    emptiest = [
+        {'max_cos': float(c), 'angle_deg': math.degrees(math.acos(min(float(c), 1.0))),
+         'nearest_id': spores[int(i)]['id']}
+        for c, i in zip(dir_cos[:n_emptiest], nearest_rows(unit_dirs, dirs[:n_emptiest]))
+    ]
+    report = {
+        'samples': n_samples,
+        'seed': seed,
+        'max_cos_quantiles': {f'p{q}': float(v) for q, v in
+                              zip((1, 5, 25, 50, 75, 95, 99),
+                                  np.percentile(max_cos, (1, 5, 25, 50, 75, 95, 99)))},
+        'histogram': {'edges': edges.tolist(), 'counts': counts.tolist()},
+        'empty_caps': caps,
+        'most_covering_proteins': [
+            {'id': spores[int(i)]['id'], 'samples': int(c)}
+            for i, c in zip(*_top_counts(nearest, 10))
+        ],
+        'emptiest': emptiest,
+    }
+    return report, dirs
+
+
+def nearest_rows(unit_dirs: np.ndarray, directions: np.ndarray) -> np.ndarray:
+    """Row of the nearest protein for each direction (argmax cosine)."""
+    if not len(directions):
+        return np.zeros(0, dtype=np.int64)
+    return (np.asarray(unit_dirs, dtype=np.float32) @ directions.T).argmax(axis=0)
+
+
+def _top_counts(labels: np.ndarray, top_n: int) -> tuple[np.ndarray, np.ndarray]:
+    """The top_n most frequent labels and their counts, most frequent first."""
+    values, counts = np.unique(labels, return_counts=True)
+    order = np.argsort(-counts, kind='stable')[:top_n]
+    return values[order], counts[order]
+
+
 # ── Gap finding — Coulomb repulsion (Thomson problem) ─────────────────────────
 
 def find_gap_directions_coulomb(
@@ -144,6 +345,9 @@ def find_gap_directions_coulomb(
     n_steps: int = 3000,
     lr_init: float = 0.08,
     protein_weight: float = 1.0,
+    tol: float = 1e-7,
+    seed: int = 42,
+    init: np.ndarray | None = None,
 ) -> np.ndarray:
     """
     Find n_lenses directions maximally far from the protein cloud AND
@@ -161,76 +365,186 @@ def find_gap_directions_coulomb(
 
     Self-weight is scaled by n_proteins so protein-repulsion and
     self-repulsion are balanced regardless of corpus size.
+
+    All lenses are updated together from one fused energy/force pass per
+    step; iteration stops early once the relative energy change has stayed
+    at or below tol for CONVERGE_PATIENCE consecutive steps (tol=0 disables).
+
+    init (n_lenses × dims) replaces the random start, e.g. the emptiest
+    directions of coverage_map().
     """
-    n_proteins, dims = unit_dirs.shape
-    self_weight = float(n_proteins) * protein_weight  # balance forces
+    dims = unit_dirs.shape[1]
+    if init is None:
+        start = _random_lenses([seed], n_lenses, dims)
+    else:
+        start = np.asarray(init, dtype=np.float64)[None, :n_lenses]
+        start = start / np.linalg.norm(start, axis=-1, keepdims=True)
+    lenses, _, _ = _coulomb_descent(unit_dirs, start, n_steps, lr_init, protein_weight, tol)
+    return lenses[0]
+
+
+def find_gap_directions_multistart(
+    unit_dirs: np.ndarray,
+    n_lenses: int,
+    restarts: int = 8,
+    workers: int = 1,
+    seed: int = 42,
+    **coulomb_kwargs,
+) -> tuple[np.ndarray, dict]:
+    """
+    Run `restarts` independently seeded Coulomb searches and keep the
+    lowest-energy equilibrium.
+
+    Starts are evolved together as one (restarts × n_lenses × dims) batch;
+    with workers > 1 the batch is split across a process pool. Start r uses
+    seed + r, so start 0 reproduces find_gap_directions_coulomb(seed=seed).
+    coulomb_kwargs are passed through (n_steps, lr_init, protein_weight, tol).
 
-    # Random initialisation on the unit sphere
-    rng = np.random.default_rng(42)
-    lenses = rng.standard_normal((n_lenses, dims))
-    lenses /= np.linalg.norm(lenses, axis=1, keepdims=True)
+    Returns (best lens directions [n_lenses×dims], spread report).
+    """
+    seeds = [seed + r for r in range(restarts)]
+    n_groups = max(1, min(workers, restarts))
+    if n_groups == 1:
+        lenses, energies, steps = _multistart_group(
+            unit_dirs, n_lenses, seeds, coulomb_kwargs, True)
+    else:
+        groups = [list(g) for g in np.array_split(seeds, n_groups)]
+        with ProcessPoolExecutor(max_workers=n_groups) as pool:
+            parts = list(pool.map(_multistart_group, repeat(unit_dirs), repeat(n_lenses),
+                                  groups, repeat(coulomb_kwargs), repeat(False)))
+        lenses = np.concatenate([p[0] for p in parts])
+        energies = np.concatenate([p[1] for p in parts])
+        steps = np.concatenate([p[2] for p in parts])
+
+    best = int(np.argmin(energies))
+    # Sign/permutation-invariant agreement of every start with the best one:
+    # mean over best lenses of the angle to the closest lens (or its antipode)
+    cos = np.abs(np.einsum('id,rjd->rij', lenses[best], lenses)).max(axis=2)
+    alignment = np.degrees(np.arccos(np.clip(cos, 0, 1))).mean(axis=1)
+    spread = {
+        'restarts': restarts,
+        'best_restart': best,
+        'best_seed': seeds[best],
+        'energies': energies.tolist(),
+        'energy_rel_spread': float((energies.max() - energies.min()) / energies.min()),
+        'min_pairwise_angle_deg': [_min_pairwise_angle(l) for l in lenses],
+        'alignment_to_best_deg': alignment.tolist(),
+        'steps': steps.tolist(),
+    }
+    return lenses[best], spread
+
+
+def _multistart_group(unit_dirs, n_lenses, seeds, coulomb_kwargs, verbose):
+    """Evolve one batch of seeded starts; returns (lenses, energies, steps)."""
+    return _coulomb_descent(unit_dirs, _random_lenses(seeds, n_lenses, unit_dirs.shape[1]),
+                            verbose=verbose, **coulomb_kwargs)
+
+
+def _random_lenses(seeds, n_lenses, dims):
+    """One random unit-sphere initialisation per seed: (len(seeds), n_lenses, dims)."""
+    lenses = np.stack([np.random.default_rng(s).standard_normal((n_lenses, dims))
+                       for s in seeds])
+    return lenses / np.linalg.norm(lenses, axis=-1, keepdims=True)
+
+
+def _coulomb_descent(unit_dirs, lenses, n_steps=3000, lr_init=0.08,
+                     protein_weight=1.0, tol=1e-7, verbose=True):
+    """
+    Evolve a (restarts × n_lenses × dims) stack of lens sets under Coulomb
+    repulsion. Each start keeps its own learning rate and convergence count;
+    converged starts drop out of the batch.
+    Returns (lenses, final energies [restarts], steps taken [restarts]).
+    """
+    n_proteins = len(unit_dirs)
+    self_weight = float(n_proteins) * protein_weight  # balance forces
+    protein_sq = np.einsum('ij,ij->i', unit_dirs, unit_dirs)
 
-    lr = lr_init
-    prev_energy = np.inf
+    lenses = lenses.copy()
+    k = len(lenses)
+    lr = np.full(k, lr_init)
+    prev_energy = np.full(k, np.inf)
+    calm_steps = np.zeros(k, dtype=int)
+    steps = np.full(k, n_steps)
+    active = np.arange(k)
 
     for step in range(n_steps):
-        forces = np.zeros_like(lenses)
-
-        for i in range(n_lenses):
-            c = lenses[i]
-
-            # ── Protein repulsion (vectorised over all proteins) ──────────────
-            # Direction from each protein to this lens candidate
-            diffs = c[None, :] - unit_dirs          # (n_proteins, dims)
-            dist_sq = (diffs ** 2).sum(axis=1)      # (n_proteins,)
-            dist_sq = np.maximum(dist_sq, 1e-8)
-            forces[i] += protein_weight * (diffs / dist_sq[:, None]).sum(axis=0)
-
-            # ── Mutual repulsion from other lens candidates ───────────────────
-            for j in range(n_lenses):
-                if i == j:
-                    continue
-                diff = c - lenses[j]
-                dsq = float((diff ** 2).sum())
-                dsq = max(dsq, 1e-8)
-                forces[i] += self_weight * diff / dsq
-
-            # ── Project force onto tangent plane of sphere at c ───────────────
-            # (remove radial component so we only move along the sphere surface)
-            forces[i] -= (forces[i] @ c) * c
+        # Energy of the current configuration and the forces on it, in one pass
+        energy, forces = _coulomb_energy_forces(
+            lenses[active], unit_dirs, protein_sq, protein_weight, self_weight)
+
+        # Adaptive learning rate: decay when the last update did not lower the
+        # energy (the very first update is not judged)
+        if step >= 2:
+            prev = prev_energy[active]
+            lr[active] = np.where(energy >= prev, lr[active] * 0.95, lr[active])
+            calm = np.abs(prev - energy) <= tol * energy
+            calm_steps[active] = np.where(calm, calm_steps[active] + 1, 0)
+        prev_energy[active] = energy
+
+        done = calm_steps[active] >= CONVERGE_PATIENCE
+        if done.any():
+            steps[active[done]] = step
+            if verbose and k == 1:
+                print(f"    step {step:4d}: energy converged (rel. change <= {tol:g})")
+            forces = forces[~done]
+            active = active[~done]
+            if not len(active):
+                break
 
         # Gradient ascent (we want to MAXIMISE distance, so follow force)
-        lenses += lr * forces
+        moved = lenses[active] + lr[active, None, None] * forces
 
         # Re-normalise back onto unit sphere
-        norms = np.linalg.norm(lenses, axis=1, keepdims=True)
-        lenses /= np.maximum(norms, 1e-10)
-
-        # Adaptive learning rate: decay when not improving
-        energy = _repulsion_energy(lenses, unit_dirs, protein_weight, self_weight)
-        if energy >= prev_energy:
-            lr *= 0.95
-        prev_energy = energy
+        norms = np.linalg.norm(moved, axis=-1, keepdims=True)
+        lenses[active] = moved / np.maximum(norms, 1e-10)
+
+        if (verbose or instrumentation.enabled()) and step % 500 == 0:
+            min_a = max(_min_pairwise_angle(l) for l in lenses)
+            instrumentation.event('coulomb_step', step=step, min_pairwise_angle_deg=min_a,
+                                  energy=float(energy.min()), running=len(active))
+            if verbose and k == 1:
+                print(f"    step {step:4d}: min-pairwise-angle={min_a:.1f}°  lr={lr[0]:.5f}")
+            elif verbose:
+                print(f"    step {step:4d}: best min-pairwise-angle={min_a:.1f}°  "
+                      f"running={len(active)}/{k}")
+
+    energies, _ = _coulomb_energy_forces(lenses, unit_dirs, protein_sq,
+                                         protein_weight, self_weight)
+    instrumentation.count('coulomb_steps', int(steps.sum()))
+    return lenses, energies, steps
+
+
+def _coulomb_energy_forces(lenses, unit_dirs, protein_sq, pw, sw):
+    """
+    Fused repulsion energy and tangent-plane forces for all lenses at once.
 
-        if step % 500 == 0:
-            min_a = _min_pairwise_angle(lenses)
-            print(f"    step {step:4d}: min-pairwise-angle={min_a:.1f}°  lr={lr:.5f}")
+    lenses is (..., n_lenses, dims), so a stack of independent lens sets can
+    be evaluated together. Squared distances come from
+    |c−p|² = |c|² + |p|² − 2c·p, i.e. a single (lenses × proteins) matmul
+    instead of an (n_proteins × dims) difference array per lens.
+    Returns (energy [...], forces [..., n_lenses, dims]).
+    """
+    lens_sq = np.einsum('...ij,...ij->...i', lenses, lenses)
 
-    return lenses
+    # ── Protein repulsion ─────────────────────────────────────────────────────
+    dist_sq = lens_sq[..., None] + protein_sq - 2.0 * (lenses @ unit_dirs.T)
+    inv = pw / np.maximum(dist_sq, 1e-8)                  # (..., n_lenses, n_proteins)
+    energy = inv.sum(axis=(-2, -1))
+    # Σ_p (c − p) / |c−p|²  =  c·Σ_p w_p − W @ P
+    forces = lenses * inv.sum(axis=-1, keepdims=True) - inv @ unit_dirs
 
+    # ── Mutual repulsion between lens candidates ──────────────────────────────
+    n = lenses.shape[-2]
+    dsq = (lens_sq[..., :, None] + lens_sq[..., None, :]
+           - 2.0 * (lenses @ np.swapaxes(lenses, -1, -2)))
+    inv_ll = sw / np.maximum(dsq, 1e-8)
+    inv_ll[..., np.arange(n), np.arange(n)] = 0.0
+    energy = energy + inv_ll.sum(axis=(-2, -1))
+    forces += lenses * inv_ll.sum(axis=-1, keepdims=True) - inv_ll @ lenses
 
-def _repulsion_energy(lenses, unit_dirs, pw, sw):
-    """Total repulsion energy (higher = better separated)."""
-    e = 0.0
-    for i, c in enumerate(lenses):
-        diffs = c[None, :] - unit_dirs
-        dist_sq = np.maximum((diffs ** 2).sum(axis=1), 1e-8)
-        e += pw * (1.0 / dist_sq).sum()
-        for j in range(len(lenses)):
-            if j != i:
-                dsq = max(float(((c - lenses[j]) ** 2).sum()), 1e-8)
-                e += sw / dsq
-    return e
+    # ── Project onto tangent plane of the sphere at each lens ─────────────────
+    forces -= np.einsum('...ij,...ij->...i', forces, lenses)[..., None] * lenses
+    return energy, forces
 
 
 def _min_pairwise_angle(vecs):
@@ -276,8 +590,9 @@ def print_separator(title: str = '', width: int = 70):
 
 
 def report_lens(label: str, hits: list[tuple[float, dict]],
-                show_proteins: int = 8):
-    summary = tag_summary(hits)
+                show_proteins: int = 8, tag_index: TagIndex | None = None) -> dict:
+    """Print a lens' tag summary and top proteins; returns the summary."""
+    summary = tag_summary(hits, tag_index=tag_index)
     print(f"\n  [{label}]")
     print(f"  Tags:       {', '.join(t for t, _ in summary['top_tags'][:8])}")
     print(f"  Tiers:      {dict(summary['tiers'])}")
@@ -288,6 +603,7 @@ def report_lens(label: str, hits: list[tuple[float, dict]],
         title = s.get('title') or s['id'][:16]
         r = s.get('resonance_score', 0)
         print(f"    {cos:+.3f}  [{s['tier'][0].upper()}] r={r:.3f}  {title[:60]}")
+    return summary
 
 
 def pairwise_angles(directions: list[np.ndarray]) -> np.ndarray:
@@ -308,20 +624,53 @@ def main():
     parser = argparse.ArgumentParser(description='Lens geometry analysis')
     parser.add_argument('--n-lenses', type=int, default=N_LENSES_DEFAULT)
     parser.add_argument('--spores', default=SPORE_DIR)
+    parser.add_argument('--store', default=None,
+                        help='Load from a packed spore store instead of JSON files')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Processes for JSON loading and multi-start gap search '
+                             '(default: all cores)')
+    parser.add_argument('--basis-hash', default=None,
+                        help='Reject spores whose basis_hash differs from this')
+    parser.add_argument('--coulomb-tol', type=float, default=1e-7,
+                        help='Relative energy change at which the gap search stops '
+                             '(0 = always run all steps)')
+    parser.add_argument('--restarts', type=int, default=1,
+                        help='Independently seeded gap searches; the lowest-energy one is kept')
+    parser.add_argument('--coverage-samples', type=int, default=N_GAP_SAMPLES,
+                        help='Random directions sampled for the coverage map (0 = skip)')
+    parser.add_argument('--coverage-seed', action='store_true',
+                        help='Start the (single-start) Coulomb gap search from the '
+                             'emptiest sampled directions instead of random ones')
     parser.add_argument('--top-k', type=int, default=TOP_K_PROTEINS)
     parser.add_argument('--output', default=None, help='Save JSON report to file')
+    instrumentation.add_arguments(parser)
     args = parser.parse_args()
+    if args.coverage_seed and args.restarts > 1:
+        parser.error('--coverage-seed seeds a single-start search; drop --restarts')
+    if args.coverage_seed and args.coverage_samples <= 0:
+        parser.error('--coverage-seed needs the coverage map (--coverage-samples > 0)')
+    with instrumentation.session('lens-geometry', args):
+        run(args)
 
+
+def run(args):
+    """Run the full analysis for parsed command-line args and save the reports."""
     # ── Load data ─────────────────────────────────────────────────────────────
-    spores = load_spores(args.spores)
-    A = build_matrix(spores)
+    instrumentation.stage('load')
+    if args.store:
+        spores, A = load_store(args.store)
+    else:
+        spores = load_spores(args.spores, args.basis_hash, args.workers)
+        A = build_matrix(spores)
     unit_dirs, bary = center_and_normalize(A)
+    tag_index = build_tag_index(spores)
 
     print(f"Amplitude matrix: {A.shape[0]} spores × {A.shape[1]} dims")
     print(f"Barycenter norm:  {np.linalg.norm(bary):.4f}")
     print(f"Unit dir matrix:  {unit_dirs.shape}")
 
     # ── PCA of protein distribution ───────────────────────────────────────────
+    instrumentation.stage('pca')
     n_components = max(args.n_lenses, 10)
     components, var_ratios = pca_of_distribution(A, n_components)
 
@@ -333,18 +682,20 @@ def main():
     print(f"  Total top-{n_components}: {var_ratios.sum()*100:.1f}%")
 
     # ── PC-based lens directions ───────────────────────────────────────────────
+    instrumentation.stage('pc_lenses')
     pc_directions = pc_lens_directions(components, args.n_lenses)
     print_separator(f'PC-BASED LENS POSITIONS (N={args.n_lenses})')
     print("Geometry: axes of maximum variance in the protein distribution")
     print("These are the directions the field has MOST organised around.\n")
 
+    pc_hits = proteins_near_directions(
+        np.array([d for _, d in pc_directions]), unit_dirs, spores, args.top_k)
     pc_lens_data = []
-    for label, direction in pc_directions:
-        hits = proteins_near_direction(direction, unit_dirs, spores, args.top_k)
-        report_lens(label, hits)
+    for (label, _), hits in zip(pc_directions, pc_hits):
+        summary = report_lens(label, hits, tag_index=tag_index)
         pc_lens_data.append({
             'label': label,
-            'summary': tag_summary(hits),
+            'summary': summary,
             'top_proteins': [
                 {'cos': float(c), 'id': s['id'], 'title': s.get('title', ''),
                  'tier': s['tier'], 'resonance_score': s.get('resonance_score', 0)}
@@ -375,25 +726,71 @@ def main():
     deviation = abs(min_nonzero - 90)
     print(f"  Deviation from ideal: {deviation:.1f}°")
 
+    # ── Coverage map — Monte Carlo ────────────────────────────────────────────
+    coverage, empty_dirs = None, None
+    if args.coverage_samples > 0:
+        instrumentation.stage('coverage')
+        print_separator(f'COVERAGE MAP — {args.coverage_samples:,} random directions')
+        print("Nearest protein of uniformly sampled directions on the 200-sphere,")
+        print("against the ideal of the same number of uniformly placed proteins.\n")
+        coverage, empty_dirs = coverage_map(unit_dirs, spores, args.coverage_samples,
+                                            workers=args.workers)
+        q = coverage['max_cos_quantiles']
+        print(f"  Nearest-protein cosine: median {q['p50']:.3f}, "
+              f"5-95% {q['p5']:.3f}-{q['p95']:.3f}")
+        print(f"\n  {'cap cos':>8} {'radius':>7} {'empty':>9} {'± se':>7} {'uniform':>9}")
+        for c in coverage['empty_caps']:
+            print(f"  {c['cos']:>8.2f} {c['angle_deg']:>6.1f}° {c['empty_fraction']*100:>8.2f}% "
+                  f"{c['stderr']*100:>6.2f}% {c['uniform_empty_fraction']*100:>8.2f}%")
+        print("\n  Emptiest sampled directions:")
+        for e in coverage['emptiest'][:5]:
+            print(f"    nearest protein at {e['angle_deg']:.1f}° ({e['nearest_id'][:16]})")
+
     # ── Gap directions — Coulomb repulsion ────────────────────────────────────
+    instrumentation.stage('gap_search')
     print_separator(f'GAP DIRECTIONS — Coulomb repulsion (N={args.n_lenses})')
     print("Running Thomson problem: charged particles repelled by protein cloud")
     print("and by each other. Equilibrium = VSEPR geometry for this field.\n")
 
-    gap_dirs = find_gap_directions_coulomb(unit_dirs, args.n_lenses)
+    gap_search = None
+    if args.restarts > 1:
+        gap_dirs, gap_search = find_gap_directions_multistart(
+            unit_dirs, args.n_lenses, restarts=args.restarts,
+            workers=args.workers or os.cpu_count() or 1, tol=args.coulomb_tol)
+        energies = np.array(gap_search['energies'])
+        print(f"\n  {args.restarts} starts: best #{gap_search['best_restart']} "
+              f"(seed {gap_search['best_seed']}), energy spread "
+              f"{gap_search['energy_rel_spread']*100:.3f}%")
+        print(f"  Energy min/median/max: {energies.min():.1f} / "
+              f"{np.median(energies):.1f} / {energies.max():.1f}")
+        print(f"  Min pairwise angle per start: "
+              f"{', '.join(f'{a:.1f}°' for a in gap_search['min_pairwise_angle_deg'])}")
+        print(f"  Mean alignment to best start: "
+              f"{', '.join(f'{a:.1f}°' for a in gap_search['alignment_to_best_deg'])}")
+    else:
+        init = None
+        if args.coverage_seed and len(empty_dirs) >= args.n_lenses:
+            print("  Starting from the emptiest sampled directions")
+            init = spread_directions(empty_dirs, args.n_lenses)
+        elif args.coverage_seed:
+            print(f"  Only {len(empty_dirs)} empty directions for {args.n_lenses} lenses; "
+                  f"starting from random ones")
+        gap_dirs = find_gap_directions_coulomb(unit_dirs, args.n_lenses, tol=args.coulomb_tol,
+                                               init=init)
+    instrumentation.stage('gap_lenses')
+    gap_hits = proteins_near_directions(gap_dirs, unit_dirs, spores, args.top_k)
     gap_lens_data = []
-    for i, direction in enumerate(gap_dirs):
+    for i, hits in enumerate(gap_hits):
         label = f'GAP-{i+1}'
-        hits = proteins_near_direction(direction, unit_dirs, spores, args.top_k)
         # How far is the nearest protein from this gap direction?
         nearest_cos = hits[0][0] if hits else 0
         nearest_angle = math.degrees(math.acos(min(abs(nearest_cos), 1)))
         print(f"\n  [{label}] — nearest protein at {nearest_angle:.1f}° from this direction")
-        report_lens(label, hits, show_proteins=5)
+        summary = report_lens(label, hits, show_proteins=5, tag_index=tag_index)
         gap_lens_data.append({
             'label': label,
             'nearest_protein_angle_deg': nearest_angle,
-            'summary': tag_summary(hits),
+            'summary': summary,
             'nearest_proteins': [
                 {'cos': float(c), 'id': s['id'], 'title': s.get('title', ''),
                  'tier': s['tier'], 'resonance_score': s.get('resonance_score', 0)}
@@ -417,23 +814,21 @@ def main():
     print(f"\n  Min gap-direction angle: {gap_min:.1f}°  (ideal: 90°)")
 
     # ── Most irrational proteins (prime-like positions) ───────────────────────
+    instrumentation.stage('irrational')
     print_separator('MOST IRRATIONAL POSITIONS (lowest resonance_score)')
     print("Proteins at prime-like positions: least reachable by rational")
     print("combinations of existing axes. The field's hardest insights.\n")
 
-    sorted_by_irrat = sorted(
-        spores, key=lambda s: s.get('resonance_score', 1.0)
+    irrat_order = sorted(
+        range(len(spores)), key=lambda i: spores[i].get('resonance_score', 1.0)
     )
     cutoff = int(len(spores) * IRRATIONAL_PERCENTILE / 100)
-    prime_proteins = sorted_by_irrat[:cutoff]
-
-    tag_counts = Counter()
-    for s in prime_proteins:
-        tag_counts.update(semantic_tags(s.get('tags', [])))
+    prime_proteins = [spores[i] for i in irrat_order[:cutoff]]
+    prime_tags = tag_index.tag_counts(irrat_order[:cutoff], exclude=is_system_tag)
 
     print(f"Bottom {IRRATIONAL_PERCENTILE}% by resonance_score ({len(prime_proteins)} proteins)")
     print(f"Top tags in this group:")
-    for tag, count in tag_counts.most_common(15):
+    for tag, count in prime_tags[:15]:
         pct = count / len(prime_proteins) * 100
         print(f"  {tag:<35} {count:>4} ({pct:.0f}%)")
 
@@ -476,12 +871,13 @@ def main():
   Lenses pointing at gap directions would generate maximal new coherence.
 
   Most irrational proteins (prime positions):
-  {', '.join(t for t, _ in tag_counts.most_common(5))}
+  {', '.join(t for t, _ in prime_tags[:5])}
 
   These are the insights that can't be reached from existing axes.
   """)
 
     # ── Save JSON report ──────────────────────────────────────────────────────
+    instrumentation.stage('save')
     output_path = args.output or os.path.join(
         os.path.dirname(__file__), 'lens_geometry_report.json')
 
@@ -495,6 +891,8 @@ def main():
         },
         'pc_lenses': pc_lens_data,
         'gap_lenses': gap_lens_data,
+        'gap_search': gap_search,
+        'coverage': coverage,
         'pc_pairwise_angles': {
             f'{labels[i]}_vs_{labels[j]}': float(angles[i, j])
             for i in range(len(labels)) for j in range(i+1, len(labels))
@@ -510,7 +908,7 @@ def main():
             'max': float(res_scores.max()),
         },
         'prime_position_tags': [
-            {'tag': t, 'count': c} for t, c in tag_counts.most_common(20)
+            {'tag': t, 'count': c} for t, c in prime_tags[:20]
         ],
         'most_irrational_proteins': [
             {'id': s['id'],
@@ -522,6 +920,7 @@ def main():
     }
     with open(output_path, 'w') as f:
         json.dump(report, f, indent=2)
+    instrumentation.count('bytes_written', os.path.getsize(output_path))
     print(f"  Full report saved: {output_path}")
 
     # ── App-ready lens vectors ─────────────────────────────────────────────────
@@ -569,6 +968,7 @@ def main():
     os.makedirs(os.path.dirname(vectors_path), exist_ok=True)
     with open(vectors_path, 'w') as f:
         json.dump(lens_vectors, f, indent=2)
+    instrumentation.count('bytes_written', os.path.getsize(vectors_path))
     print(f"  App-ready vectors saved: {vectors_path}")
     print(f"  -> Copy to static/wave-data/lens_vectors.json in eidolon-mesh-tauri")
 
@@ -0,0 +1,344 @@
+"""
+Basis-version migration for wave spores.
+
+Every spore stores basis_hash, delta_tier1 and delta_tier3, which go stale
+as soon as regenerate-indexes.py computes a new delta-basis. This module:
+
+  - finds spores whose basis_hash differs from docs/data/delta-basis.json
+    and re-encodes their deltas from their amplitudes in vectorized batches,
+    rewriting the spore files atomically. Only the basis_hash /
+    delta_tier1 / delta_tier3 values are replaced in the file's own text,
+    so every other byte (separators, indentation, number formatting) is
+    kept and migration diffs show just those fields; a file where they
+    cannot be located unambiguously is re-serialised as compact JSON and
+    counted under "reformatted";
+  - keeps a chain of previous bases in docs/data/basis-chain/ (one .npz per
+    basis plus chain.json, newest first, CHAIN_KEEP entries, each file
+    replaced atomically), archived by regenerate-indexes.py whenever the
+    basis changes;
+  - precomputes basis-to-basis rotations so codes from a peer on an older
+    basis can be mapped into the current one (and back) without the
+    amplitudes:  c_dst = R[:, :w] @ c_src + t  with  R = E_dst E_src^T,
+    t = E_dst (b_src - b_dst).
+
+Spore files always carry codes at the global QUANT_SCALE, whatever scheme
+the tier index files use. Migrated spores count as changed for the next
+regenerate-indexes.py --incremental run (their basis_hash is indexed).
+
+Usage: python scripts/basis_migration.py [--spores DIR] [--data DIR]
+                                         [--dry-run] [--rotations]
+"""
+
+import argparse
+import io
+import json
+import os
+import re
+import tempfile
+from collections import Counter
+from datetime import datetime, timezone
+
+import numpy as np
+
+import quantize
+import spore_loader
+from generations import write_atomic
+
+CHAIN_DIR = "basis-chain"       # under the data dir
+CHAIN_FILE = "chain.json"
+CHAIN_KEEP = 8
+MIGRATE_BATCH = 1024
+TIER1_WIDTH = 32
+TIER3_WIDTH = 130
+
+
+# ── Basis chain ───────────────────────────────────────────────────────────────
+
+def load_chain(chain_dir):
+    """chain.json entries, newest first ([] if there is no chain yet)."""
+    try:
+        with open(os.path.join(chain_dir, CHAIN_FILE)) as f:
+            return json.load(f)["bases"]
+    except FileNotFoundError:
+        return []
+
+
+def _save_chain(chain_dir, entries):
+    write_atomic(os.path.join(chain_dir, CHAIN_FILE), json.dumps({"bases": entries}, indent=1))
+
+
+def _savez_atomic(path, **arrays):
+    buf = io.BytesIO()
+    np.savez(buf, **arrays)
+    write_atomic(path, buf.getvalue())
+
+
+def archive_basis(basis, chain_dir, keep=CHAIN_KEEP):
+    """
+    Add a delta-basis dict to the chain (no-op if already there) and drop
+    the oldest entries beyond `keep`, with their rotation files.
+    """
+    os.makedirs(chain_dir, exist_ok=True)
+    entries = load_chain(chain_dir)
+    h = basis["basis_hash"]
+    if any(e["basis_hash"] == h for e in entries):
+        return entries
+    _savez_atomic(os.path.join(chain_dir, f"{h}.npz"),
+                  barycenter=np.asarray(basis["barycenter"]),
+                  eigenvectors=np.asarray(basis["eigenvectors"]),
+                  scales=quantize.basis_scales(basis))
+    entries.insert(0, {
+        "basis_hash": h,
+        "spore_count": basis.get("spore_count"),
+        "computed_at": basis.get("computed_at"),
+        "archived_at": datetime.now(timezone.utc).isoformat(),
+    })
+    for old in entries[keep:]:
+        for fname in os.listdir(chain_dir):
+            if fname.startswith(old["basis_hash"]) or fname.endswith(f"-to-{old['basis_hash']}.npz"):
+                os.remove(os.path.join(chain_dir, fname))
+    entries = entries[:keep]
+    _save_chain(chain_dir, entries)
+    return entries
+
+
+def load_archived(chain_dir, basis_hash):
+    """Archived basis as {basis_hash, barycenter, eigenvectors, scales}."""
+    with np.load(os.path.join(chain_dir, f"{basis_hash}.npz")) as data:
+        return {"basis_hash": basis_hash, "barycenter": data["barycenter"],
+                "eigenvectors": data["eigenvectors"], "scales": data["scales"]}
+
+
+def _arrays(basis):
+    """{basis_hash, barycenter, eigenvectors, scales} from a delta-basis dict or archive."""
+    return {"basis_hash": basis["basis_hash"],
+            "barycenter": np.asarray(basis["barycenter"]),
+            "eigenvectors": np.asarray(basis["eigenvectors"]),
+            "scales": np.asarray(basis["scales"]) if "scales" in basis
+            else quantize.basis_scales(basis)}
+
+
+# ── Rotations ─────────────────────────────────────────────────────────────────
+
+class BasisRotation:
+    """Affine map of delta-PCA coefficients from one basis to another."""
+
+    def __init__(self, src_hash, dst_hash, R, t, src_scales, dst_scales):
+        self.src_hash = src_hash
+        self.dst_hash = dst_hash
+        self.R = R                      # (k_dst, k_src)
+        self.t = t                      # (k_dst,)
+        self.src_scales = src_scales
+        self.dst_scales = dst_scales
+
+    @classmethod
+    def between(cls, src, dst):
+        """Rotation from basis src to basis dst (dicts or archives)."""
+        src, dst = _arrays(src), _arrays(dst)
+        R = dst["eigenvectors"] @ src["eigenvectors"].T
+        t = dst["eigenvectors"] @ (src["barycenter"] - dst["barycenter"])
+        return cls(src["basis_hash"], dst["basis_hash"], R, t, src["scales"], dst["scales"])
+
+    def fidelity(self, width=None):
+        """
+        Share of the destination modes spanned by the first `width` source
+        modes (1.0 = the rotation loses nothing), per destination mode.
+        """
+        width = width or self.R.shape[1]
+        return (self.R[:, :width] ** 2).sum(axis=1)
+
+    def apply(self, codes, src_scales=None, dst_scales=None, out_width=None):
+        """
+        Map integer codes (N x w, any w <= k_src) into the destination basis.
+        Scales default to the ones recorded with each basis; pass
+        QUANT_SCALE explicitly for spore-file codes. Returns (codes, saturated).
+        """
+        codes = np.atleast_2d(codes)
+        w = codes.shape[1]
+        src_scales = self.src_scales[:w] if src_scales is None else src_scales
+        out_width = out_width or self.R.shape[0]
+        dst_scales = self.dst_scales[:out_width] if dst_scales is None else dst_scales
+        coeffs = quantize.dequantize(codes, src_scales) @ self.R[:out_width, :w].T + self.t[:out_width]
+        return quantize.quantize(coeffs, dst_scales)
+
+    def save(self, path):
+        _savez_atomic(path, src_hash=self.src_hash, dst_hash=self.dst_hash, R=self.R, t=self.t,
+                      src_scales=self.src_scales, dst_scales=self.dst_scales)
+
+    @classmethod
+    def load(cls, path):
+        with np.load(path) as data:
+            return cls(str(data["src_hash"]), str(data["dst_hash"]), data["R"], data["t"],
+                       data["src_scales"], data["dst_scales"])
+
+
+def rotation_path(chain_dir, src_hash, dst_hash):
+    return os.path.join(chain_dir, f"{src_hash}-to-{dst_hash}.npz")
+
+
+def write_rotations(current, chain_dir):
+    """
+    Precompute rotations between every archived basis and the current one,
+    in both directions; stale rotation files are removed. Returns the count.
+    """
+    if not os.path.isdir(chain_dir):
+        return 0
+    h = current["basis_hash"]
+    for fname in os.listdir(chain_dir):
+        if "-to-" in fname and h not in fname:
+            os.remove(os.path.join(chain_dir, fname))
+    n = 0
+    for entry in load_chain(chain_dir):
+        if entry["basis_hash"] == h:
+            continue
+        old = load_archived(chain_dir, entry["basis_hash"])
+        BasisRotation.between(old, current).save(rotation_path(chain_dir, old["basis_hash"], h))
+        BasisRotation.between(current, old).save(rotation_path(chain_dir, h, old["basis_hash"]))
+        n += 2
+    return n
+
+
+def rotation_for(chain_dir, src_hash, dst_hash, current=None):
+    """Precomputed rotation if present, else computed from the chain (+ current basis)."""
+    path = rotation_path(chain_dir, src_hash, dst_hash)
+    if os.path.exists(path):
+        return BasisRotation.load(path)
+    bases = {b["basis_hash"]: b for b in [current] if b is not None}
+
+    def get(h):
+        return bases[h] if h in bases else load_archived(chain_dir, h)
+    return BasisRotation.between(get(src_hash), get(dst_hash))
+
+
+# ── Spore migration ───────────────────────────────────────────────────────────
+
+def encode_spore_codes(amplitudes, basis):
+    """(delta_tier1, delta_tier3) int16 codes at QUANT_SCALE, plus saturations."""
+    b = _arrays(basis)
+    coeffs = (np.asarray(amplitudes, dtype=np.float64) - b["barycenter"]) @ \
+        b["eigenvectors"][:TIER3_WIDTH].T
+    codes, saturated = quantize.quantize(coeffs, np.full(coeffs.shape[1], float(quantize.QUANT_SCALE)))
+    return codes[:, :TIER1_WIDTH], codes, saturated
+
+
+def splice_fields(text, fields):
+    """
+    text with the JSON values of `fields` ({key: new value}) replaced in
+    place, each written with the separators its old value used; None if a
+    key does not occur exactly once with a string / null / flat-list value.
+    """
+    for key, value in fields.items():
+        pattern = r'("%s"\s*:\s*)("(?:[^"\\]|\\.)*"|null|\[[^\[\]{}]*\])' % re.escape(key)
+        matches = list(re.finditer(pattern, text))
+        if len(matches) != 1:
+            return None
+        m = matches[0]
+        sep = ", " if ", " in m.group(2) else ","
+        text = (text[:m.start(2)] + json.dumps(value, separators=(sep, ":"))
+                + text[m.end(2):])
+    parsed = json.loads(text)
+    return text if all(parsed.get(k) == v for k, v in fields.items()) else None
+
+
+def _write_spore(path, spore, fields):
+    """
+    Set `fields` in one spore file atomically, keeping its layout (see
+    splice_fields). Returns False if it had to be re-serialised instead.
+    """
+    with open(path, encoding="utf-8") as f:
+        text = splice_fields(f.read(), fields)
+    spliced = text is not None
+    if not spliced:
+        text = json.dumps({**spore, **fields}, separators=(",", ":"))
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w", encoding="utf-8", newline="") as f:
+            f.write(text)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+    return spliced
+
+
+def migrate_spores(spore_dir, basis, chain_dir=None, batch=MIGRATE_BATCH, dry_run=False,
+                   workers=None):
+    """
+    Re-encode every spore whose basis_hash differs from basis. Returns a
+    summary: spores scanned, stale per old basis_hash (and whether that
+    basis is in the chain), migrated count and saturated coefficients.
+    """
+    fnames = sorted(f for f in os.listdir(spore_dir) if f.endswith(".json"))
+    chained = {e["basis_hash"] for e in load_chain(chain_dir)} if chain_dir else set()
+    target = basis["basis_hash"]
+    stale_by_hash = Counter()
+    migrated = saturated = rejected = reformatted = 0
+    for i in range(0, len(fnames), batch):
+        loaded = spore_loader.load_spore_files(spore_dir, fnames[i:i + batch], workers=workers)
+        rejected += len(loaded.rejects)
+        stale = [(f, s) for f, s in zip(loaded.files, loaded.spores)
+                 if s.get("basis_hash") != target]
+        stale_by_hash.update(s.get("basis_hash") or "(none)" for _, s in stale)
+        if not stale or dry_run:
+            continue
+        t1, t3, sat = encode_spore_codes([s["amplitudes"] for _, s in stale], basis)
+        saturated += sat
+        for (fname, s), c1, c3 in zip(stale, t1, t3):
+            fields = {"basis_hash": target, "delta_tier1": c1.tolist(),
+                      "delta_tier3": c3.tolist()}
+            if not _write_spore(os.path.join(spore_dir, fname), s, fields):
+                reformatted += 1
+        migrated += len(stale)
+    return {
+        "scanned": len(fnames),
+        "rejected": rejected,
+        "target_basis": target,
+        "stale": {h: {"spores": n, "in_chain": h in chained} for h, n in stale_by_hash.items()},
+        "migrated": migrated,
+        "reformatted": reformatted,
+        "saturated": saturated,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Migrate spores to the current delta-basis")
+    parser.add_argument("--spores", default="wave-spores")
+    parser.add_argument("--data", default="docs/data", help="Directory with delta-basis.json")
+    parser.add_argument("--dry-run", action="store_true", help="Only report stale spores")
+    parser.add_argument("--rotations", action="store_true",
+                        help="(Re)write chain <-> current rotation matrices")
+    parser.add_argument("--batch", type=int, default=MIGRATE_BATCH)
+    parser.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    with open(os.path.join(args.data, "delta-basis.json")) as f:
+        basis = json.load(f)
+    chain_dir = os.path.join(args.data, CHAIN_DIR)
+
+    if args.rotations:
+        n = write_rotations(basis, chain_dir)
+        print(f"Wrote {n} rotation matrices in {chain_dir}")
+        for entry in load_chain(chain_dir):
+            if entry["basis_hash"] != basis["basis_hash"]:
+                rot = rotation_for(chain_dir, entry["basis_hash"], basis["basis_hash"], basis)
+                fid = rot.fidelity()
+                print(f"  {entry['basis_hash']} -> {basis['basis_hash']}: "
+                      f"tier1 fidelity {fid[:TIER1_WIDTH].mean():.4f}, "
+                      f"tier3 {fid.mean():.4f}")
+
+    summary = migrate_spores(args.spores, basis, chain_dir, args.batch, args.dry_run, args.workers)
+    print(f"Scanned {summary['scanned']} spores ({summary['rejected']} rejected), "
+          f"target basis {summary['target_basis']}")
+    for h, st in sorted(summary["stale"].items(), key=lambda kv: -kv[1]["spores"]):
+        print(f"  stale on {h}: {st['spores']} spores"
+              + (" (rotation available)" if st["in_chain"] else ""))
+    if args.dry_run:
+        print("Dry run: no files written")
+    else:
+        print(f"Migrated {summary['migrated']} spores "
+              f"({summary['saturated']} coefficients saturated, "
+              f"{summary['reformatted']} re-serialised)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,516 @@
+"""
+Benchmark suite for the index pipeline (regenerate-indexes.py) and the lens
+geometry analysis (analysis/lens_geometry.py) on synthetic corpora.
+
+Synthetic spores have realistic 200D amplitude spectra: a barycenter plus
+coefficients on a random orthonormal basis whose variances follow the
+current corpus (one dominant mode, then a ~k^-0.92 power law), drawn around
+Zipf-weighted basins, with tags, tiers and scores shaped like real spores.
+The same seed gives the same corpus on every commit.
+
+Each corpus size runs in its own subprocess, one stage after another:
+  stream_spores                regenerate-indexes.py full-rebuild path: N written
+                               JSON files parsed and fanned out into SporeSinks
+                               (files are written untimed; above --max-load the
+                               in-memory spores are fed to the sinks untimed)
+  compute_delta_basis_streaming
+  encode_tiers
+  write:<output>               one stage per output (delta-basis.json,
+                               tier1-index.json, ...): rendered and written
+                               atomically into a temp directory, one after
+                               another (regenerate-indexes.py renders them
+                               concurrently, so the sum exceeds its wall time)
+  build_matrix / center_and_normalize                 lens_geometry.py
+  fit_basins                   analysis/basins.py, mini-batch k-means on the
+                               delta-basis coefficients
+  find_gap_directions_coulomb  fixed --coulomb-steps (tol=0)
+  proteins_near_direction      --queries single-direction queries
+  build_knn_graph              analysis/connectome.py, top-k all pairs
+                               (skipped above --max-knn)
+
+Every stage reports wall time, RSS growth and peak RSS while it ran (the
+peak is reset per stage through /proc/self/clear_refs on Linux; elsewhere it
+is the process peak so far). A size whose process dies (e.g. OOM-killed) or
+runs past --timeout is reported with the stage it stopped in. Between sizes,
+each stage's scaling exponent log(t2/t1)/log(n2/n1) is printed; clearly
+superlinear stages are marked as cliffs.
+
+Results are written as JSON. With --baseline (an earlier results file),
+stages slower or heavier than the baseline by more than --threshold are
+flagged as regressions and the exit status is 1.
+
+Usage: python scripts/benchmark.py [--sizes 10000,100000,1000000] [--output FILE]
+                                   [--baseline FILE] [--threshold 0.25]
+                                   [--amplitudes list|array] [--max-load N]
+                                   [--max-knn N] [--timeout SECONDS]
+"""
+
+import argparse
+import gc
+import importlib.util
+import io
+import json
+import math
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta, timezone
+
+import numpy as np
+
+from generations import write_atomic
+from instrumentation import peak_rss_mb, reset_peak_rss, rss_mb
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+ANALYSIS_DIR = os.path.join(SCRIPTS_DIR, "..", "analysis")
+
+RESULTS_VERSION = 1
+DEFAULT_SIZES = (10_000, 100_000)
+DEFAULT_OUTPUT = "benchmark-results.json"
+MAX_LOAD = 100_000          # largest corpus written to disk for the load stage
+MAX_KNN = 100_000           # largest corpus for the quadratic kNN graph stage
+COULOMB_STEPS = 200
+QUERIES = 64
+SIZE_TIMEOUT = 3600
+THRESHOLD = 0.25            # relative slowdown / growth flagged as a regression
+MIN_SECONDS = 0.05          # ...ignoring stages faster than this in both runs
+MIN_MB = 16.0
+CLIFF_EXPONENT = 1.3        # time grows faster than n^1.3 between two sizes
+
+# Spectrum of the current corpus (docs/data/delta-basis.json eigenvalues)
+N_DIMS = 200
+SPECTRUM_HEAD = 0.0594      # leading mode
+SPECTRUM_NEXT = 0.0031      # mode 2; later modes fall off as k^-SPECTRUM_DECAY
+SPECTRUM_DECAY = 0.92
+BARYCENTER_NORM = 0.52
+N_BASINS = 24
+BASIN_SHARE = 0.64          # fraction of each mode's variance between basins
+TAG_VOCAB = 4000
+TIER_WEIGHTS = {"reference": 0.75, "core": 0.13, "convergence": 0.12}
+SYSTEM_TAGS = ("#public", "#embed:gemini", "#synthesis:v4.5", "#embed:nomic-v1.5")
+
+WRITE_PREFIX = "write:"      # per-output stages, named after the output
+STAGES = (
+    "stream_spores", "compute_delta_basis_streaming", "encode_tiers", WRITE_PREFIX,
+    "build_matrix", "center_and_normalize", "fit_basins",
+    "find_gap_directions_coulomb", "proteins_near_direction",
+    "build_knn_graph",
+)
+
+
+def stage_names(result):
+    """STAGES in run order, with the write:<output> stages recorded for this result."""
+    names = []
+    for stage in STAGES:
+        if stage == WRITE_PREFIX:
+            writes = [s for s in result["stages"] if s.startswith(WRITE_PREFIX)]
+            names.extend(writes or [stage])
+        else:
+            names.append(stage)
+    return names
+
+
+# ── Synthetic corpus ──────────────────────────────────────────────────────────
+
+def spectrum(n_dims=N_DIMS):
+    """Per-mode variances of the synthetic distribution."""
+    k = np.arange(1, n_dims, dtype=np.float64)
+    return np.concatenate([[SPECTRUM_HEAD], SPECTRUM_NEXT * k ** -SPECTRUM_DECAY])
+
+
+def synthetic_amplitudes(n, seed=0, chunk=65536):
+    """
+    N x 200 float64 amplitudes: barycenter + basin center + spread, in a
+    random orthonormal basis, with the corpus' per-mode variances.
+    Also returns each row's basin.
+    """
+    rng = np.random.default_rng(seed)
+    basis, _ = np.linalg.qr(rng.standard_normal((N_DIMS, N_DIMS)))
+    bary = rng.standard_normal(N_DIMS)
+    bary *= BARYCENTER_NORM / np.linalg.norm(bary)
+    sigma = np.sqrt(spectrum())
+    centers = rng.standard_normal((N_BASINS, N_DIMS)) * sigma * math.sqrt(BASIN_SHARE)
+    weights = 1.0 / np.arange(1, N_BASINS + 1)
+    basins = rng.choice(N_BASINS, size=n, p=weights / weights.sum())
+
+    A = np.empty((n, N_DIMS))
+    spread = sigma * math.sqrt(1 - BASIN_SHARE)
+    for lo in range(0, n, chunk):
+        hi = min(lo + chunk, n)
+        coeffs = centers[basins[lo:hi]] + rng.standard_normal((hi - lo, N_DIMS)) * spread
+        A[lo:hi] = bary + coeffs @ basis.T
+    return A, basins
+
+
+def synthetic_spores(n, seed=0, as_lists=True):
+    """
+    Spore dicts shaped like wave-spores/*.json. Amplitudes are Python lists
+    (as parsed from JSON) or, with as_lists=False, rows of one float64 matrix.
+    """
+    A, basins = synthetic_amplitudes(n, seed)
+    rng = np.random.default_rng(seed + 1)
+    tiers = rng.choice(list(TIER_WEIGHTS), size=n, p=list(TIER_WEIGHTS.values()))
+    coherence = np.round(np.clip(rng.normal(0.85, 0.08, n), 0, 1), 2)
+    scores = np.round(rng.uniform(0, 1, (n, 5)), 4)
+    n_tags = rng.poisson(6.5, n)
+    # Zipf-distributed topics, skewed per basin so tags correlate with geometry
+    topics = (rng.zipf(1.3, n_tags.sum()) % TAG_VOCAB
+              + np.repeat(basins * 37, n_tags)) % TAG_VOCAB
+    ends = np.cumsum(n_tags)
+    id_bytes = rng.bytes(16 * n)
+    start = datetime(2026, 1, 1, tzinfo=timezone.utc)
+
+    spores = []
+    for i in range(n):
+        topic_tags = [f"#topic{t}" for t in topics[ends[i] - n_tags[i]:ends[i]]]
+        amps = A[i].tolist() if as_lists else A[i]
+        spores.append({
+            "id": str(uuid.UUID(bytes=id_bytes[16 * i:16 * i + 16])),
+            "tags": list(SYSTEM_TAGS) + topic_tags + [f"#dna:doc_{basins[i]}_txt"],
+            "tier": str(tiers[i]),
+            "coherence_score": float(coherence[i]),
+            "amplitudes": amps,
+            "energy": float(np.linalg.norm(A[i])),
+            "basis_hash": "synthetic0000000",
+            "model": "gemini",
+            "created_at": (start + timedelta(seconds=int(i))).isoformat(),
+            "mesh_id": "meshseed",
+            "shimmer_s5": float(scores[i, 0]),
+            "resonance_score": float(scores[i, 1]),
+            "shimmer_s2b": float(scores[i, 2]),
+            "shimmer_s3": float(scores[i, 3]),
+            "shimmer_composite": float(scores[i, 4]),
+        })
+    return spores
+
+
+def write_spore_files(spores, spore_dir):
+    """Write spores as compact JSON files (like wave-spores/); returns the filenames."""
+    fnames = []
+    for s in spores:
+        fname = f"{s['id']}.json"
+        amps = s["amplitudes"]
+        doc = {**s, "amplitudes": amps if isinstance(amps, list) else amps.tolist()}
+        with open(os.path.join(spore_dir, fname), "w") as f:
+            json.dump(doc, f, separators=(",", ":"))
+        fnames.append(fname)
+    return sorted(fnames)
+
+
+# ── Pipeline modules ──────────────────────────────────────────────────────────
+
+def _load_module(name, path):
+    spec = importlib.util.spec_from_file_location(name, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+# ── One corpus size (runs in a child process) ─────────────────────────────────
+
+def run_size(n, emit, seed=0, as_lists=True, max_load=MAX_LOAD,
+             coulomb_steps=COULOMB_STEPS, queries=QUERIES, max_knn=MAX_KNN):
+    """Run every stage on an n-spore corpus, passing one record per stage to emit."""
+    sys.path.insert(0, SCRIPTS_DIR)
+    sys.path.insert(0, ANALYSIS_DIR)
+    import spore_loader
+    import lens_geometry
+    import basins
+    import connectome
+    regen = _load_module("regenerate_indexes", os.path.join(SCRIPTS_DIR, "regenerate-indexes.py"))
+
+    def timed(stage, fn, **extra):
+        gc.collect()
+        scope = "stage" if reset_peak_rss() else "process"
+        rss0 = rss_mb()
+        t0 = time.perf_counter()
+        with redirect_stdout(io.StringIO()):
+            result = fn()
+        secs = time.perf_counter() - t0
+        rss1 = rss_mb()
+        emit({"stage": stage, "seconds": round(secs, 6),
+              "us_per_spore": round(secs / n * 1e6, 3),
+              "rss_mb": round(rss1, 1), "rss_delta_mb": round(rss1 - rss0, 1),
+              "peak_rss_mb": round(peak_rss_mb(), 1), "peak_scope": scope, **extra})
+        return result
+
+    t0 = time.perf_counter()
+    spores = synthetic_spores(n, seed, as_lists)
+    emit({"stage": "generate", "seconds": round(time.perf_counter() - t0, 6),
+          "rss_mb": round(rss_mb(), 1), "untimed": True})
+
+    # The full-rebuild pipeline, spooling and writing into a scratch OUTPUT_DIR
+    out_dir = tempfile.mkdtemp(prefix="spore-bench-out-")
+    regen.OUTPUT_DIR = out_dir
+    sinks = regen.SporeSinks(n)
+    try:
+        if n <= max_load:
+            tmp = tempfile.mkdtemp(prefix="spore-bench-")
+            try:
+                fnames = write_spore_files(spores, tmp)
+                regen.SPORE_DIR = tmp
+                timed("stream_spores", lambda: regen.stream_spores(sinks, fnames))
+            finally:
+                shutil.rmtree(tmp, ignore_errors=True)
+        else:
+            emit({"stage": "stream_spores", "skipped": f"n > --max-load ({max_load})"})
+            chunk = spore_loader.CHUNK_SIZE
+            for lo in range(0, n, chunk):
+                part = spores[lo:lo + chunk]
+                sinks.add([s["id"] + ".json" for s in part], part)
+        assert sinks.n == n, f"{sinks.n} of {n} spores streamed"
+
+        basis = timed("compute_delta_basis_streaming",
+                      lambda: regen.compute_delta_basis_streaming(sinks.pca))
+        basis["quantization"] = regen.quantize.quantization_record(
+            basis["eigenvalues"], len(basis["eigenvectors"]))
+        codes, _ = timed("encode_tiers",
+                         lambda: regen.encode_tiers(sinks.amplitudes[:sinks.n], basis))
+
+        out = regen.GenerationWriter(out_dir)
+        out.add("delta-basis.json", regen.compact_json(basis))
+        sinks.stage_outputs(out, basis, codes)
+        for name, data in out.outputs.items():
+            path = os.path.join(out_dir, name)
+            timed(WRITE_PREFIX + name,
+                  lambda: write_atomic(path, data() if callable(data) else data))
+        del out, codes
+    finally:
+        sinks.close()
+        shutil.rmtree(out_dir, ignore_errors=True)
+    del sinks
+
+    A = timed("build_matrix", lambda: lens_geometry.build_matrix(spores))
+    unit_dirs, bary = timed("center_and_normalize", lambda: lens_geometry.center_and_normalize(A))
+    timed("fit_basins",
+          lambda: basins.Basins.fit(A, [s["id"] for s in spores], basis, basins.K_DEFAULT),
+          k=basins.K_DEFAULT, modes=basins.MODES_DEFAULT)
+    del A, basis
+    n_lenses = lens_geometry.N_LENSES_DEFAULT
+    lenses = timed("find_gap_directions_coulomb",
+                   lambda: lens_geometry.find_gap_directions_coulomb(
+                       unit_dirs, n_lenses, n_steps=coulomb_steps, tol=0),
+                   steps=coulomb_steps, lenses=n_lenses)
+    rng = np.random.default_rng(seed + 2)
+    directions = np.vstack([lenses, rng.standard_normal((max(0, queries - len(lenses)), N_DIMS))])
+    timed("proteins_near_direction",
+          lambda: [lens_geometry.proteins_near_direction(d, unit_dirs, spores)
+                   for d in directions[:queries]],
+          queries=queries)
+
+    if n <= max_knn:
+        ids = [s["id"] for s in spores]
+        timed("build_knn_graph",
+              lambda: connectome.Connectome.build(unit_dirs, ids, bary, connectome.K_DEFAULT),
+              k=connectome.K_DEFAULT, pairs=n * n)
+    else:
+        emit({"stage": "build_knn_graph", "skipped": f"n > --max-knn ({max_knn})"})
+
+
+def _child_main(args):
+    with open(args.child_results, "a") as out:
+        def emit(record):
+            out.write(json.dumps(record) + "\n")
+            out.flush()
+        run_size(args.child, emit, args.seed, args.amplitudes == "list", args.max_load,
+                 args.coulomb_steps, args.queries, args.max_knn)
+
+
+def benchmark_size(n, args):
+    """Run one size in a subprocess; returns its result dict even if it died."""
+    fd, path = tempfile.mkstemp(prefix="spore-bench-", suffix=".jsonl")
+    os.close(fd)
+    cmd = [sys.executable, os.path.abspath(__file__), "--child", str(n),
+           "--child-results", path, "--seed", str(args.seed),
+           "--amplitudes", args.amplitudes, "--max-load", str(args.max_load),
+           "--coulomb-steps", str(args.coulomb_steps), "--queries", str(args.queries),
+           "--max-knn", str(args.max_knn)]
+    try:
+        try:
+            proc = subprocess.run(cmd, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                                  text=True, timeout=args.timeout or None)
+            returncode, stderr = proc.returncode, proc.stderr
+        except subprocess.TimeoutExpired:
+            returncode, stderr = None, ""
+        with open(path) as f:
+            records = [json.loads(line) for line in f if line.strip()]
+    finally:
+        os.unlink(path)
+
+    result = {"n": n, "status": "ok", "stages": {}}
+    for r in records:
+        result["stages"][r.pop("stage")] = r
+    if returncode != 0:
+        missing = [s for s in ["generate"] + stage_names(result) if s not in result["stages"]]
+        died_in = missing[0] if missing else None
+        if returncode is None:
+            error = f"timed out after {args.timeout:.0f}s"
+        elif returncode < 0:
+            error = f"killed by signal {-returncode} (out of memory?)"
+        else:
+            error = (stderr.strip().splitlines() or [f"exit code {returncode}"])[-1]
+        result["status"] = f"failed in {died_in}: {error}"
+    return result
+
+
+# ── Reporting and comparison ──────────────────────────────────────────────────
+
+def _git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=SCRIPTS_DIR,
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def print_size(result):
+    print(f"\n{result['n']:,} spores: {result['status']}")
+    print(f"  {'stage':<40}{'seconds':>10}{'us/spore':>11}{'RSS +MB':>10}{'peak MB':>10}")
+    for stage in ["generate"] + stage_names(result):
+        r = result["stages"].get(stage)
+        if r is None:
+            continue
+        if "skipped" in r:
+            print(f"  {stage:<40}{'skipped: ' + r['skipped']:>41}")
+        elif r.get("untimed"):
+            print(f"  {stage + ' (setup)':<40}{r['seconds']:>10.3f}{'':>21}{r['rss_mb']:>10.0f}")
+        else:
+            print(f"  {stage:<40}{r['seconds']:>10.3f}{r['us_per_spore']:>11.2f}"
+                  f"{r['rss_delta_mb']:>10.1f}{r['peak_rss_mb']:>10.0f}"
+                  + (f"  {r['pairs'] / r['seconds']:,.0f} pairs/s" if r.get("pairs") else ""))
+
+
+def scaling(results):
+    """Per-stage exponent b of t ~ n^b between consecutive sizes."""
+    rows = []
+    ordered = sorted(results, key=lambda r: r["n"])
+    for a, b in zip(ordered, ordered[1:]):
+        for stage in stage_names(b):
+            ra, rb = a["stages"].get(stage, {}), b["stages"].get(stage, {})
+            if "seconds" not in ra or "seconds" not in rb or ra["seconds"] <= 0:
+                continue
+            exponent = math.log(rb["seconds"] / ra["seconds"]) / math.log(b["n"] / a["n"])
+            rows.append({"stage": stage, "from": a["n"], "to": b["n"],
+                         "exponent": round(exponent, 3), "cliff": exponent > CLIFF_EXPONENT})
+    return rows
+
+
+def compare(current, baseline, threshold=THRESHOLD):
+    """Regressions of a results dict against a baseline results dict."""
+    flagged = []
+    for key, base in baseline["sizes"].items():
+        cur = current["sizes"].get(key)
+        if cur is None:
+            continue
+        if base["status"] == "ok" and cur["status"] != "ok":
+            flagged.append({"n": int(key), "stage": None, "kind": "failure",
+                            "detail": cur["status"]})
+        for stage, b in base["stages"].items():
+            c = cur["stages"].get(stage)
+            if c is None or "seconds" not in b or "seconds" not in c or b.get("untimed"):
+                continue
+            if (c["seconds"] > b["seconds"] * (1 + threshold)
+                    and max(c["seconds"], b["seconds"]) >= MIN_SECONDS):
+                flagged.append({"n": int(key), "stage": stage, "kind": "time",
+                                "baseline": b["seconds"], "current": c["seconds"],
+                                "ratio": round(c["seconds"] / max(b["seconds"], 1e-9), 2)})
+            if ("peak_rss_mb" in b and "peak_rss_mb" in c
+                    and c["peak_rss_mb"] > b["peak_rss_mb"] * (1 + threshold)
+                    and c["peak_rss_mb"] - b["peak_rss_mb"] >= MIN_MB):
+                flagged.append({"n": int(key), "stage": stage, "kind": "memory",
+                                "baseline": b["peak_rss_mb"], "current": c["peak_rss_mb"],
+                                "ratio": round(c["peak_rss_mb"] / b["peak_rss_mb"], 2)})
+    return flagged
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the index pipeline and lens geometry")
+    parser.add_argument("--sizes", default=",".join(str(n) for n in DEFAULT_SIZES),
+                        help="Comma-separated corpus sizes (e.g. 10000,100000,1000000)")
+    parser.add_argument("--output", default=DEFAULT_OUTPUT, help="Results JSON to write")
+    parser.add_argument("--baseline", default=None, help="Earlier results JSON to compare against")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD,
+                        help="Relative slowdown/growth flagged as a regression")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--amplitudes", choices=("list", "array"), default="list",
+                        help="Spore amplitudes as JSON-parsed lists (realistic) or matrix rows")
+    parser.add_argument("--max-load", type=int, default=MAX_LOAD,
+                        help="Largest corpus written to disk for the load stage")
+    parser.add_argument("--coulomb-steps", type=int, default=COULOMB_STEPS)
+    parser.add_argument("--max-knn", type=int, default=MAX_KNN,
+                        help="Largest corpus for the kNN graph stage (quadratic)")
+    parser.add_argument("--queries", type=int, default=QUERIES)
+    parser.add_argument("--timeout", type=float, default=SIZE_TIMEOUT,
+                        help="Seconds before one corpus size is abandoned (0 = no limit)")
+    parser.add_argument("--child", type=int, default=None, help=argparse.SUPPRESS)
+    parser.add_argument("--child-results", default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child is not None:
+        _child_main(args)
+        return
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    results = {
+        "version": RESULTS_VERSION,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "commit": _git_commit(),
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "config": {"seed": args.seed, "amplitudes": args.amplitudes, "max_load": args.max_load,
+                   "coulomb_steps": args.coulomb_steps, "queries": args.queries,
+                   "max_knn": args.max_knn},
+        "sizes": {},
+    }
+    for n in sizes:
+        print(f"Benchmarking {n:,} spores...", flush=True)
+        result = benchmark_size(n, args)
+        results["sizes"][str(n)] = result
+        print_size(result)
+        with open(args.output, "w") as f:  # keep finished sizes if a later one hangs
+            json.dump(results, f, indent=2)
+
+    results["scaling"] = scaling(list(results["sizes"].values()))
+    if results["scaling"]:
+        print("\nScaling (t ~ n^b):")
+        for r in results["scaling"]:
+            mark = "  <- cliff" if r["cliff"] else ""
+            print(f"  {r['stage']:<40}{r['from']:>9,} -> {r['to']:<9,} b = {r['exponent']:.2f}{mark}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline.get("config") != results["config"]:
+            print(f"\nWarning: baseline config differs: {baseline.get('config')}")
+        results["baseline"] = {"path": args.baseline, "commit": baseline.get("commit")}
+        results["regressions"] = compare(results, baseline, args.threshold)
+
+    with open(args.output, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"\nWritten: {args.output}")
+
+    if args.baseline:
+        flagged = results["regressions"]
+        print(f"\nAgainst {args.baseline} (commit {baseline.get('commit')}): "
+              f"{len(flagged)} regression(s) over {args.threshold:.0%}")
+        for r in flagged:
+            if r["kind"] == "failure":
+                print(f"  {r['n']:,}: {r['detail']}")
+            else:
+                unit = "s" if r["kind"] == "time" else " MB"
+                print(f"  {r['n']:,} {r['stage']}: {r['kind']} {r['baseline']}{unit} -> "
+                      f"{r['current']}{unit} (x{r['ratio']})")
+        if flagged:
+            raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Near-duplicate spore detection for the index pipeline.
+
+Repeated synthesis leaves spores whose amplitudes are (nearly) identical.
+They are found without comparing all pairs:
+
+  1. SimHash LSH: BANDS tables, each hashing a spore's centred amplitude
+     direction to BAND_BITS signs of random hyperplanes. Two spores at
+     angle t agree on one bit with probability 1 - t/pi, so a near-
+     duplicate pair shares at least one band key almost surely while an
+     unrelated pair almost never does.
+  2. Spores sharing a band key are candidates; each bucket is scored with
+     exact cosines (>= threshold), equal-sized buckets in one batched matmul.
+  3. Confirmed pairs are joined into clusters (union-find). Each cluster's
+     canonical spore is the oldest one (created_at, then id).
+
+regenerate-indexes.py runs this on every full rebuild and writes
+docs/data/duplicate-clusters.json (the cluster report) and, with
+--canonical-map, docs/data/canonical-ids.json ({duplicate id: canonical
+id}). Duplicates are reported, not removed.
+
+Usage: python scripts/dedup.py [--spores DIR] [--threshold 0.98] [--exact]
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+THRESHOLD = 0.98          # exact cosine (centred amplitudes) of a near-duplicate
+BANDS = 24
+BAND_BITS = 20
+SEED = 0
+HASH_BLOCK = 65536        # rows hashed at a time
+SCORE_BLOCK = 1 << 22     # floats per stack of bucket Gram matrices
+REPORT_FILE = "duplicate-clusters.json"
+CANONICAL_FILE = "canonical-ids.json"
+
+
+def unit_directions(amplitudes, barycenter, lo=0, hi=None):
+    """Rows lo:hi of the amplitudes, centred and unit-normalised (float32)."""
+    D = np.asarray(amplitudes[lo:hi], dtype=np.float32) - np.asarray(barycenter, dtype=np.float32)
+    norms = np.linalg.norm(D, axis=1, keepdims=True)
+    return D / np.where(norms < 1e-10, 1.0, norms)
+
+
+def band_keys(amplitudes, barycenter, bands=BANDS, band_bits=BAND_BITS, seed=SEED,
+              block=HASH_BLOCK):
+    """(N x bands) uint32 SimHash keys, band_bits hyperplane signs each."""
+    n, d = len(amplitudes), len(barycenter)
+    planes = np.random.default_rng(seed).standard_normal((d, bands * band_bits)).astype(np.float32)
+    weights = (1 << np.arange(band_bits, dtype=np.uint32))
+    keys = np.empty((n, bands), dtype=np.uint32)
+    for lo in range(0, n, block):
+        bits = (unit_directions(amplitudes, barycenter, lo, lo + block) @ planes) > 0
+        keys[lo:lo + block] = bits.reshape(-1, bands, band_bits) @ weights
+    return keys
+
+
+def band_matches(X, keys, threshold=THRESHOLD, block=SCORE_BLOCK):
+    """
+    Pairs (i, j), i < j, sharing a key in one band with cosine >= threshold,
+    and the number of pairs scored. X holds the unit directions. Buckets of
+    equal size are scored together as a stack of small Gram matrices, so
+    large buckets (dense regions of the corpus) cost a matmul, not a pair list.
+    """
+    n = len(keys)
+    order = np.argsort(keys, kind="stable")
+    k = keys[order]
+    starts = np.flatnonzero(np.r_[True, k[1:] != k[:-1]])
+    sizes = np.diff(np.r_[starts, n])
+    found, scored = [], 0
+    for size in np.unique(sizes[sizes > 1]):
+        heads = starts[sizes == size]
+        a, c = np.triu_indices(size, 1)
+        scored += len(heads) * len(a)
+        step = max(1, block // (size * (size + X.shape[1])))
+        for lo in range(0, len(heads), step):
+            rows = order[heads[lo:lo + step, None] + np.arange(size)]
+            V = X[rows]
+            S = (V @ V.transpose(0, 2, 1))[:, a, c]
+            b, p = np.nonzero(S >= threshold)
+            i, j = rows[b, a[p]], rows[b, c[p]]
+            found.append(np.stack([np.minimum(i, j), np.maximum(i, j)], axis=1))
+    if not found:
+        return np.zeros((0, 2), dtype=np.int64), scored
+    return np.concatenate(found).astype(np.int64), scored
+
+
+def candidate_matches(X, keys, threshold=THRESHOLD):
+    """Unique pairs (i, j), i < j, at cosine >= threshold sharing any band key; plus pairs scored."""
+    n = len(X)
+    found, scored = [], 0
+    for b in range(keys.shape[1]):
+        pairs, m = band_matches(X, keys[:, b], threshold)
+        found.append(pairs[:, 0] * n + pairs[:, 1])
+        scored += m
+    pairs = np.unique(np.concatenate(found)) if found else np.zeros(0, dtype=np.int64)
+    return np.stack([pairs // n, pairs % n], axis=1), scored
+
+
+def exact_pairs(amplitudes, barycenter, threshold=THRESHOLD, block=2048):
+    """All pairs at or above threshold by blocked all-pairs scan (for checking recall)."""
+    X = unit_directions(amplitudes, barycenter)
+    found = []
+    for lo in range(0, len(X), block):
+        S = X[lo:lo + block] @ X.T
+        i, j = np.nonzero(S >= threshold)
+        i += lo
+        sel = i < j
+        found.append(np.stack([i[sel], j[sel]], axis=1))
+    return np.concatenate(found) if found else np.zeros((0, 2), dtype=np.int64)
+
+
+def clusters(n, pairs):
+    """Connected components of the confirmed pairs: list of sorted row arrays (size > 1)."""
+    parent = np.arange(n)
+
+    def find(x):
+        root = x
+        while parent[root] != root:
+            root = parent[root]
+        while parent[x] != root:
+            parent[x], x = root, parent[x]
+        return root
+
+    for i, j in pairs:
+        ri, rj = find(i), find(j)
+        if ri != rj:
+            parent[max(ri, rj)] = min(ri, rj)
+    groups = {}
+    for x in np.unique(pairs):
+        groups.setdefault(find(x), []).append(int(x))
+    return [np.array(g) for g in groups.values()]
+
+
+def find_duplicates(amplitudes, barycenter, ids, created_at=None, threshold=THRESHOLD,
+                    bands=BANDS, band_bits=BAND_BITS, seed=SEED):
+    """
+    Near-duplicate clusters of an N x d amplitude matrix (rows follow ids).
+    Returns (report dict, {duplicate id: canonical id}).
+    """
+    n = len(ids)
+    keys = band_keys(amplitudes, barycenter, bands, band_bits, seed)
+    X = unit_directions(amplitudes, barycenter)
+    pairs, scored = candidate_matches(X, keys, threshold)
+    del keys
+
+    report_clusters, canonical = [], {}
+    created_at = created_at if created_at is not None else [""] * n
+    for rows in clusters(n, pairs):
+        rows = sorted(rows.tolist(), key=lambda r: (created_at[r] or "\uffff", ids[r]))
+        head = rows[0]
+        members = []
+        for r, c in zip(rows[1:], X[rows[1:]] @ X[head]):
+            canonical[ids[r]] = ids[head]
+            members.append({"id": ids[r], "cos": round(float(c), 6)})
+        report_clusters.append({"canonical": ids[head], "size": len(rows), "duplicates": members})
+    report_clusters.sort(key=lambda c: (-c["size"], c["canonical"]))
+
+    report = {
+        "spore_count": n,
+        "threshold": threshold,
+        "lsh": {"bands": bands, "band_bits": band_bits, "seed": seed},
+        "pairs_scored": int(scored),
+        "confirmed_pairs": int(len(pairs)),
+        "cluster_count": len(report_clusters),
+        "redundant_spores": len(canonical),
+        "clusters": report_clusters,
+    }
+    return report, canonical
+
+
+def main():
+    import spore_loader
+
+    parser = argparse.ArgumentParser(description="Find near-duplicate wave spores")
+    parser.add_argument("--spores", default="wave-spores")
+    parser.add_argument("--threshold", type=float, default=THRESHOLD)
+    parser.add_argument("--bands", type=int, default=BANDS)
+    parser.add_argument("--band-bits", type=int, default=BAND_BITS)
+    parser.add_argument("--exact", action="store_true",
+                        help="Also run the all-pairs scan and report LSH recall")
+    parser.add_argument("--top", type=int, default=10, help="Clusters to list")
+    args = parser.parse_args()
+
+    loaded = spore_loader.load_spore_dir(args.spores)
+    loaded.report()
+    spores = loaded.spores
+    A = np.array([s["amplitudes"] for s in spores], dtype=np.float32)
+    bary = A.astype(np.float64).mean(axis=0)
+    ids = [s["id"] for s in spores]
+    t0 = time.perf_counter()
+    report, canonical = find_duplicates(A, bary, ids, [s.get("created_at", "") for s in spores],
+                                        args.threshold, args.bands, args.band_bits)
+    print(f"{report['pairs_scored']:,} LSH pairs scored, {report['confirmed_pairs']} at "
+          f"cos >= {args.threshold}: {report['cluster_count']} clusters, "
+          f"{report['redundant_spores']} redundant spores ({time.perf_counter() - t0:.2f}s)")
+    for c in report["clusters"][:args.top]:
+        print(f"  {c['canonical']}  x{c['size']}")
+    if args.exact:
+        t0 = time.perf_counter()
+        truth = exact_pairs(A, bary, args.threshold)
+        pairs, _ = candidate_matches(unit_directions(A, bary),
+                                     band_keys(A, bary, args.bands, args.band_bits), args.threshold)
+        found = {(int(i), int(j)) for i, j in pairs}
+        hit = sum((int(i), int(j)) in found for i, j in truth)
+        print(f"Exact scan: {len(truth)} pairs in {time.perf_counter() - t0:.2f}s; "
+              f"LSH recall {hit / max(len(truth), 1):.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,265 @@
+"""
+Atomic, generation-based writer for the docs/data outputs.
+
+All outputs of one regeneration are rendered concurrently into a staging
+directory, fsynced, and only then made visible together:
+
+  docs/data/.generations/<id>/        one complete, consistent output set
+  docs/data/current -> .generations/<id>
+  docs/data/<name>  -> current/<name>  (so existing paths keep working)
+
+Switching `current` is a single atomic symlink replace, so a reader never
+sees a half-written file or a delta-basis.json from one run next to a
+tier1-index.json from another; the previous `keep` generations stay on disk
+for rollback. Readers that open several files and need them to agree should
+resolve `current` once (os.path.realpath) and read from that directory.
+
+With keep=0 (the default) there are no generations: each file is still
+written to a temp file, fsynced and renamed over the old one, so files are
+never torn, but a set can be mixed while it is being replaced. The same
+happens where symlinks are unavailable.
+
+Generations are meant for serving hosts, not for the repository checkout:
+they turn the tracked docs/data files into symlinks into .generations/
+(which, like `current`, is gitignored), so a commit made after such a run
+would replace the outputs with dangling links. Regenerate with keep=0
+before committing docs/data.
+
+A generation holds only the files written through GenerationWriter.
+rollback() moves `current` back but does not restore the state kept next
+to them (shards/, basis-chain/, delta-basis-state.npz, .regen-manifest.json),
+so that state describes the newest generation, not the rolled-back one;
+regenerate-indexes.py therefore runs a full rebuild instead of
+--incremental while is_rolled_back() (see there).
+
+Usage: python scripts/generations.py [--data DIR] list | rollback [ID]
+"""
+
+import argparse
+import os
+import shutil
+import stat
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+GEN_DIR = ".generations"
+CURRENT = "current"
+STAGING_SUFFIX = ".staging"
+FILE_MODE = 0o644
+
+
+def fsync_dir(path):
+    """Flush a directory entry (renames) to disk; a no-op where unsupported."""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class Stream:
+    """
+    An output written by write(f) into the open text file instead of being
+    rendered to one string first, for outputs too large to hold in memory.
+    """
+
+    def __init__(self, write):
+        self.write = write
+
+
+def _write_synced(path, data):
+    mode = "wb" if isinstance(data, bytes) else "w"
+    with open(path, mode, encoding=None if isinstance(data, bytes) else "utf-8") as f:
+        if isinstance(data, Stream):
+            data.write(f)
+        else:
+            f.write(data)
+        f.flush()
+        os.fsync(f.fileno())
+    return os.path.getsize(path)
+
+
+def write_atomic(path, data):
+    """Write str/bytes (or a Stream) to path via temp file + fsync + rename; returns the size."""
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp = tempfile.mkstemp(dir=directory, prefix=".tmp-")
+    os.close(fd)
+    try:
+        size = _write_synced(tmp, data)
+        # mkstemp creates 0600; keep the replaced file's mode (served files must stay readable)
+        os.chmod(tmp, stat.S_IMODE(os.stat(path).st_mode) if os.path.isfile(path) else FILE_MODE)
+        os.replace(tmp, path)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.unlink(tmp)
+        raise
+    fsync_dir(directory)
+    return size
+
+
+def _replace_symlink(target, link):
+    """Point `link` at `target` atomically (new symlink renamed over the old)."""
+    tmp = f"{link}.tmp-{os.getpid()}"
+    if os.path.lexists(tmp):
+        os.unlink(tmp)
+    os.symlink(target, tmp)
+    os.replace(tmp, link)
+
+
+def _symlinks_supported(directory):
+    probe = os.path.join(directory, f".symlink-probe-{os.getpid()}")
+    try:
+        os.symlink(".", probe)
+    except (OSError, NotImplementedError):
+        return False
+    os.unlink(probe)
+    return True
+
+
+def generations(output_dir):
+    """Generation ids on disk, oldest first."""
+    root = os.path.join(output_dir, GEN_DIR)
+    if not os.path.isdir(root):
+        return []
+    return sorted(g for g in os.listdir(root) if not g.endswith(STAGING_SUFFIX))
+
+
+def current_generation(output_dir):
+    link = os.path.join(output_dir, CURRENT)
+    if not os.path.islink(link):
+        return None
+    return os.path.basename(os.readlink(link))
+
+
+def is_rolled_back(output_dir):
+    """True if `current` points at a generation older than the newest one."""
+    gens = generations(output_dir)
+    cur = current_generation(output_dir)
+    return cur is not None and bool(gens) and cur != gens[-1]
+
+
+class GenerationWriter:
+    """
+    Collects named outputs (str/bytes, or callables that render them) and
+    commits them as one generation.
+    """
+
+    def __init__(self, output_dir, keep=0):
+        self.output_dir = output_dir
+        self.keep = keep
+        self.outputs = {}
+        self.notes = {}
+
+    def add(self, name, data, note=None):
+        """
+        Stage an output: str/bytes, a zero-argument callable rendering it,
+        or a Stream that writes it directly.
+        """
+        self.outputs[name] = data
+        if note:
+            self.notes[name] = note
+
+    def _render_into(self, directory, write):
+        def job(item):
+            name, data = item
+            rendered = data() if callable(data) else data
+            return name, write(os.path.join(directory, name), rendered)
+        with ThreadPoolExecutor(max_workers=max(1, min(8, len(self.outputs)))) as pool:
+            sizes = dict(pool.map(job, self.outputs.items()))
+        return {name: (os.path.join(self.output_dir, name), sizes[name]) for name in self.outputs}
+
+    def commit(self):
+        """Write everything; returns {name: (path, size)} in the order added."""
+        os.makedirs(self.output_dir, exist_ok=True)
+        if self.keep <= 0 or not _symlinks_supported(self.output_dir):
+            return self._render_into(self.output_dir, write_atomic)
+
+        root = os.path.join(self.output_dir, GEN_DIR)
+        os.makedirs(root, exist_ok=True)
+        gen_id = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%S%fZ")
+        staging = os.path.join(root, gen_id + STAGING_SUFFIX)
+        os.makedirs(staging)
+        try:
+            # Outputs not re-rendered this time carry over from the current
+            # generation, so every generation is a complete set.
+            cur = current_generation(self.output_dir)
+            if cur is not None:
+                for name in os.listdir(os.path.join(root, cur)):
+                    if name not in self.outputs:
+                        shutil.copy2(os.path.join(root, cur, name), os.path.join(staging, name))
+            written = self._render_into(staging, _write_synced)
+            fsync_dir(staging)
+            final = os.path.join(root, gen_id)
+            os.rename(staging, final)
+            fsync_dir(root)
+        except BaseException:
+            shutil.rmtree(staging, ignore_errors=True)
+            raise
+
+        _replace_symlink(os.path.join(GEN_DIR, gen_id), os.path.join(self.output_dir, CURRENT))
+        for name in os.listdir(final):
+            top = os.path.join(self.output_dir, name)
+            if not os.path.islink(top):
+                _replace_symlink(os.path.join(CURRENT, name), top)
+        fsync_dir(self.output_dir)
+        self.prune()
+        return written
+
+    def prune(self):
+        """Drop generations beyond the current one plus `keep` previous ones."""
+        gens = generations(self.output_dir)
+        cur = current_generation(self.output_dir)
+        older = [g for g in gens if g != cur]
+        for g in older[:max(0, len(older) - self.keep)]:
+            shutil.rmtree(os.path.join(self.output_dir, GEN_DIR, g), ignore_errors=True)
+
+
+def rollback(output_dir, gen_id=None):
+    """
+    Point `current` at gen_id (default: the generation before current).
+    Only the generation's files switch back; see the module docstring.
+    """
+    gens = generations(output_dir)
+    cur = current_generation(output_dir)
+    if gen_id is None:
+        older = [g for g in gens if cur is None or g < cur]
+        if not older:
+            raise ValueError("no earlier generation to roll back to")
+        gen_id = older[-1]
+    if gen_id not in gens:
+        raise ValueError(f"unknown generation {gen_id}")
+    _replace_symlink(os.path.join(GEN_DIR, gen_id), os.path.join(output_dir, CURRENT))
+    fsync_dir(output_dir)
+    return gen_id
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Inspect / roll back docs/data generations")
+    parser.add_argument("--data", default="docs/data")
+    sub = parser.add_subparsers(dest="command", required=True)
+    sub.add_parser("list", help="List generations")
+    rb = sub.add_parser("rollback", help="Point current at an earlier generation")
+    rb.add_argument("generation", nargs="?", default=None)
+    args = parser.parse_args()
+
+    if args.command == "list":
+        cur = current_generation(args.data)
+        for g in generations(args.data):
+            files = os.listdir(os.path.join(args.data, GEN_DIR, g))
+            print(f"{'*' if g == cur else ' '} {g}  ({len(files)} files)")
+    else:
+        print(f"current -> {rollback(args.data, args.generation)}")
+        if is_rolled_back(args.data):
+            print("Note: shards/, basis-chain/, delta-basis-state.npz and the regen manifest "
+                  "still describe the newest generation; regenerate-indexes.py --incremental "
+                  "will do a full rebuild until a newer generation is written")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+"""
+Streaming delta-PCA state for the delta-basis.
+
+Keeps the running count, mean and co-moment matrix (sum of outer products of
+deviations) of all amplitude vectors seen so far. Folding in b spores costs
+O(b d^2) regardless of corpus size; the basis is recovered from a d x d
+eigendecomposition of the covariance instead of an SVD over every spore.
+
+Spores can only be added: the old amplitudes of a changed or removed spore
+are no longer on disk, so such a spore marks the state inexact instead
+(regenerate-indexes.py then measures drift by churn, not from the state).
+
+Eigenvalues/eigenvectors match an SVD of the centred amplitude matrix
+(S^2/(n-1) and rows of Vt) up to floating-point error and the sign of each
+eigenvector.
+"""
+
+import io
+import os
+import zipfile
+
+import numpy as np
+
+from generations import write_atomic
+
+STATE_FILE = "delta-basis-state.npz"
+
+
+class IncrementalPCA:
+    """Running mean / co-moment of amplitude vectors (pairwise batch merge)."""
+
+    def __init__(self, n_dims=200):
+        self.n = 0
+        self.mean = np.zeros(n_dims)
+        self.m2 = np.zeros((n_dims, n_dims))
+        # False once a spore was changed/removed without its old amplitudes
+        self.exact = True
+
+    @staticmethod
+    def _batch_moments(rows):
+        X = np.atleast_2d(np.asarray(rows, dtype=np.float64))
+        mean = X.mean(axis=0)
+        D = X - mean
+        return len(X), mean, D.T @ D
+
+    def add(self, rows):
+        """Fold a batch of amplitude rows (b x d) into the state."""
+        if len(rows) == 0:
+            return
+        nb, mb, m2b = self._batch_moments(rows)
+        n = self.n + nb
+        delta = mb - self.mean
+        self.m2 += m2b + np.outer(delta, delta) * (self.n * nb / n)
+        self.mean += delta * (nb / n)
+        self.n = n
+
+    def covariance(self):
+        return self.m2 / max(self.n - 1, 1)
+
+    def components(self, n_components):
+        """
+        Returns (barycenter, eigenvectors [k x d], eigenvalues [k], total_var)
+        with eigenvalues in descending order.
+        """
+        cov = self.covariance()
+        w, V = np.linalg.eigh(cov)
+        order = np.argsort(w)[::-1]
+        k = min(n_components, self.n, len(w))
+        w = np.maximum(w[order[:k]], 0.0)
+        evecs = V[:, order[:k]].T
+        # Deterministic sign: largest-magnitude coordinate positive
+        pivot = np.abs(evecs).argmax(axis=1)
+        evecs *= np.sign(evecs[np.arange(k), pivot])[:, None]
+        return self.mean.copy(), evecs, w, float(np.trace(cov))
+
+    def drift(self, barycenter, eigenvectors, n_modes):
+        """
+        How far the live state has moved from a published basis.
+
+        Returns (barycenter_shift, subspace_drift): the barycenter displacement
+        in units of total std-dev, and the fraction of the basis' leading
+        n_modes subspace no longer spanned by the live leading n_modes.
+        """
+        _, evecs, _, total_var = self.components(n_modes)
+        shift = float(np.linalg.norm(self.mean - np.asarray(barycenter))
+                      / np.sqrt(max(total_var, 1e-30)))
+        old = np.asarray(eigenvectors)[:n_modes]
+        overlap = float(np.sum((old @ evecs.T) ** 2)) / max(len(old), 1)
+        return shift, 1.0 - overlap
+
+    def save(self, path):
+        """Persist the state atomically (temp file + fsync + rename)."""
+        buf = io.BytesIO()
+        np.savez(buf, n=self.n, mean=self.mean, m2=self.m2, exact=self.exact)
+        write_atomic(path, buf.getvalue())
+
+    @classmethod
+    def load(cls, path):
+        """Load persisted state, or None if there is none or it is unreadable."""
+        if not os.path.exists(path):
+            return None
+        try:
+            with np.load(path) as data:
+                pca = cls(len(data["mean"]))
+                pca.n = int(data["n"])
+                pca.mean = data["mean"].copy()
+                pca.m2 = data["m2"].copy()
+                pca.exact = bool(data["exact"])
+        except (OSError, ValueError, KeyError, EOFError, zipfile.BadZipFile):
+            return None
+        return pca
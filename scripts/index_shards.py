@@ -0,0 +1,283 @@
+"""
+Sharded, content-addressed publishing of the per-spore docs/data indexes,
+with patches between regenerations for differential federation sync.
+
+Layout (under docs/data/shards/):
+  manifest.json                       index sha256s, envelopes, shard hashes
+  <index>/<prefix>.<hash>.json        entries of one index whose id starts
+                                      with <prefix> (PREFIX_LEN chars)
+  patches/<from>-<to>.json            added / removed / changed entries
+                                      between two published manifests
+
+A shard file is named after the hash of its contents, so an unchanged shard
+keeps its name and a peer only fetches shards whose hash differs from its
+own manifest. Shards, patches and the manifest are written atomically, and
+an existing shard is only reused after its contents are checked against
+its name (a damaged one is rewritten). A patch turns the previous full index files into the new ones
+byte-for-byte (checked against the sha256s it carries), so sync cost scales
+with the change rather than with the corpus.
+
+Usage:
+  python scripts/index_shards.py publish [--data DIR]
+  python scripts/index_shards.py apply OLD_DIR PATCH [--out DIR]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+from datetime import datetime, timezone
+
+from generations import write_atomic
+
+SHARD_DIR = "shards"
+MANIFEST_FILE = "manifest.json"
+PATCH_DIR = "patches"
+SHARD_VERSION = 1
+PREFIX_LEN = 2
+PATCH_KEEP = 16
+
+# Per-spore outputs: how each one splits into (envelope, [(id, entry)])
+INDEXES = {
+    "tier1-index.json": "list",
+    "wave-spore-index.json": "list",
+    "spore-metrics-for-proteins.json": "dict",
+    "spore-index-compact.txt": "lines",
+}
+
+
+def _dumps(obj):
+    """Serialise exactly like regenerate-indexes.py compact_json()."""
+    return json.dumps(obj, indent=None, separators=(",", ":"))
+
+
+def _sha(data):
+    return hashlib.sha256(data if isinstance(data, bytes) else data.encode("utf-8")).hexdigest()
+
+
+def split(name, content):
+    """Parse one index file's text into (envelope, [(id, entry), ...])."""
+    kind = INDEXES[name]
+    if kind == "lines":
+        lines = content.splitlines()
+        header = [l for l in lines if l.startswith("#")]
+        return {"header": header}, [(l.split("|", 1)[0], l) for l in lines
+                                    if l and not l.startswith("#")]
+    obj = json.loads(content)
+    if kind == "dict":
+        return {}, list(obj.items())
+    return {k: v for k, v in obj.items() if k != "spores"}, [(e["id"], e) for e in obj["spores"]]
+
+
+def join(name, envelope, entries):
+    """Inverse of split(): the index file text."""
+    kind = INDEXES[name]
+    if kind == "lines":
+        return "\n".join(envelope["header"] + [e for _, e in entries]) + "\n"
+    if kind == "dict":
+        return _dumps(dict(entries))
+    return _dumps({**envelope, "spores": [e for _, e in entries]})
+
+
+def shard_key(spore_id):
+    return spore_id[:PREFIX_LEN].lower()
+
+
+def _shard_path(shard_root, name, prefix, digest):
+    return os.path.join(shard_root, name.rsplit(".", 1)[0], f"{prefix}.{digest}.json")
+
+
+def _read_shard(shard_root, name, prefix, digest):
+    with open(_shard_path(shard_root, name, prefix, digest)) as f:
+        return [tuple(e) for e in json.load(f)["entries"]]
+
+
+def load_manifest(shard_root):
+    try:
+        with open(os.path.join(shard_root, MANIFEST_FILE)) as f:
+            manifest = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return None
+    return manifest if manifest.get("version") == SHARD_VERSION else None
+
+
+def _intact(path, digest):
+    """True if the shard file at path exists and its contents hash to digest."""
+    try:
+        with open(path, "rb") as f:
+            return _sha(f.read())[:16] == digest
+    except FileNotFoundError:
+        return False
+
+
+def _diff(old_entries, new_entries, new_order):
+    """Patch lists for one index; `after` is each added id's predecessor in new_order."""
+    old = dict(old_entries)
+    new = dict(new_entries)
+    pred = {sid: (new_order[i - 1] if i else None) for i, sid in enumerate(new_order)}
+    removed = [sid for sid in old if sid not in new]
+    changed = [[sid, e] for sid, e in new_entries if sid in old and _dumps(old[sid]) != _dumps(e)]
+    added = [[sid, pred[sid], e] for sid, e in new_entries if sid not in old]
+    return removed, changed, added
+
+
+def publish(data_dir):
+    """
+    Shard the current per-spore outputs in data_dir, write the manifest and,
+    if a previous manifest exists, the patch from it. Only shards whose hash
+    changed are read back from the previous publish. Returns a summary dict.
+    """
+    shard_root = os.path.join(data_dir, SHARD_DIR)
+    previous = load_manifest(shard_root)
+    indexes, patch_indexes = {}, {}
+    written = reused = 0
+    for name in INDEXES:
+        with open(os.path.join(data_dir, name), "rb") as f:
+            raw = f.read()
+        envelope, entries = split(name, raw.decode("utf-8"))
+        by_shard = {}
+        for sid, e in entries:
+            by_shard.setdefault(shard_key(sid), []).append((sid, e))
+
+        shards = {}
+        os.makedirs(os.path.join(shard_root, name.rsplit(".", 1)[0]), exist_ok=True)
+        for prefix in sorted(by_shard):
+            text = _dumps({"index": name, "prefix": prefix, "entries": by_shard[prefix]})
+            digest = _sha(text)[:16]
+            path = _shard_path(shard_root, name, prefix, digest)
+            if _intact(path, digest):
+                reused += 1
+            else:
+                write_atomic(path, text)
+                written += 1
+            shards[prefix] = {"hash": digest, "count": len(by_shard[prefix]), "bytes": len(text)}
+        indexes[name] = {"sha256": _sha(raw), "bytes": len(raw), "count": len(entries),
+                         "envelope": envelope, "shards": shards}
+
+        old = previous["indexes"].get(name) if previous else None
+        if old is not None:
+            old_shards = old["shards"]
+            dirty = {p for p in set(shards) | set(old_shards)
+                     if shards.get(p, {}).get("hash") != old_shards.get(p, {}).get("hash")}
+            old_entries = [e for p in sorted(dirty & set(old_shards))
+                           for e in _read_shard(shard_root, name, p, old_shards[p]["hash"])]
+            new_entries = [e for p in sorted(dirty & set(shards)) for e in by_shard[p]]
+            removed, changed, added = _diff(old_entries, new_entries, [sid for sid, _ in entries])
+            patch_indexes[name] = {"from_sha256": old["sha256"], "to_sha256": indexes[name]["sha256"],
+                                   "envelope": envelope, "removed": removed,
+                                   "changed": changed, "added": added}
+
+    manifest = {
+        "version": SHARD_VERSION,
+        "manifest_id": _sha(_dumps({n: i["sha256"] for n, i in indexes.items()}))[:16],
+        "generated_at": datetime.now(timezone.utc).isoformat(),
+        "prefix_len": PREFIX_LEN,
+        "indexes": indexes,
+        "patches": previous.get("patches", []) if previous else [],
+    }
+
+    patch_summary = None
+    if previous and previous["manifest_id"] != manifest["manifest_id"]:
+        patch = {"version": SHARD_VERSION, "from": previous["manifest_id"],
+                 "to": manifest["manifest_id"], "generated_at": manifest["generated_at"],
+                 "indexes": patch_indexes}
+        text = _dumps(patch)
+        os.makedirs(os.path.join(shard_root, PATCH_DIR), exist_ok=True)
+        fname = f"{patch['from']}-{patch['to']}.json"
+        write_atomic(os.path.join(shard_root, PATCH_DIR, fname), text)
+        patch_summary = {"from": patch["from"], "to": patch["to"],
+                         "file": f"{PATCH_DIR}/{fname}", "bytes": len(text)}
+        manifest["patches"] = [patch_summary] + manifest["patches"][:PATCH_KEEP - 1]
+
+    write_atomic(os.path.join(shard_root, MANIFEST_FILE), _dumps(manifest))
+    removed_files = _collect_garbage(shard_root, manifest)
+    return {"manifest_id": manifest["manifest_id"], "shards_written": written,
+            "shards_reused": reused, "shards_removed": removed_files, "patch": patch_summary}
+
+
+def _collect_garbage(shard_root, manifest):
+    """Delete shard and patch files the manifest no longer references."""
+    keep = {os.path.normpath(_shard_path(shard_root, name, p, s["hash"]))
+            for name, idx in manifest["indexes"].items() for p, s in idx["shards"].items()}
+    keep |= {os.path.normpath(os.path.join(shard_root, p["file"])) for p in manifest["patches"]}
+    n = 0
+    for sub in [n.rsplit(".", 1)[0] for n in INDEXES] + [PATCH_DIR]:
+        d = os.path.join(shard_root, sub)
+        if not os.path.isdir(d):
+            continue
+        for fname in os.listdir(d):
+            path = os.path.normpath(os.path.join(d, fname))
+            if path not in keep:
+                os.remove(path)
+                n += 1
+    return n
+
+
+def apply_patch(old_dir, patch, out_dir=None):
+    """
+    Rebuild the new index files from the previous ones in old_dir plus a
+    patch dict. Each input and output is checked against the patch sha256s.
+    Writes into out_dir (default: old_dir) and returns the file names.
+    """
+    out_dir = out_dir or old_dir
+    results = {}
+    for name, p in patch["indexes"].items():
+        with open(os.path.join(old_dir, name), "rb") as f:
+            raw = f.read()
+        if _sha(raw) != p["from_sha256"]:
+            raise ValueError(f"{name}: local file does not match patch base {patch['from']}")
+        _, entries = split(name, raw.decode("utf-8"))
+
+        removed = set(p["removed"])
+        changed = dict(p["changed"])
+        after = {}
+        for sid, pred, e in p["added"]:
+            after.setdefault(pred, []).append((sid, e))
+        kept = [(sid, changed.get(sid, e)) for sid, e in entries if sid not in removed]
+
+        # Emit kept entries in order, each followed (depth first) by the
+        # entries added right after it; added entries can follow other added ones.
+        out = []
+        stack = list(reversed(kept)) + list(reversed(after.get(None, [])))
+        while stack:
+            sid, e = stack.pop()
+            out.append((sid, e))
+            stack.extend(reversed(after.get(sid, [])))
+
+        text = join(name, p["envelope"], out)
+        if _sha(text) != p["to_sha256"]:
+            raise ValueError(f"{name}: patched result does not match {patch['to']}")
+        results[name] = text
+    os.makedirs(out_dir, exist_ok=True)
+    for name, text in results.items():
+        with open(os.path.join(out_dir, name), "w") as f:
+            f.write(text)
+    return sorted(results)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Sharded index publishing / patch apply")
+    sub = parser.add_subparsers(dest="command", required=True)
+    pub = sub.add_parser("publish", help="Shard current outputs and emit a patch")
+    pub.add_argument("--data", default="docs/data")
+    app = sub.add_parser("apply", help="Apply a patch to a directory of index files")
+    app.add_argument("old_dir")
+    app.add_argument("patch")
+    app.add_argument("--out", default=None, help="Output directory (default: in place)")
+    args = parser.parse_args()
+
+    if args.command == "publish":
+        st = publish(args.data)
+        print(f"Published manifest {st['manifest_id']}: {st['shards_written']} shards written, "
+              f"{st['shards_reused']} unchanged, {st['shards_removed']} removed")
+        if st["patch"]:
+            print(f"  Patch {st['patch']['file']} ({st['patch']['bytes']:,} bytes)")
+    else:
+        with open(args.patch) as f:
+            patch = json.load(f)
+        names = apply_patch(args.old_dir, patch, args.out)
+        print(f"Applied {patch['from']} -> {patch['to']}: {', '.join(names)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,357 @@
+"""
+Stage-level instrumentation for the pipeline entry points
+(regenerate-indexes.py, analysis/lens_geometry.py).
+
+Off by default; an entry point opts in with add_arguments(parser) and runs
+its body inside session(job, args). Code anywhere in the process can then
+record:
+  span(name)        context manager timing a block (spans nest: "full/load")
+  stage(name)       ends the previous stage() at this level and starts the
+                    next one, for long linear functions split by comments
+  count(name, n)    monotonic counter, optionally with labels
+  gauge(name, v)    last value wins
+  event(name, ...)  one-off structured record (JSON lines only)
+
+Every span records wall time, RSS growth and peak RSS while it was open
+(the kernel's peak mark is reset per span on Linux; nested spans fold their
+peaks into their parents). Process-pool workers are not included.
+
+Outputs, selected by flag:
+  --metrics PATH [--metrics-format jsonl|prom]
+      jsonl: one JSON object per span/event as it closes, then counters,
+             gauges and a run record; appended, so a nightly log accumulates
+      prom:  a Prometheus text-file (node_exporter textfile collector),
+             replaced atomically at the end of the run
+  --profile PATH [--profiler cprofile|pyinstrument]
+      cProfile stats (pstats format) or a pyinstrument report (HTML when
+      PATH ends in .html, text otherwise; needs pyinstrument installed)
+
+With no flags, every call is a no-op.
+"""
+
+import json
+import os
+import resource
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime, timezone
+
+from generations import write_atomic
+
+PROM_PREFIX = "eidolon"
+FORMATS = ("jsonl", "prom")
+PROFILERS = ("cprofile", "pyinstrument")
+
+_recorder = None
+
+
+# ── Memory ────────────────────────────────────────────────────────────────────
+
+def _status_kb(field):
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return None
+
+
+def _maxrss_mb():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+def rss_mb():
+    """Current resident set size in MB."""
+    kb = _status_kb("VmRSS")
+    return kb / 1024 if kb is not None else _maxrss_mb()
+
+
+def peak_rss_mb():
+    """Peak resident set size in MB since start (or the last reset_peak_rss())."""
+    kb = _status_kb("VmHWM")
+    return kb / 1024 if kb is not None else _maxrss_mb()
+
+
+def reset_peak_rss():
+    """Reset the kernel's peak-RSS mark (Linux); False where unsupported."""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+# ── Recorder ──────────────────────────────────────────────────────────────────
+
+class _Span:
+    def __init__(self, path, labels, sequential):
+        self.path = path
+        self.labels = labels
+        self.sequential = sequential
+        self.start = time.perf_counter()
+        self.rss = rss_mb()
+        self.peak = self.rss
+
+
+class Recorder:
+    """Collects spans, counters and gauges for one run of a job."""
+
+    def __init__(self, job, metrics_path=None, metrics_format="jsonl"):
+        self.job = job
+        self.metrics_path = metrics_path
+        self.metrics_format = metrics_format
+        self.run_id = f"{datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%SZ')}-{os.getpid()}"
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.stack = []
+        self.spans = []
+        self.counters = {}
+        self.gauges = {}
+        self.peak = rss_mb()
+        self.peak_scope = "span" if reset_peak_rss() else "process"
+        self._out = None
+        if metrics_path and metrics_format == "jsonl":
+            self._out = open(metrics_path, "a")
+
+    def _emit(self, record):
+        if self._out is not None:
+            self._out.write(json.dumps({"job": self.job, "run_id": self.run_id, **record}) + "\n")
+            self._out.flush()
+
+    def _fold_peak(self):
+        """Fold the current peak mark into every open span, then reset it."""
+        peak = peak_rss_mb()
+        for s in self.stack:
+            s.peak = max(s.peak, peak)
+        self.peak = max(self.peak, peak)
+        reset_peak_rss()
+
+    def open(self, name, labels=None, sequential=False):
+        self._fold_peak()
+        parent = self.stack[-1].path + "/" if self.stack else ""
+        self.stack.append(_Span(parent + name, labels or {}, sequential))
+
+    def _close_top(self):
+        self._fold_peak()
+        s = self.stack.pop()
+        secs = time.perf_counter() - s.start
+        rss = rss_mb()
+        record = {"type": "span", "name": s.path, "seconds": round(secs, 6),
+                  "rss_mb": round(rss, 1), "rss_delta_mb": round(rss - s.rss, 1),
+                  "peak_rss_mb": round(s.peak, 1), "peak_scope": self.peak_scope, **s.labels}
+        self.spans.append(record)
+        self._emit(record)
+
+    def stage(self, name, labels=None):
+        if self.stack and self.stack[-1].sequential:
+            self._close_top()
+        self.open(name, labels, sequential=True)
+
+    def close_span(self, path):
+        """Close the span at `path`, ending any stage() opened inside it."""
+        while self.stack and self.stack[-1].path != path:
+            self._close_top()
+        if self.stack:
+            self._close_top()
+
+    def count(self, name, value=1, labels=None):
+        key = (name, tuple(sorted((labels or {}).items())))
+        self.counters[key] = self.counters.get(key, 0) + value
+
+    def gauge(self, name, value, labels=None):
+        self.gauges[(name, tuple(sorted((labels or {}).items())))] = value
+
+    def event(self, name, fields):
+        self._emit({"type": "event", "name": name,
+                    "t": round(time.perf_counter() - self.start, 6), **fields})
+
+    def finish(self, status="ok"):
+        while self.stack:
+            self._close_top()
+        self._fold_peak()
+        secs = time.perf_counter() - self.start
+        run = {"type": "run", "status": status, "seconds": round(secs, 6),
+               "peak_rss_mb": round(self.peak, 1),
+               "started_at": datetime.fromtimestamp(self.started_at, timezone.utc).isoformat()}
+        if self._out is not None:
+            for kind, values in (("counter", self.counters), ("gauge", self.gauges)):
+                for (name, labels), value in values.items():
+                    self._emit({"type": kind, "name": name, "value": value, **dict(labels)})
+            self._emit(run)
+            self._out.close()
+            self._out = None
+        elif self.metrics_path and self.metrics_format == "prom":
+            write_atomic(self.metrics_path, self.prometheus(run))
+        return run
+
+    def prometheus(self, run):
+        """The run as Prometheus text exposition format."""
+        lines = []
+
+        def metric(name, kind, help_text, samples):
+            full = f"{PROM_PREFIX}_{name}"
+            lines.append(f"# HELP {full} {help_text}")
+            lines.append(f"# TYPE {full} {kind}")
+            for labels, value in samples:
+                lines.append(f"{full}{_prom_labels({'job': self.job, **labels})} {_prom_value(value)}")
+
+        # A span entered several times (e.g. in a loop) is one series: total time, max peak
+        stages = {}
+        for s in self.spans:
+            seconds, peak = stages.get(s["name"], (0.0, 0.0))
+            stages[s["name"]] = (seconds + s["seconds"], max(peak, s["peak_rss_mb"]))
+        metric("stage_duration_seconds", "gauge", "Wall time of one pipeline stage in the last run.",
+               [({"stage": n}, v[0]) for n, v in stages.items()])
+        metric("stage_peak_rss_bytes", "gauge", "Peak resident memory while the stage ran.",
+               [({"stage": n}, round(v[1] * 2 ** 20)) for n, v in stages.items()])
+        metric("run_duration_seconds", "gauge", "Wall time of the last run.", [({}, run["seconds"])])
+        metric("run_peak_rss_bytes", "gauge", "Peak resident memory of the last run.",
+               [({}, round(run["peak_rss_mb"] * 2 ** 20))])
+        metric("run_success", "gauge", "1 if the last run finished without an error.",
+               [({}, int(run["status"] == "ok"))])
+        metric("run_last_timestamp_seconds", "gauge", "Start time of the last run (unix).",
+               [({}, self.started_at)])
+        for (name, kind, values) in (("total", "counter", self.counters), ("", "gauge", self.gauges)):
+            by_name = {}
+            for (n, labels), value in values.items():
+                by_name.setdefault(n, []).append((dict(labels), value))
+            for n, samples in sorted(by_name.items()):
+                metric(f"{n}_{name}" if name else n, kind, f"{n.replace('_', ' ')} in the last run.",
+                       samples)
+        return "\n".join(lines) + "\n"
+
+
+def _prom_value(value):
+    return str(value) if isinstance(value, int) else repr(float(value))
+
+
+def _prom_labels(labels):
+    def esc(v):
+        return str(v).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+    return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in labels.items()) + "}"
+
+
+# ── Module API ────────────────────────────────────────────────────────────────
+
+def enabled():
+    return _recorder is not None
+
+
+@contextmanager
+def span(name, **labels):
+    """Time a block as a span nested under the innermost open span."""
+    if _recorder is None:
+        yield
+        return
+    _recorder.open(name, labels)
+    path = _recorder.stack[-1].path
+    try:
+        yield
+    finally:
+        _recorder.close_span(path)
+
+
+def stage(name, **labels):
+    """End the previous stage() at this nesting level and start `name`."""
+    if _recorder is not None:
+        _recorder.stage(name, labels)
+
+
+def count(name, value=1, **labels):
+    if _recorder is not None:
+        _recorder.count(name, value, labels)
+
+
+def gauge(name, value, **labels):
+    if _recorder is not None:
+        _recorder.gauge(name, value, labels)
+
+
+def event(name, **fields):
+    if _recorder is not None:
+        _recorder.event(name, fields)
+
+
+def add_arguments(parser):
+    """Add the --metrics / --profile flags to an entry point's parser."""
+    group = parser.add_argument_group("instrumentation")
+    group.add_argument("--metrics", default=None,
+                       help="Write stage timings, counters and peak memory to this file")
+    group.add_argument("--metrics-format", choices=FORMATS, default=None,
+                       help="jsonl (appended JSON lines) or prom (Prometheus text-file); "
+                            "default: prom for *.prom paths, else jsonl")
+    group.add_argument("--profile", default=None,
+                       help="Profile the whole run and write the result to this file")
+    group.add_argument("--profiler", choices=PROFILERS, default="cprofile")
+
+
+class _Profiler:
+    def __init__(self, kind, path):
+        self.path = path
+        self.kind = kind
+        if kind == "pyinstrument":
+            try:
+                from pyinstrument import Profiler
+            except ImportError:  # pragma: no cover - depends on environment
+                print("pyinstrument is not installed; profiling with cProfile instead")
+                self.kind = "cprofile"
+            else:
+                self.profiler = Profiler()
+        if self.kind == "cprofile":
+            import cProfile
+            self.profiler = cProfile.Profile()
+
+    def start(self):
+        self.profiler.enable() if self.kind == "cprofile" else self.profiler.start()
+
+    def stop(self):
+        if self.kind == "cprofile":
+            self.profiler.disable()
+            self.profiler.dump_stats(self.path)
+            return
+        self.profiler.stop()
+        if self.path.endswith(".html"):
+            write_atomic(self.path, self.profiler.output_html())
+        else:
+            write_atomic(self.path, self.profiler.output_text(unicode=True))
+
+
+@contextmanager
+def session(job, args):
+    """
+    Run the body of an entry point with instrumentation per its parsed
+    add_arguments() flags; the run record is written even if the body raises.
+    """
+    global _recorder
+    metrics = getattr(args, "metrics", None)
+    profile = getattr(args, "profile", None)
+    if not metrics and not profile:
+        yield
+        return
+    if metrics:
+        fmt = args.metrics_format or ("prom" if metrics.endswith(".prom") else "jsonl")
+        metrics = os.path.abspath(metrics)
+        _recorder = Recorder(job, metrics, fmt)
+    profiler = _Profiler(args.profiler, os.path.abspath(profile)) if profile else None
+    if profiler:
+        profiler.start()
+    status = "ok"
+    try:
+        yield
+    except BaseException as e:
+        status = f"error: {type(e).__name__}"
+        raise
+    finally:
+        if profiler:
+            profiler.stop()
+            print(f"Profile written: {profiler.path} ({profiler.kind})")
+        if _recorder is not None:
+            run = _recorder.finish(status)
+            _recorder = None
+            print(f"Metrics written: {metrics} ({fmt}, {run['seconds']:.2f}s, "
+                  f"peak RSS {run['peak_rss_mb']:.0f} MB)")
@@ -0,0 +1,79 @@
+"""
+Streaming writers for the large compact-JSON / text outputs of
+regenerate-indexes.py.
+
+Entries are serialised one at a time into a Spool (an unnamed temp file)
+while spores stream past; once the pass is over and the envelope fields
+that depend on every entry (counts, averages) are known, the document is
+written as envelope + spooled body without ever holding the entry list.
+
+The result is byte-identical to json.dumps(obj, separators=(",", ":")) of
+the equivalent in-memory object.
+
+Usage (as a module):
+    spool = Spool(directory)
+    for e in entries: spool.add(dumps(e))
+    write_envelope(f, {"total": n}, "spores", spool)
+"""
+
+import json
+import shutil
+import tempfile
+
+COPY_BUFFER = 1 << 20
+
+
+def dumps(obj):
+    """Compact JSON, matching regenerate-indexes.py compact_json()."""
+    return json.dumps(obj, indent=None, separators=(",", ":"))
+
+
+class Spool:
+    """Separator-joined serialised items in an unnamed temporary file."""
+
+    def __init__(self, directory=None, sep=","):
+        # On the output filesystem rather than /tmp, which may be RAM-backed
+        self.file = tempfile.TemporaryFile("w+", dir=directory, encoding="utf-8", newline="")
+        self.sep = sep
+        self.count = 0
+
+    def add(self, text):
+        if self.count:
+            self.file.write(self.sep)
+        self.file.write(text)
+        self.count += 1
+
+    def add_item(self, key, value):
+        """Add one "key":value member of a JSON object."""
+        self.add(dumps(key) + ":" + dumps(value))
+
+    def lines(self):
+        """Iterate the items back (sep="\\n" spools of single-line items only)."""
+        self.file.flush()
+        self.file.seek(0)
+        for line in self.file:
+            yield line.rstrip("\n")
+
+    def copy_to(self, f):
+        self.file.flush()
+        self.file.seek(0)
+        shutil.copyfileobj(self.file, f, COPY_BUFFER)
+
+    def close(self):
+        self.file.close()
+
+
+def write_envelope(f, envelope, key, spool):
+    """Write {**envelope, key: [spooled items]} as compact JSON."""
+    head = dumps(envelope)[:-1]
+    f.write(head + ("," if envelope else "") + dumps(key) + ":[")
+    spool.copy_to(f)
+    f.write("]}")
+
+
+def write_object(f, spool):
+    """Write the spooled "key":value members as one compact JSON object."""
+    f.write("{")
+    spool.copy_to(f)
+    f.write("}")
+
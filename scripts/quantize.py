@@ -0,0 +1,237 @@
+"""
+Quantizers for delta-PCA tier coefficients.
+
+Schemes:
+  - global     one scale (QUANT_SCALE) for every mode, int16 -- the original
+               encoding, still the default
+  - per-mode   int16 with scale_i = 32767 / (CLIP_SIGMAS_INT16 * sqrt(eigenvalue_i)),
+               so every mode spends its range on its own spread
+  - int8       per-mode as above but int8, clipping at CLIP_SIGMAS_INT8
+  - pq         product quantization: the modes are split into sub-vectors,
+               each replaced by the id of one of 256 k-means centroids (uint8)
+
+The scales in use are recorded in delta-basis.json ("quantization"), so any
+reader can dequantize codes as codes / scales. Saturated (clipped)
+coefficients are counted rather than silently dropped.
+
+Usage: python scripts/quantize.py [--data DIR] [--spores DIR | --store DIR]
+                                  [--modes 32] [--k 20]
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+QUANT_SCALE = 10000
+CLIP_SIGMAS_INT16 = 16.0  # leading modes reach ~12 sigma on the current corpus
+CLIP_SIGMAS_INT8 = 4.0
+SCHEMES = ("global", "per-mode")  # schemes regenerate-indexes.py can write
+INT_RANGE = {16: (-32768, 32767), 8: (-128, 127)}
+PQ_SUBSPACES = 8
+PQ_CENTROIDS = 256
+PQ_ITERS = 15
+
+
+def mode_scales(eigenvalues, n_modes, scheme="per-mode", bits=16):
+    """Quantization scale per mode (coefficient * scale -> integer code)."""
+    if scheme == "global":
+        return np.full(n_modes, float(QUANT_SCALE))
+    clip_sigmas = CLIP_SIGMAS_INT16 if bits == 16 else CLIP_SIGMAS_INT8
+    sigma = np.sqrt(np.maximum(np.asarray(eigenvalues[:n_modes], dtype=np.float64), 1e-30))
+    return INT_RANGE[bits][1] / (clip_sigmas * sigma)
+
+
+def quantization_record(eigenvalues, n_modes, scheme="global"):
+    """The delta-basis.json "quantization" entry for a scheme."""
+    if scheme not in SCHEMES:
+        raise ValueError(f"unknown quantization scheme {scheme!r} (expected one of {SCHEMES})")
+    record = {"scheme": scheme, "bits": 16,
+              "scales": mode_scales(eigenvalues, n_modes, scheme).tolist()}
+    if scheme == "per-mode":
+        record["clip_sigmas"] = CLIP_SIGMAS_INT16
+    return record
+
+
+def basis_scales(basis, n_modes=None):
+    """Scales recorded in a delta-basis dict (QUANT_SCALE for older files)."""
+    n_modes = n_modes or len(basis["eigenvectors"])
+    q = basis.get("quantization")
+    if q is None:
+        return np.full(n_modes, float(QUANT_SCALE))
+    return np.asarray(q["scales"][:n_modes], dtype=np.float64)
+
+
+def quantize(coeffs, scales, bits=16):
+    """Return (integer codes, number of saturated coefficients)."""
+    lo, hi = INT_RANGE[bits]
+    scaled = np.round(coeffs * scales)
+    codes = np.clip(scaled, lo, hi).astype(np.int16 if bits == 16 else np.int8)
+    return codes, int((scaled != codes).sum())
+
+
+def dequantize(codes, scales):
+    return codes / scales
+
+
+# ── Product quantization ──────────────────────────────────────────────────────
+
+class ProductQuantizer:
+    """
+    Splits d modes into n_subspaces contiguous sub-vectors and codes each
+    with the nearest of n_centroids k-means centroids (one uint8 per
+    sub-vector). Inner products against a query use per-subspace lookup
+    tables (asymmetric distance computation).
+    """
+
+    def __init__(self, codebooks, bounds):
+        self.codebooks = codebooks    # list of (n_centroids, sub_dim) float32
+        self.bounds = bounds          # (n_subspaces + 1,) mode offsets
+
+    @classmethod
+    def fit(cls, X, n_subspaces=PQ_SUBSPACES, n_centroids=PQ_CENTROIDS,
+            n_iter=PQ_ITERS, seed=0):
+        rng = np.random.default_rng(seed)
+        X = np.asarray(X, dtype=np.float32)
+        bounds = np.linspace(0, X.shape[1], n_subspaces + 1).astype(int)
+        codebooks = []
+        for m in range(n_subspaces):
+            sub = X[:, bounds[m]:bounds[m + 1]]
+            k = min(n_centroids, len(sub))
+            cent = sub[rng.choice(len(sub), k, replace=False)].copy()
+            for _ in range(n_iter):
+                assign = cls._nearest(sub, cent)
+                sums = np.zeros_like(cent)
+                np.add.at(sums, assign, sub)
+                counts = np.bincount(assign, minlength=k)
+                filled = counts > 0
+                cent[filled] = sums[filled] / counts[filled, None]
+            codebooks.append(cent)
+        return cls(codebooks, bounds)
+
+    @staticmethod
+    def _nearest(sub, cent):
+        d = (sub ** 2).sum(1)[:, None] - 2 * sub @ cent.T + (cent ** 2).sum(1)[None, :]
+        return d.argmin(axis=1)
+
+    def encode(self, X):
+        X = np.asarray(X, dtype=np.float32)
+        return np.stack([self._nearest(X[:, lo:hi], cb)
+                         for cb, lo, hi in zip(self.codebooks, self.bounds[:-1], self.bounds[1:])],
+                        axis=1).astype(np.uint8)
+
+    def decode(self, codes):
+        return np.concatenate([cb[codes[:, m]] for m, cb in enumerate(self.codebooks)], axis=1)
+
+    def inner_products(self, queries, codes):
+        """(Q x N) inner products of queries with the coded vectors via lookup tables."""
+        Q = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        out = np.zeros((len(Q), len(codes)), dtype=np.float32)
+        for m, (cb, lo, hi) in enumerate(zip(self.codebooks, self.bounds[:-1], self.bounds[1:])):
+            lut = Q[:, lo:hi] @ cb.T                  # (Q x n_centroids)
+            out += lut[:, codes[:, m]]
+        return out
+
+
+# ── Benchmark ─────────────────────────────────────────────────────────────────
+
+def _unit_rows(X):
+    return X / np.maximum(np.linalg.norm(X, axis=-1, keepdims=True), 1e-12)
+
+
+def _topk(scores, k):
+    return np.argpartition(-scores, k - 1, axis=1)[:, :k]
+
+
+def _recall(found, truth):
+    return float(np.mean([len(np.intersect1d(f, t)) / len(t) for f, t in zip(found, truth)]))
+
+
+def benchmark(amplitudes, basis, n_modes=32, k=20, n_queries=500, seed=1):
+    """
+    Compare schemes on one tier: bytes per spore, encode throughput,
+    saturations, reconstruction error and recall@k of coefficient-space
+    cosine search against the exact 200D search and against unquantized
+    coefficients.
+    """
+    A = np.asarray(amplitudes, dtype=np.float64)
+    bary = np.asarray(basis["barycenter"])
+    evecs = np.asarray(basis["eigenvectors"][:n_modes])
+    eigenvalues = basis["eigenvalues"]
+    D = A - bary
+    coeffs = D @ evecs.T
+
+    rng = np.random.default_rng(seed)
+    q_amps = A[rng.integers(len(A), size=n_queries)]
+    q_amps = q_amps + 0.02 * rng.standard_normal(q_amps.shape)
+    qd = q_amps - bary
+    qc = qd @ evecs.T
+    truth = _topk(_unit_rows(qd) @ _unit_rows(D).T, k)
+    float_top = _topk(_unit_rows(qc) @ _unit_rows(coeffs).T, k)
+
+    results = [{"scheme": "float64 (no quantization)", "bytes_per_spore": 8 * n_modes,
+                "recall_exact": _recall(float_top, truth), "recall_float": 1.0,
+                "saturated": 0, "rms_error": 0.0, "encode_per_s": None}]
+
+    for scheme, bits in (("global", 16), ("per-mode", 16), ("per-mode", 8)):
+        scales = mode_scales(eigenvalues, n_modes, scheme, bits)
+        t0 = time.perf_counter()
+        codes, saturated = quantize(coeffs, scales, bits)
+        secs = time.perf_counter() - t0
+        approx = dequantize(codes, scales)
+        top = _topk(_unit_rows(qc) @ _unit_rows(approx).T, k)
+        results.append({"scheme": f"{scheme} int{bits}", "bytes_per_spore": codes.itemsize * n_modes,
+                        "recall_exact": _recall(top, truth), "recall_float": _recall(top, float_top),
+                        "saturated": saturated,
+                        "rms_error": float(np.sqrt(np.mean((approx - coeffs) ** 2))),
+                        "encode_per_s": len(A) / max(secs, 1e-9)})
+
+    n_sub = min(PQ_SUBSPACES, n_modes)
+    pq = ProductQuantizer.fit(coeffs, n_sub, seed=seed)
+    t0 = time.perf_counter()
+    codes = pq.encode(coeffs)
+    secs = time.perf_counter() - t0
+    approx = pq.decode(codes)
+    norms = np.linalg.norm(approx, axis=1)
+    top = _topk(pq.inner_products(_unit_rows(qc), codes) / np.maximum(norms, 1e-12), k)
+    results.append({"scheme": f"pq {n_sub}x{PQ_CENTROIDS}", "bytes_per_spore": codes.shape[1],
+                    "recall_exact": _recall(top, truth), "recall_float": _recall(top, float_top),
+                    "saturated": 0, "rms_error": float(np.sqrt(np.mean((approx - coeffs) ** 2))),
+                    "encode_per_s": len(A) / max(secs, 1e-9)})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark coefficient quantization schemes")
+    parser.add_argument("--data", default="docs/data", help="Directory with delta-basis.json")
+    parser.add_argument("--spores", default="wave-spores")
+    parser.add_argument("--store", default=None, help="Packed spore store for amplitudes")
+    parser.add_argument("--modes", type=int, default=32, help="Coefficient modes to quantize")
+    parser.add_argument("--k", type=int, default=20)
+    args = parser.parse_args()
+
+    with open(os.path.join(args.data, "delta-basis.json")) as f:
+        basis = json.load(f)
+    if args.store:
+        from spore_store import SporeStore
+        A = np.asarray(SporeStore(args.store).amplitudes)
+    else:
+        import spore_loader
+        loaded = spore_loader.load_spore_dir(args.spores)
+        loaded.report()
+        A = np.array([s["amplitudes"] for s in loaded.spores])
+
+    print(f"\nQuantizing {args.modes} modes for {len(A)} spores (basis {basis['basis_hash']})")
+    print(f"  {'scheme':<26}{'bytes':>6}{'index':>11}{'encode/s':>12}{'saturated':>10}"
+          f"{'rms err':>10}  recall@{args.k} exact / vs float")
+    for r in benchmark(A, basis, args.modes, args.k):
+        enc = f"{r['encode_per_s']:,.0f}" if r["encode_per_s"] else "-"
+        print(f"  {r['scheme']:<26}{r['bytes_per_spore']:>6}{r['bytes_per_spore'] * len(A):>11,}"
+              f"{enc:>12}{r['saturated']:>10}{r['rms_error']:>10.2e}  "
+              f"{r['recall_exact']:.3f} / {r['recall_float']:.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -4,62 +4,119 @@ Regenerate all docs/data/ index files from current wave-spores/*.json.
 Produces:
   - docs/data/delta-basis.json      (barycenter + PCA eigenvectors)
   - docs/data/tier1-index.json      (32 int16 delta-PCA coefficients per spore)
+  - docs/data/tier1-index.bin       (same, binary sidecar; see tier1_binary.py)
+  - docs/data/tier2-index.bin       (100-mode codes, binary only)
+  - docs/data/tier3-index.bin       (130-mode codes, binary only)
   - docs/data/wave-spore-index.json (metadata index, no amplitudes)
   - docs/data/spore-metrics-for-proteins.json (per-protein metrics)
   - docs/data/spore-index-compact.txt (compact text index)
+  - docs/data/tag-index.json        (tag -> spore inverted index; see tags.py)
+  - docs/data/duplicate-clusters.json (near-duplicate spore clusters; see dedup.py)
+  - docs/data/canonical-ids.json    (duplicate id -> canonical id, with --canonical-map)
+  - docs/data/basis-chain/            (previous bases + rotations; see basis_migration.py)
+  - docs/data/shards/                 (sharded per-spore indexes + patches; see index_shards.py)
+
+Only delta-basis.json, tier1-index.json, wave-spore-index.json,
+spore-metrics-for-proteins.json and spore-index-compact.txt are committed.
+Everything else here (binary tiers, tag index, duplicate report, basis
+chain, shards, delta-basis-state.npz, the manifest) is a local build
+product, gitignored and rebuilt by the next run; a serving host publishes
+shards/ from its own docs/data.
+
+A full rebuild reads every spore exactly once and fans it out to all
+outputs at the same time (SporeSinks): amplitudes go into one preallocated
+float32 matrix and an exact streaming PCA state, everything else is
+serialised on the fly into spools that are streamed into the final files.
+Peak memory therefore grows with ~200 floats per spore rather than with the
+parsed JSON documents. Encoding from float32 amplitudes can move a code by
+at most one quantization step compared with float64.
+
+Outputs are written atomically (temp file + fsync + rename), and so is the
+state kept between runs: the regen manifest, delta-basis-state.npz, the basis
+chain and the shards. With --generations N the outputs are published together
+as one generation behind docs/data/current, keeping N previous generations for
+rollback (serving hosts only: the tracked docs/data files become symlinks; see
+generations.py).
+
+--metrics FILE records per-stage timings, counters and peak memory as JSON
+lines or a Prometheus text-file; --profile FILE captures a profile (see
+instrumentation.py).
+
+With --incremental, only spores added/changed/removed since the last run
+(tracked in docs/data/.regen-manifest.json) are parsed, and the existing tier1
+(JSON + binary) / tier2 / tier3 / wave-spore / metrics / compact outputs are
+patched in place (the tag index is rebuilt from the patched wave-spore index;
+the duplicate report is left as the last full rebuild wrote it). New spores
+are also folded into the streaming PCA state persisted next to the delta-basis
+(docs/data/delta-basis-state.npz). The delta-basis is kept until its drift
+from that state (or, if the state is missing, unreadable or inexact, the churn
+fraction since it was computed) crosses --drift-threshold; then the run falls
+back to a full rebuild: every spore is re-read, a fresh basis and state are
+computed and everything is re-encoded.
 """
 
+import argparse
 import json
 import os
 import hashlib
+import time
 import numpy as np
 from datetime import datetime, timezone
 
+import basis_migration
+import dedup
+import index_shards
+import instrumentation
+from generations import GenerationWriter, Stream, is_rolled_back
+from json_stream import Spool, dumps, write_envelope, write_object
+import spore_loader
+import spore_manifest
+import quantize
+from tags import TagIndex, TagIndexBuilder, TAG_INDEX_FILE, index_tags
+import tier1_binary
+from spore_store import SporeStore
+from incremental_pca import IncrementalPCA, STATE_FILE
+
 SPORE_DIR = "wave-spores"
 OUTPUT_DIR = "docs/data"
+MANIFEST_PATH = os.path.join(OUTPUT_DIR, ".regen-manifest.json")
+PCA_STATE_PATH = os.path.join(OUTPUT_DIR, STATE_FILE)
+CHAIN_DIR = os.path.join(OUTPUT_DIR, basis_migration.CHAIN_DIR)
+DRIFT_THRESHOLD = 0.05  # basis drift (or churn fraction) before re-basing
 
-QUANT_SCALE = 10000
 TIER1_MODES = 32
 TIER2_MODES = 100
 TIER3_MODES = 130
 
+AMPLITUDE_DTYPE = np.float32  # amplitude matrix kept by the streaming pass
+ENCODE_BLOCK = 65536          # rows projected at a time by encode_tiers()
 
-def load_spores():
-    """Load all wave spore JSONs."""
-    spores = []
-    for fname in sorted(os.listdir(SPORE_DIR)):
-        if not fname.endswith(".json"):
-            continue
-        path = os.path.join(SPORE_DIR, fname)
-        with open(path) as f:
-            spore = json.load(f)
-        spores.append(spore)
-    return spores
+# Tier abbreviation: core->c, reference->r, convergence->x
+TIER_ABBREV = {"core": "c", "reference": "r", "convergence": "x"}
 
 
-def compute_delta_basis(spores):
-    """Compute delta-PCA basis from spore amplitudes."""
-    # Stack amplitudes into matrix (N x 200)
-    amps = np.array([s["amplitudes"] for s in spores], dtype=np.float64)
-    n_spores, n_dims = amps.shape
-    print(f"  Computing delta-basis from {n_spores} spores x {n_dims}D")
+def load_spore_files(fnames, workers=None):
+    """
+    Load and validate the given wave spore JSONs (filenames relative to
+    SPORE_DIR). Returns a spore_loader.LoadResult; rejects are reported.
+    """
+    result = spore_loader.load_spore_files(SPORE_DIR, fnames, workers=workers)
+    result.report()
+    return result
 
-    # Barycenter (mean)
-    barycenter = amps.mean(axis=0)
 
-    # Delta vectors
-    deltas = amps - barycenter
+def compute_delta_basis_streaming(pca):
+    """Compute delta-PCA basis from persisted IncrementalPCA state (no SVD)."""
+    print(f"  Computing delta-basis from streaming state ({pca.n} spores x {len(pca.mean)}D)")
+    barycenter, eigenvectors, eigenvalues, total_var = pca.components(TIER3_MODES)
+    return make_basis(barycenter, eigenvectors, eigenvalues, total_var, pca.n)
 
-    # SVD for PCA (economy)
-    # With 54 spores, we can get at most min(54-1, 200) = 53 components
-    U, S, Vt = np.linalg.svd(deltas, full_matrices=False)
-    n_components = min(len(S), TIER3_MODES)  # Cap at 130 (tier3 max)
 
-    eigenvectors = Vt[:n_components]  # (n_components x 200)
-    eigenvalues = (S[:n_components] ** 2) / (n_spores - 1)
+def make_basis(barycenter, eigenvectors, eigenvalues, total_var, n_spores):
+    """Assemble the delta-basis.json dict from PCA components."""
+    n_components = len(eigenvectors)
 
     # Cumulative variance
-    total_var = np.sum(S**2) / (n_spores - 1)
     cum_var = np.cumsum(eigenvalues) / total_var
 
     # Basis hash (hash of barycenter + first eigenvector)
@@ -83,184 +140,649 @@ def compute_delta_basis(spores):
     }
 
 
-def encode_tier1(amplitudes, basis):
-    """Encode amplitudes to tier-1 int16 coefficients."""
-    amps = np.array(amplitudes)
-    bary = np.array(basis["barycenter"])
-    evecs = np.array(basis["eigenvectors"])
-
-    delta = amps - bary
-    n_modes = min(TIER1_MODES, len(evecs))
-    coeffs = evecs[:n_modes] @ delta  # dot products
-
-    # Quantize to int16
-    quantized = np.round(coeffs * QUANT_SCALE).astype(np.int64)
-    quantized = np.clip(quantized, -32768, 32767)
-    return quantized.tolist()
-
-
-def generate_tier1_index(spores, basis):
-    """Generate tier1-index.json with 32 int16 delta-PCA coefficients."""
-    entries = []
-    for s in spores:
-        coeffs = encode_tier1(s["amplitudes"], basis)
-        # Tier abbreviation: core->c, reference->r, convergence->x
-        tier_map = {"core": "c", "reference": "r", "convergence": "x"}
-        entry = {
-            "id": s["id"],
-            "c": coeffs,
-            "s5": round(s.get("shimmer_s5", 0), 3),
-            "coh": round(s.get("coherence_score", 0.5), 2),
-            "tier": tier_map.get(s.get("tier", "reference"), "r"),
+TIER_MODES = {"tier1": "tier1_modes", "tier2": "tier2_modes", "tier3": "tier3_modes"}
+
+
+def encode_tiers(amplitudes, basis, block=ENCODE_BLOCK):
+    """
+    Encode an N x 200 amplitude matrix to int16 delta-PCA coefficients for
+    every tier in one projection, with the basis' quantization scales.
+    Rows are projected `block` at a time, so a float32 matrix is never
+    copied whole to float64.
+
+    Returns (codes, stats): codes maps "tier1"/"tier2"/"tier3" to N x modes
+    int16 arrays (each tier is a prefix of the next), stats maps each tier
+    to its quantization error figures.
+    """
+    A = np.asarray(amplitudes).reshape(-1, len(basis["barycenter"]))
+    bary = np.asarray(basis["barycenter"])
+    evecs = np.asarray(basis["eigenvectors"])
+    scales = quantize.basis_scales(basis)
+    n, n_modes = len(A), len(evecs)
+
+    quantized = np.empty((n, n_modes), dtype=np.int16)
+    err_sq = np.zeros(n_modes)                 # per-mode sums, folded per tier below
+    err_max = np.zeros(n_modes)
+    saturated = np.zeros(n_modes, dtype=np.int64)
+    residual_sum = {tier: 0.0 for tier in TIER_MODES}
+    for lo in range(0, n, block):
+        deltas = np.asarray(A[lo:lo + block], dtype=np.float64) - bary
+        coeffs = deltas @ evecs.T  # (b x n_components), one matmul for all tiers
+        scaled = np.round(coeffs * scales)
+        q = np.clip(scaled, -32768, 32767).astype(np.int16)
+        quantized[lo:lo + block] = q
+        quant_err = quantize.dequantize(q, scales) - coeffs
+        err_sq += (quant_err ** 2).sum(axis=0)
+        err_max = np.maximum(err_max, np.abs(quant_err).max(axis=0))
+        saturated += (scaled != q).sum(axis=0)
+        # Energy outside the first k modes, relative to the whole delta
+        delta_sq = np.einsum("ij,ij->i", deltas, deltas)
+        kept_sq = np.cumsum(coeffs ** 2, axis=1)
+        for tier, key in TIER_MODES.items():
+            k = basis[key]
+            residual = np.sqrt(np.maximum(delta_sq - kept_sq[:, k - 1], 0)
+                               / np.maximum(delta_sq, 1e-30))
+            residual_sum[tier] += float(residual.sum())
+
+    codes, stats = {}, {}
+    for tier, key in TIER_MODES.items():
+        k = basis[key]
+        codes[tier] = quantized[:, :k]
+        stats[tier] = {
+            "modes": k,
+            "quant_rms": float(np.sqrt(err_sq[:k].sum() / (n * k))) if n else 0.0,
+            "quant_max": float(err_max[:k].max()) if n else 0.0,
+            "saturated": int(saturated[:k].sum()),
+            "residual_mean": residual_sum[tier] / n if n else 0.0,
         }
-        if s.get("resonance_score"):
-            entry["res"] = round(s["resonance_score"], 3)
-        # Include tags for hint data (used in regeneration)
-        semantic_tags = [t for t in s.get("tags", [])
-                        if not t.startswith("#embed:") and not t.startswith("#dna:")
-                        and not t.startswith("#synthesis:") and not t.startswith("#source:")]
-        if semantic_tags:
-            entry["tags"] = semantic_tags[:10]  # Cap at 10 for size
-        entries.append(entry)
+    return codes, stats
+
+
+def report_quantization(stats):
+    for tier, st in stats.items():
+        instrumentation.gauge("quant_saturated", st["saturated"], tier=tier)
+        print(f"   {tier} ({st['modes']} modes): quant rms {st['quant_rms']:.2e}, "
+              f"max {st['quant_max']:.2e}, {st['saturated']} saturated, "
+              f"truncation residual {st['residual_mean'] * 100:.1f}%")
+
 
+def tier1_entry(s, coeffs):
+    """Tier-1 index entry for one spore, given its tier-1 codes row."""
+    return {"id": s["id"], "c": coeffs.tolist(), **tier1_fields(s)}
+
+
+def tier1_fields(s):
+    """The tier-1 entry fields that do not depend on the basis."""
+    entry = {
+        "s5": round(s.get("shimmer_s5", 0), 3),
+        "coh": round(s.get("coherence_score", 0.5), 2),
+        "tier": TIER_ABBREV.get(s.get("tier", "reference"), "r"),
+    }
+    if s.get("resonance_score"):
+        entry["res"] = round(s["resonance_score"], 3)
+    # Include tags for hint data (used in regeneration)
+    kept = index_tags(s.get("tags", []))
+    if kept:
+        entry["tags"] = kept[:10]  # Cap at 10 for size
+    return entry
+
+
+def tier1_envelope(n_entries, basis):
+    """tier1-index.json fields other than "spores"."""
     return {
         "basis_hash": basis["basis_hash"],
         "tier": 1,
         "modes": basis["tier1_modes"],
-        "spore_count": len(entries),
+        "spore_count": n_entries,
         "computed_at": basis["computed_at"],
-        "spores": entries
     }
 
 
-def generate_wave_spore_index(spores):
-    """Generate wave-spore-index.json (metadata only, no amplitudes)."""
-    entries = []
-    for s in spores:
-        entries.append({
-            "id": s["id"],
-            "tags": s.get("tags", []),
-            "tier": s.get("tier", "reference"),
-            "coherence_score": s.get("coherence_score", 0.5),
-            "energy": s.get("energy", 0),
-            "created_at": s.get("created_at", ""),
-            "mesh_id": s.get("mesh_id", "meshseed"),
-            "model": s.get("model", "gemini"),
-            "basis_hash": s.get("basis_hash", "")
-        })
-
-    avg_coherence = np.mean([e["coherence_score"] for e in entries]) if entries else 0
+def wrap_tier1_index(entries, basis):
+    """Wrap tier-1 entries in the tier1-index.json envelope."""
+    return {**tier1_envelope(len(entries), basis), "spores": entries}
+
+
+def wave_spore_entry(s):
+    """Metadata-only wave-spore-index entry for one spore."""
+    return {
+        "id": s["id"],
+        "tags": s.get("tags", []),
+        "tier": s.get("tier", "reference"),
+        "coherence_score": s.get("coherence_score", 0.5),
+        "energy": s.get("energy", 0),
+        "created_at": s.get("created_at", ""),
+        "mesh_id": s.get("mesh_id", "meshseed"),
+        "model": s.get("model", "gemini"),
+        "basis_hash": s.get("basis_hash", "")
+    }
+
+
+def wrap_wave_spore_index(entries):
+    """Wrap metadata entries in the wave-spore-index.json envelope."""
+    return {**wave_spore_envelope(len(entries), entries[0]["basis_hash"] if entries else "",
+                                  [e["coherence_score"] for e in entries]),
+            "spores": entries}
+
+
+def wave_spore_envelope(n_entries, basis_hash, coherence):
+    """wave-spore-index.json fields other than "spores"."""
+    avg_coherence = np.mean(coherence) if n_entries else 0
 
     return {
         "export_version": "2.0",
         "mesh_id": "meshseed",
-        "total_spores": len(entries),
-        "basis_hash": entries[0]["basis_hash"] if entries else "",
+        "total_spores": n_entries,
+        "basis_hash": basis_hash,
         "embedding_model": "gemini",
         "pca_dimensions": 200,
         "variance_preserved": 0.943,
         "average_coherence": round(float(avg_coherence), 4),
         "note": "Metadata index — amplitudes in individual wave-spores/{id}.json files",
         "calibration_note": "First 52 spores (by created_at) are calibration layer",
-        "spores": entries
     }
 
 
-def generate_spore_metrics(spores):
-    """Generate spore-metrics-for-proteins.json keyed by protein ID."""
-    metrics = {}
-    for s in spores:
-        metrics[s["id"]] = {
-            "shimmer_s5": s.get("shimmer_s5", 0),
-            "shimmer_s2b": s.get("shimmer_s2b", 0),
-            "shimmer_s3": s.get("shimmer_s3", 0),
-            "shimmer_composite": s.get("shimmer_composite", 0),
-            "resonance_score": s.get("resonance_score", 0),
-            "coherence_score": s.get("coherence_score", 0.5),
-            "energy": s.get("energy", 0),
-            "tier": s.get("tier", "reference")
-        }
-    return metrics
+def spore_metrics_entry(s):
+    """spore-metrics-for-proteins.json value for one spore."""
+    return {
+        "shimmer_s5": s.get("shimmer_s5", 0),
+        "shimmer_s2b": s.get("shimmer_s2b", 0),
+        "shimmer_s3": s.get("shimmer_s3", 0),
+        "shimmer_composite": s.get("shimmer_composite", 0),
+        "resonance_score": s.get("resonance_score", 0),
+        "coherence_score": s.get("coherence_score", 0.5),
+        "energy": s.get("energy", 0),
+        "tier": s.get("tier", "reference")
+    }
+
+
+def compact_line(s):
+    """spore-index-compact.txt line for one spore."""
+    tier_char = TIER_ABBREV.get(s.get("tier", "reference"), "r")
+    coh = int(s.get("coherence_score", 0.5) * 100)
+    energy = int(s.get("energy", 0) * 1000)
+    tag_str = ",".join(index_tags(s.get("tags", []))[:8])
+    return f"{s['id']}|{tier_char}|{coh}|{energy}|{tag_str}"
 
 
-def generate_compact_index(spores):
-    """Generate spore-index-compact.txt."""
-    lines = [
+def compact_header(n_lines):
+    return [
         "# Ultra-Compact Wave Spore Index",
         "# Format: id|tier(c/r/x)|coherence(0-100)|energy(0-1000)|tags",
         f"# Generated: {datetime.now(timezone.utc).isoformat()}",
-        f"# Spores: {len(spores)}",
+        f"# Spores: {n_lines}",
     ]
-    tier_map = {"core": "c", "reference": "r", "convergence": "x"}
-    for s in spores:
-        tier_char = tier_map.get(s.get("tier", "reference"), "r")
-        coh = int(s.get("coherence_score", 0.5) * 100)
-        energy = int(s.get("energy", 0) * 1000)
-        tags = [t for t in s.get("tags", [])
-                if not t.startswith("#embed:") and not t.startswith("#dna:")
-                and not t.startswith("#synthesis:") and not t.startswith("#source:")]
-        tag_str = ",".join(tags[:8])
-        lines.append(f"{s['id']}|{tier_char}|{coh}|{energy}|{tag_str}")
-    return "\n".join(lines) + "\n"
 
 
-def main():
-    os.chdir(os.path.dirname(os.path.abspath(__file__)))
+def wrap_compact_index(lines):
+    """Prefix compact index lines with the header."""
+    return "\n".join(compact_header(len(lines)) + lines) + "\n"
 
-    print("Loading wave spores...")
-    spores = load_spores()
-    print(f"Loaded {len(spores)} spores")
 
-    if not spores:
-        print("ERROR: No wave spores found!")
+def archive_bases(basis):
+    """
+    Keep the outgoing and the new delta-basis in the basis chain and refresh
+    the rotations between them, so peers still on the old basis can be served.
+    """
+    try:
+        previous = read_json("delta-basis.json")
+    except (OSError, ValueError):
+        previous = None
+    if previous is None and not os.path.isdir(CHAIN_DIR):
         return
+    if previous is not None:
+        basis_migration.archive_basis(previous, CHAIN_DIR)
+    basis_migration.archive_basis(basis, CHAIN_DIR)
+    n = basis_migration.write_rotations(basis, CHAIN_DIR)
+    print(f"   Basis chain: {len(basis_migration.load_chain(CHAIN_DIR))} bases, "
+          f"{n} rotations to/from {basis['basis_hash']}")
+
+
+def stage_refinement_tiers(out, ids, codes, basis):
+    """Stage the codes-only tier2-index.bin / tier3-index.bin."""
+    for tier in ("tier2", "tier3"):
+        out.add(f"{tier}-index.bin",
+                lambda t=tier: tier1_binary.pack(basis["basis_hash"], basis["computed_at"], ids,
+                                                 codes[t], index_tier=int(t[-1])),
+                f"{codes[tier].shape[1]} modes")
+
+
+def stage_tag_index(out, index):
+    """Stage tag-index.json (tag -> spore bitmaps / row lists)."""
+    out.add(TAG_INDEX_FILE, lambda: dumps(index.to_json()),
+            f"{len(index.vocab)} tags")
+
+
+def stage_duplicates(out, sinks, basis, canonical_map=False):
+    """Find near-duplicate spores and stage the cluster report (+ canonical id map)."""
+    report, canonical = dedup.find_duplicates(sinks.amplitudes[:sinks.n], basis["barycenter"],
+                                              sinks.ids, sinks.created)
+    instrumentation.gauge("dedup_pairs_scored", report["pairs_scored"])
+    instrumentation.gauge("dedup_clusters", report["cluster_count"])
+    instrumentation.gauge("dedup_redundant_spores", report["redundant_spores"])
+    print(f"   {report['pairs_scored']:,} LSH pairs scored, {report['confirmed_pairs']} "
+          f"at cos >= {report['threshold']}: {report['cluster_count']} clusters, "
+          f"{report['redundant_spores']} redundant spores")
+    out.add(dedup.REPORT_FILE, compact_json(report), f"{report['cluster_count']} clusters")
+    if canonical_map:
+        out.add(dedup.CANONICAL_FILE, compact_json(canonical), f"{len(canonical)} duplicates")
+
+
+def read_refinement_tiers(basis_hash):
+    """Read tier2/tier3 codes back as {tier: {id: row}}, checking the basis."""
+    tiers = {}
+    for tier in ("tier2", "tier3"):
+        view = tier1_binary.Tier1Binary.open(os.path.join(OUTPUT_DIR, f"{tier}-index.bin"),
+                                             mmap=False)
+        if view.basis_hash != basis_hash:
+            raise ValueError(f"{tier}-index.bin basis {view.basis_hash} != {basis_hash}")
+        tiers[tier] = dict(zip(view.ids, np.array(view.codes)))
+    return tiers
+
+
+def publish_shards():
+    """Shard the per-spore outputs and emit the patch since the last publish."""
+    st = index_shards.publish(OUTPUT_DIR)
+    instrumentation.count("shards_written", st["shards_written"])
+    instrumentation.count("shards_removed", st["shards_removed"])
+    print(f"   Shards: manifest {st['manifest_id']}, {st['shards_written']} written, "
+          f"{st['shards_reused']} unchanged, {st['shards_removed']} removed")
+    if st["patch"]:
+        print(f"   Patch: {st['patch']['file']} ({st['patch']['bytes']:,} bytes)")
+        instrumentation.count("bytes_written", st["patch"]["bytes"])
+
+
+def compact_json(obj):
+    """Renderer for a compact JSON output (run by the writer's thread pool)."""
+    return lambda: json.dumps(obj, indent=None, separators=(",", ":"))
+
+
+def commit_outputs(out):
+    """Write all staged outputs as one generation and list them."""
+    print("\nWriting outputs" + (f" (generation, keeping {out.keep} previous)"
+                                 if out.keep else "") + "...")
+    for name, (out_path, size) in out.commit().items():
+        instrumentation.count("files_written")
+        instrumentation.count("bytes_written", size)
+        note = out.notes.get(name)
+        print(f"   Written: {out_path} ({size:,} bytes" + (f", {note})" if note else ")"))
+
+
+def read_json(name):
+    with open(os.path.join(OUTPUT_DIR, name)) as f:
+        return json.load(f)
+
+
+class SporeSinks:
+    """
+    Fan-out for one streaming pass over the spores. Each spore is read once
+    and leaves behind only:
+      - its amplitudes, in a preallocated AMPLITUDE_DTYPE matrix (encoding)
+      - its share of an exact streaming PCA state (float64, O(d^2) total)
+      - tier-1 metadata columns for tier1-index.bin plus the serialised
+        basis-independent tier-1 fields
+      - its wave-spore-index / metrics / compact entries, serialised into
+        spools on the output filesystem
+    so memory grows by about 200 floats (plus ids and tier-1 tags) per
+    spore, not by whole parsed JSON documents.
+    """
+
+    def __init__(self, capacity, n_dims=spore_loader.N_DIMS):
+        self.n = 0
+        self.amplitudes = np.empty((capacity, n_dims), dtype=AMPLITUDE_DTYPE)
+        self.pca = IncrementalPCA(n_dims)
+        self.files, self.ids, self.created = [], [], []
+        self.s5 = np.empty(capacity, dtype=np.float32)
+        self.coh = np.empty(capacity, dtype=np.float32)
+        self.res = np.empty(capacity, dtype=np.float32)
+        self.coherence = np.empty(capacity)
+        self.tiers, self.tags = [], []
+        self.basis_hash = ""
+        self.tag_index = TagIndexBuilder()
+        self.tier1 = Spool(OUTPUT_DIR, sep="\n")
+        self.wsi = Spool(OUTPUT_DIR)
+        self.metrics = Spool(OUTPUT_DIR)
+        self.compact = Spool(OUTPUT_DIR, sep="\n")
+
+    def add(self, fnames, spores):
+        """Consume one chunk of (validated) spores."""
+        if not spores:
+            return
+        rows = np.array([s["amplitudes"] for s in spores], dtype=np.float64)
+        lo = self.n
+        self.n += len(spores)
+        self.amplitudes[lo:self.n] = rows
+        self.pca.add(rows)
+        for i, (fname, s) in enumerate(zip(fnames, spores), lo):
+            self.files.append(fname)
+            self.ids.append(s["id"])
+            fields = tier1_fields(s)
+            self.tier1.add(dumps(fields)[1:-1])
+            self.s5[i], self.coh[i] = fields["s5"], fields["coh"]
+            self.res[i] = fields.get("res", np.nan)
+            self.tiers.append(fields["tier"])
+            self.tags.append(tier1_binary.TAG_SEP.join(fields.get("tags", [])))
+
+            entry = wave_spore_entry(s)
+            if i == 0:
+                self.basis_hash = entry["basis_hash"]
+            self.coherence[i] = entry["coherence_score"]
+            self.created.append(entry["created_at"])
+            self.tag_index.add(i, entry["tags"])
+            self.wsi.add(dumps(entry))
+            self.metrics.add_item(s["id"], spore_metrics_entry(s))
+            self.compact.add(compact_line(s))
+
+    def stage_outputs(self, out, basis, codes):
+        """Stage every per-spore output on a GenerationWriter."""
+        n = self.n
+
+        def write_tier1(f):
+            head = dumps(tier1_envelope(n, basis))[:-1] + ',"spores":['
+            f.write(head)
+            for i, fields in enumerate(self.tier1.lines()):
+                f.write(("," if i else "") + '{"id":' + dumps(self.ids[i]) + ',"c":'
+                        + dumps(codes["tier1"][i].tolist()) + "," + fields + "}")
+            f.write("]}")
+
+        out.add("tier1-index.json", Stream(write_tier1), f"{n} entries")
+        out.add("tier1-index.bin", lambda: tier1_binary.pack(
+            basis["basis_hash"], basis["computed_at"], self.ids, codes["tier1"],
+            s5=self.s5[:n], coh=self.coh[:n], res=self.res[:n], tiers=self.tiers, tags=self.tags))
+        stage_refinement_tiers(out, self.ids, codes, basis)
+        envelope = wave_spore_envelope(n, self.basis_hash, self.coherence[:n])
+        out.add("wave-spore-index.json",
+                Stream(lambda f: write_envelope(f, envelope, "spores", self.wsi)), f"{n} entries")
+        out.add("spore-metrics-for-proteins.json",
+                Stream(lambda f: write_object(f, self.metrics)), f"{n} proteins")
+
+        def write_compact(f):
+            f.write("\n".join(compact_header(n)) + "\n")
+            if n:
+                self.compact.copy_to(f)
+                f.write("\n")
+
+        out.add("spore-index-compact.txt", Stream(write_compact))
+        stage_tag_index(out, self.tag_index.finish(self.ids))
+
+    def close(self):
+        for spool in (self.tier1, self.wsi, self.metrics, self.compact):
+            spool.close()
+
+
+def stream_spores(sinks, fnames, store=None, workers=None):
+    """
+    Feed every spore (from the packed store, else the JSON files) through
+    sinks chunk by chunk. Returns the spore_loader.LoadResult of the pass.
+    """
+    start = time.perf_counter()
+    if store is not None:
+        chunk = spore_loader.CHUNK_SIZE
+        for lo in range(0, len(store), chunk):
+            rows = range(lo, min(lo + chunk, len(store)))
+            sinks.add([store.files[i] for i in rows], [store.spore(i) for i in rows])
+        instrumentation.count("spores_loaded", sinks.n)
+        return spore_loader.LoadResult([], [], 0, time.perf_counter() - start, files=sinks.files)
+    rejects, n_bytes = [], 0
+    for accepted, r, b in spore_loader.iter_spore_chunks(SPORE_DIR, fnames, workers=workers):
+        sinks.add([f for f, _ in accepted], [s for _, s in accepted])
+        rejects.extend(r)
+        n_bytes += b
+    loaded = spore_loader.LoadResult([], rejects, n_bytes, time.perf_counter() - start,
+                                     files=sinks.files)
+    loaded.report()
+    return loaded
+
+
+def regenerate_full(previous_manifest=None, store_path=None, workers=None,
+                    quant="global", generations=0, canonical_map=False):
+    """
+    Rebuild every output from all spores and write a fresh manifest.
+
+    Spores are read in one streaming pass (see SporeSinks) that also builds
+    the exact streaming PCA state the delta-basis is taken from, so no
+    N x 200 float64 matrix or SVD is needed. If a packed spore store is given
+    and still matches SPORE_DIR, spores are read from it instead of parsing
+    every JSON file. quant selects the coefficient quantization scheme (see
+    quantize.py), recorded in delta-basis.json. generations > 0 publishes the
+    outputs as an atomic generation, keeping that many previous ones (see
+    generations.py). Near-duplicate spores are reported (see dedup.py), with
+    a duplicate -> canonical id map if canonical_map is set.
+    """
+    instrumentation.stage("stream")
+    print("Streaming wave spores...")
+    files, _, _, _ = spore_manifest.scan(SPORE_DIR, previous_manifest)
+    store = SporeStore(store_path) if store_path else None
+    if store is not None and store.is_stale(SPORE_DIR):
+        print(f"  Spore store {store_path} is stale; loading JSON instead")
+        store = None
+    sinks = SporeSinks(len(store) if store is not None else len(files))
+    try:
+        stream_spores(sinks, sorted(files), store, workers)
+        print(f"Loaded {sinks.n} spores" + (f" from {store_path}" if store else ""))
+        instrumentation.gauge("spores", sinks.n)
+        if not sinks.n:
+            print("ERROR: No wave spores found!")
+            return
+
+        # 1. Delta basis, from the state the pass accumulated
+        instrumentation.stage("delta_basis")
+        print("\n1. Computing delta-basis...")
+        basis = compute_delta_basis_streaming(sinks.pca)
+        basis["quantization"] = quantize.quantization_record(
+            basis["eigenvalues"], len(basis["eigenvectors"]), quant)
+        sinks.pca.save(PCA_STATE_PATH)
+        archive_bases(basis)
+        out = GenerationWriter(OUTPUT_DIR, keep=generations)
+        out.add("delta-basis.json", compact_json(basis),
+                f"hash: {basis['basis_hash']}, {quant} quantization")
+
+        # 2. Tier codes for every spore
+        instrumentation.stage("encode")
+        print("\n2. Encoding tier codes...")
+        codes, stats = encode_tiers(sinks.amplitudes[:sinks.n], basis)
+        report_quantization(stats)
+
+        # 3. Near-duplicate clusters
+        instrumentation.stage("dedup")
+        print("\n3. Finding near-duplicate spores...")
+        stage_duplicates(out, sinks, basis, canonical_map)
+
+        # 4. Per-spore outputs, streamed from the spools
+        instrumentation.stage("write")
+        sinks.stage_outputs(out, basis, codes)
+        commit_outputs(out)
+    finally:
+        sinks.close()
+    instrumentation.stage("shards")
+    publish_shards()
+
+    instrumentation.stage("manifest")
+    # Rejected files stay in the manifest (id None) so they are not re-read
+    # until they change
+    for entry in files.values():
+        entry["id"] = None
+    for fname, sid in zip(sinks.files, sinks.ids):
+        files[fname]["id"] = sid
+    spore_manifest.save_manifest(MANIFEST_PATH, files, basis["basis_hash"],
+                                 basis["spore_count"], 0)
+
+    print(f"\nDone! All indexes regenerated for {sinks.n} spores.")
+
+
+def regenerate_incremental(manifest, drift_threshold=DRIFT_THRESHOLD, workers=None,
+                           quant="global", generations=0):
+    """
+    Patch the existing outputs with spores added/changed/removed since the
+    manifest was written.
+
+    Returns False if a full rebuild is needed instead.
+    """
+    instrumentation.stage("read_outputs")
+    if is_rolled_back(OUTPUT_DIR):
+        # The manifest, PCA state, shards and basis chain still describe the
+        # newest generation, not the rolled-back one being served
+        print("Outputs are rolled back to an older generation; falling back to full rebuild")
+        return False
+    try:
+        basis = read_json("delta-basis.json")
+        tier1 = read_json("tier1-index.json")
+        wsi = read_json("wave-spore-index.json")
+        metrics = read_json("spore-metrics-for-proteins.json")
+        with open(os.path.join(OUTPUT_DIR, "spore-index-compact.txt")) as f:
+            compact_lines = [l for l in f.read().splitlines() if l and not l.startswith("#")]
+        refinement = read_refinement_tiers(basis["basis_hash"])
+    except (OSError, ValueError) as e:
+        print(f"Cannot read existing outputs ({e}); falling back to full rebuild")
+        return False
+    if basis["basis_hash"] != manifest["basis_hash"] or tier1["basis_hash"] != basis["basis_hash"]:
+        print("Outputs do not match manifest basis; falling back to full rebuild")
+        return False
+    scheme = basis.get("quantization", {}).get("scheme", "global")
+    if scheme != quant:
+        print(f"Outputs use {scheme} quantization, not {quant}; falling back to full rebuild")
+        return False
+
+    instrumentation.stage("scan")
+    print("Scanning wave spores for changes...")
+    files, added, changed, removed = spore_manifest.scan(SPORE_DIR, manifest)
+    n_churn = len(added) + len(changed) + len(removed)
+    print(f"  {len(added)} added, {len(changed)} changed, {len(removed)} removed")
+    for kind, fnames in (("added", added), ("changed", changed), ("removed", removed)):
+        instrumentation.count("spores_churned", len(fnames), kind=kind)
+
+    instrumentation.stage("load")
+    stale_ids = {manifest["files"][f]["id"] for f in changed + removed} - {None}
+    loaded = load_spore_files(added + changed, workers)
+    fresh = loaded.spores
+    for fname in added + changed:
+        files[fname]["id"] = None
+    for fname, s in zip(loaded.files, fresh):
+        files[fname]["id"] = s["id"]
+    order = [files[f]["id"] for f in sorted(files) if files[f]["id"] is not None]
+
+    instrumentation.stage("drift")
+    # Fold new spores into the streaming PCA state. Old amplitudes of changed
+    # or removed spores are gone, so those make the state inexact.
+    pca = IncrementalPCA.load(PCA_STATE_PATH)
+    if pca is not None:
+        pca.add([s["amplitudes"] for s in fresh])
+        if changed or removed:
+            pca.exact = False
+
+    churn = manifest["churn_since_basis"] + n_churn
+    exact = pca is not None and pca.exact and pca.n == len(order)
+    if exact:
+        shift, subspace = pca.drift(basis["barycenter"], basis["eigenvectors"],
+                                    basis["tier1_modes"])
+        drift = max(shift, subspace)
+        print(f"  Basis drift: barycenter {shift:.4f}, tier1 subspace {subspace:.4f}")
+    else:
+        drift = churn / max(manifest["basis_spore_count"], 1)
+        print(f"  Churn since basis: {churn} spores ({drift:.4f})")
+    if drift > drift_threshold:
+        print(f"  Drift {drift:.4f} > {drift_threshold} since basis "
+              f"{basis['basis_hash']}; recomputing delta-basis")
+        return False
+
+    if n_churn == 0:
+        # Persist refreshed mtimes so touched files are not re-hashed next run
+        spore_manifest.save_manifest(MANIFEST_PATH, files, manifest["basis_hash"],
+                                     manifest["basis_spore_count"], churn)
+        print("\nDone! Indexes already up to date.")
+        return True
+
+    def patch(by_id, make_entry):
+        for sid in stale_ids:
+            by_id.pop(sid, None)
+        for s in fresh:
+            by_id[s["id"]] = make_entry(s)
+        return [by_id[sid] for sid in order]
+
+    instrumentation.gauge("basis_drift", drift)
+    instrumentation.stage("encode")
+    print(f"\nPatching indexes (basis {basis['basis_hash']}, drift {drift:.4f})...")
+    codes, stats = encode_tiers([s["amplitudes"] for s in fresh], basis)
+    if fresh:
+        report_quantization(stats)
+    instrumentation.stage("patch")
+    fresh_index = {s["id"]: i for i, s in enumerate(fresh)}
+    tier1 = wrap_tier1_index(
+        patch({e["id"]: e for e in tier1["spores"]},
+              lambda s: tier1_entry(s, codes["tier1"][fresh_index[s["id"]]])), basis)
+    out = GenerationWriter(OUTPUT_DIR, keep=generations)
+    out.add("tier1-index.json", compact_json(tier1), f"{tier1['spore_count']} entries")
+    out.add("tier1-index.bin", lambda: tier1_binary.encode(tier1))
+    stage_refinement_tiers(out, order, {
+        tier: np.array(patch(refinement[tier], lambda s, t=tier: codes[t][fresh_index[s["id"]]]),
+                       dtype=np.int16).reshape(len(order), basis[f"{tier}_modes"])
+        for tier in ("tier2", "tier3")}, basis)
+
+    wsi = wrap_wave_spore_index(patch({e["id"]: e for e in wsi["spores"]}, wave_spore_entry))
+    out.add("wave-spore-index.json", compact_json(wsi), f"{wsi['total_spores']} entries")
+
+    metrics = dict(zip(order, patch(metrics, spore_metrics_entry)))
+    out.add("spore-metrics-for-proteins.json", compact_json(metrics), f"{len(metrics)} proteins")
+
+    compact = wrap_compact_index(
+        patch({l.split("|", 1)[0]: l for l in compact_lines}, compact_line))
+    out.add("spore-index-compact.txt", compact)
+    stage_tag_index(out, TagIndex.build(order, [e["tags"] for e in wsi["spores"]]))
+
+    instrumentation.stage("write")
+    commit_outputs(out)
+    instrumentation.stage("shards")
+    publish_shards()
+
+    instrumentation.stage("manifest")
+    if pca is not None:
+        pca.save(PCA_STATE_PATH)
+    spore_manifest.save_manifest(MANIFEST_PATH, files, manifest["basis_hash"],
+                                 manifest["basis_spore_count"], churn)
+    print(f"\nDone! Patched {n_churn} spores into {len(order)}-spore indexes.")
+    return True
+
 
-    # 1. Delta basis
-    print("\n1. Computing delta-basis...")
-    basis = compute_delta_basis(spores)
-    out_path = os.path.join(OUTPUT_DIR, "delta-basis.json")
-    with open(out_path, "w") as f:
-        json.dump(basis, f, indent=None, separators=(",", ":"))
-    size = os.path.getsize(out_path)
-    print(f"   Written: {out_path} ({size:,} bytes, hash: {basis['basis_hash']})")
-
-    # 2. Tier-1 index
-    print("\n2. Generating tier1-index...")
-    tier1 = generate_tier1_index(spores, basis)
-    out_path = os.path.join(OUTPUT_DIR, "tier1-index.json")
-    with open(out_path, "w") as f:
-        json.dump(tier1, f, indent=None, separators=(",", ":"))
-    size = os.path.getsize(out_path)
-    print(f"   Written: {out_path} ({size:,} bytes, {tier1['spore_count']} entries)")
-
-    # 3. Wave spore index
-    print("\n3. Generating wave-spore-index...")
-    wsi = generate_wave_spore_index(spores)
-    out_path = os.path.join(OUTPUT_DIR, "wave-spore-index.json")
-    with open(out_path, "w") as f:
-        json.dump(wsi, f, indent=None, separators=(",", ":"))
-    size = os.path.getsize(out_path)
-    print(f"   Written: {out_path} ({size:,} bytes, {wsi['total_spores']} entries)")
-
-    # 4. Spore metrics
-    print("\n4. Generating spore-metrics-for-proteins...")
-    metrics = generate_spore_metrics(spores)
-    out_path = os.path.join(OUTPUT_DIR, "spore-metrics-for-proteins.json")
-    with open(out_path, "w") as f:
-        json.dump(metrics, f, indent=None, separators=(",", ":"))
-    size = os.path.getsize(out_path)
-    print(f"   Written: {out_path} ({size:,} bytes, {len(metrics)} proteins)")
-
-    # 5. Compact index
-    print("\n5. Generating spore-index-compact...")
-    compact = generate_compact_index(spores)
-    out_path = os.path.join(OUTPUT_DIR, "spore-index-compact.txt")
-    with open(out_path, "w") as f:
-        f.write(compact)
-    size = os.path.getsize(out_path)
-    print(f"   Written: {out_path} ({size:,} bytes)")
-
-    print(f"\nDone! All indexes regenerated for {len(spores)} spores.")
+def main():
+    parser = argparse.ArgumentParser(description="Regenerate docs/data indexes")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Patch outputs with changed spores only (uses manifest)")
+    parser.add_argument("--drift-threshold", type=float, default=DRIFT_THRESHOLD,
+                        help="Basis drift (or churn fraction) that forces re-basing")
+    parser.add_argument("--store", default=None,
+                        help="Load spores from a packed store (see spore_store.py) on full rebuilds")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="JSON loader processes (default: all cores)")
+    parser.add_argument("--generations", type=int, default=0,
+                        help="Publish outputs as atomic generations behind docs/data/current, "
+                             "keeping N previous ones for rollback (default: 0, in-place)")
+    parser.add_argument("--quant", choices=quantize.SCHEMES, default="global",
+                        help="Coefficient quantization: one global scale (default) or "
+                             "per-mode scales from the eigenvalues")
+    parser.add_argument("--canonical-map", action="store_true",
+                        help="Also write docs/data/canonical-ids.json mapping each near-duplicate "
+                             "spore to its cluster's canonical (oldest) spore on full rebuilds")
+    instrumentation.add_arguments(parser)
+    args = parser.parse_args()
+    store_path = os.path.abspath(args.store) if args.store else None
+
+    with instrumentation.session("regenerate-indexes", args):
+        os.chdir(os.path.dirname(os.path.abspath(__file__)))
+
+        manifest = spore_manifest.load_manifest(MANIFEST_PATH)
+        if args.incremental:
+            if manifest is None:
+                print("No usable manifest found; running full rebuild")
+            else:
+                with instrumentation.span("incremental"):
+                    done = regenerate_incremental(manifest, args.drift_threshold, args.workers,
+                                                  args.quant, args.generations)
+                if done:
+                    return
+        with instrumentation.span("full"):
+            regenerate_full(manifest, store_path, args.workers, args.quant, args.generations,
+                            args.canonical_map)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,173 @@
+"""
+Parallel, validating loader for wave-spores/*.json.
+
+Files are parsed in chunked batches across a process pool (orjson when it is
+installed, else the stdlib json module) and checked on the way in:
+  - amplitudes present, numeric and exactly N_DIMS long
+  - tier is one of KNOWN_TIERS
+  - basis_hash equals the expected hash, when one is given
+
+Rejected files are returned with a reason instead of being dropped silently,
+together with throughput figures for the pass. iter_spore_chunks() runs the
+same pass chunk by chunk for callers that do not keep every spore.
+"""
+
+import os
+import time
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+
+import instrumentation
+
+try:
+    import orjson as _json_backend
+    JSON_BACKEND = "orjson"
+except ImportError:  # pragma: no cover - depends on environment
+    import json as _json_backend
+    JSON_BACKEND = "json"
+
+N_DIMS = 200
+KNOWN_TIERS = ("core", "reference", "convergence")
+CHUNK_SIZE = 256
+PREFETCH_CHUNKS = 2  # chunks in flight per worker when streaming
+
+
+def validate_spore(s, basis_hash=None):
+    """Return a "category: detail" reject reason for a parsed spore, or None."""
+    if not isinstance(s, dict):
+        return "not a JSON object"
+    if not s.get("id"):
+        return "missing id"
+    amps = s.get("amplitudes")
+    if not isinstance(amps, list):
+        return "missing amplitudes"
+    if len(amps) != N_DIMS:
+        return f"amplitudes: length {len(amps)} != {N_DIMS}"
+    if not all(isinstance(a, (int, float)) and not isinstance(a, bool) for a in amps):
+        return "amplitudes: non-numeric values"
+    tier = s.get("tier", "reference")
+    if tier not in KNOWN_TIERS:
+        return f"tier: unknown {tier!r}"
+    if basis_hash is not None and s.get("basis_hash") != basis_hash:
+        return f"basis_hash: {s.get('basis_hash')!r} != {basis_hash}"
+    return None
+
+
+def _load_chunk(spore_dir, fnames, basis_hash):
+    """Worker: parse and validate one batch of files."""
+    accepted, rejects = [], []
+    n_bytes = 0
+    for fname in fnames:
+        try:
+            with open(os.path.join(spore_dir, fname), "rb") as f:
+                raw = f.read()
+            n_bytes += len(raw)
+            s = _json_backend.loads(raw)
+        except (OSError, ValueError) as e:
+            rejects.append((fname, f"unreadable: {e}"))
+            continue
+        reason = validate_spore(s, basis_hash)
+        if reason:
+            rejects.append((fname, reason))
+        else:
+            accepted.append((fname, s))
+    return accepted, rejects, n_bytes
+
+
+class LoadResult:
+    """Spores accepted by one loader pass, plus rejects and throughput."""
+
+    def __init__(self, accepted, rejects, n_bytes, elapsed, files=None):
+        # files without accepted: a streamed pass whose spores were not kept
+        self.files = files if files is not None else [fname for fname, _ in accepted]
+        self.spores = [s for _, s in accepted]
+        self.rejects = rejects
+        self.n_bytes = n_bytes
+        self.elapsed = elapsed
+
+    @property
+    def n_files(self):
+        return len(self.files) + len(self.rejects)
+
+    def summary(self):
+        secs = max(self.elapsed, 1e-9)
+        return {
+            "files": self.n_files,
+            "accepted": len(self.files),
+            "rejected": len(self.rejects),
+            "reject_reasons": dict(Counter(r.split(":")[0] for _, r in self.rejects)),
+            "bytes": self.n_bytes,
+            "seconds": round(self.elapsed, 4),
+            "files_per_s": round(self.n_files / secs, 1),
+            "mb_per_s": round(self.n_bytes / secs / 1e6, 2),
+            "backend": JSON_BACKEND,
+        }
+
+    def report(self, max_rejects=20):
+        """Print throughput and rejected files."""
+        st = self.summary()
+        print(f"  Parsed {st['files']} files ({st['bytes'] / 1e6:.1f} MB) in {st['seconds']:.2f}s "
+              f"[{st['files_per_s']:,.0f} files/s, {st['mb_per_s']:.1f} MB/s, {st['backend']}]")
+        if self.rejects:
+            print(f"  Rejected {len(self.rejects)} files:")
+            for fname, reason in self.rejects[:max_rejects]:
+                print(f"    {fname}: {reason}")
+            if len(self.rejects) > max_rejects:
+                print(f"    ... and {len(self.rejects) - max_rejects} more")
+
+
+def _counted(chunk_result):
+    accepted, rejects, n_bytes = chunk_result
+    instrumentation.count("spores_loaded", len(accepted))
+    instrumentation.count("bytes_read", n_bytes)
+    for reason, n in Counter(r.split(":")[0] for _, r in rejects).items():
+        instrumentation.count("spores_rejected", n, reason=reason)
+    return chunk_result
+
+
+def iter_spore_chunks(spore_dir, fnames, basis_hash=None, workers=None, chunk_size=CHUNK_SIZE):
+    """
+    Parse and validate the given files in order, yielding one
+    (accepted [(fname, spore)], rejects, n_bytes) tuple per chunk of
+    chunk_size files. With several workers at most PREFETCH_CHUNKS chunks per
+    worker are in flight, so memory stays bounded by the chunk size however
+    slowly the caller consumes them.
+    """
+    chunks = [fnames[i:i + chunk_size] for i in range(0, len(fnames), chunk_size)]
+    workers = workers or os.cpu_count() or 1
+    if workers <= 1 or len(chunks) <= 1:
+        for c in chunks:
+            yield _counted(_load_chunk(spore_dir, c, basis_hash))
+        return
+    with ProcessPoolExecutor(max_workers=min(workers, len(chunks))) as pool:
+        todo = iter(chunks)
+        pending = deque(pool.submit(_load_chunk, spore_dir, c, basis_hash)
+                        for c in islice(todo, PREFETCH_CHUNKS * workers))
+        while pending:
+            result = pending.popleft().result()
+            nxt = next(todo, None)
+            if nxt is not None:
+                pending.append(pool.submit(_load_chunk, spore_dir, nxt, basis_hash))
+            yield _counted(result)
+
+
+def load_spore_files(spore_dir, fnames, basis_hash=None, workers=None, chunk_size=CHUNK_SIZE):
+    """
+    Parse and validate the given files (relative to spore_dir), preserving
+    order. Small batches run in-process; larger ones fan out to `workers`
+    processes (default: all cores) in chunks of chunk_size files.
+    """
+    start = time.perf_counter()
+    accepted, rejects, n_bytes = [], [], 0
+    for a, r, b in iter_spore_chunks(spore_dir, fnames, basis_hash, workers, chunk_size):
+        accepted.extend(a)
+        rejects.extend(r)
+        n_bytes += b
+    return LoadResult(accepted, rejects, n_bytes, time.perf_counter() - start)
+
+
+def load_spore_dir(spore_dir, basis_hash=None, workers=None, chunk_size=CHUNK_SIZE):
+    """Parse and validate every *.json in spore_dir (sorted by filename)."""
+    fnames = sorted(f for f in os.listdir(spore_dir) if f.endswith(".json"))
+    return load_spore_files(spore_dir, fnames, basis_hash, workers, chunk_size)
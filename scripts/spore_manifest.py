@@ -0,0 +1,87 @@
+"""
+File manifest for incremental index regeneration.
+
+Records mtime, size and sha256 of every wave-spores/*.json (plus the spore id
+it contained) so a regeneration run only has to parse the files that changed
+since the previous run.
+"""
+
+import hashlib
+import json
+import os
+
+from generations import write_atomic
+
+MANIFEST_VERSION = 1
+
+
+def file_digest(path):
+    """sha256 hex digest of a file's contents."""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def load_manifest(path):
+    """
+    Load a manifest, or None if it is missing, unreadable (e.g. truncated)
+    or from another version; callers then rebuild from scratch.
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path) as f:
+            manifest = json.load(f)
+    except ValueError:
+        return None
+    if not isinstance(manifest, dict) or manifest.get("version") != MANIFEST_VERSION:
+        return None
+    return manifest
+
+
+def save_manifest(path, files, basis_hash, basis_spore_count, churn_since_basis):
+    """Write the manifest for the current state of the spore directory."""
+    manifest = {
+        "version": MANIFEST_VERSION,
+        "basis_hash": basis_hash,
+        "basis_spore_count": basis_spore_count,
+        "churn_since_basis": churn_since_basis,
+        "files": files,
+    }
+    write_atomic(path, json.dumps(manifest, indent=None, separators=(",", ":")))
+
+
+def scan(spore_dir, previous=None):
+    """
+    Diff spore_dir against a previous manifest.
+
+    Files whose mtime and size are unchanged are trusted without hashing.
+    Returns (files, added, changed, removed): files is the new
+    filename -> entry mapping, the rest are sorted lists of filenames.
+    Entries for added/changed files have no "id" until the caller loads them.
+    """
+    prev_files = previous["files"] if previous else {}
+    files = {}
+    added, changed = [], []
+    for fname in sorted(os.listdir(spore_dir)):
+        if not fname.endswith(".json"):
+            continue
+        st = os.stat(os.path.join(spore_dir, fname))
+        old = prev_files.get(fname)
+        if old and old["mtime_ns"] == st.st_mtime_ns and old["size"] == st.st_size:
+            files[fname] = old
+            continue
+        digest = file_digest(os.path.join(spore_dir, fname))
+        if old and old["sha256"] == digest:
+            # Touched but identical content
+            files[fname] = dict(old, mtime_ns=st.st_mtime_ns)
+            continue
+        files[fname] = {"mtime_ns": st.st_mtime_ns, "size": st.st_size, "sha256": digest}
+        if old is None:
+            added.append(fname)
+        else:
+            changed.append(fname)
+    removed = sorted(set(prev_files) - set(files))
+    return files, added, changed, removed
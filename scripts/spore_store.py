@@ -0,0 +1,164 @@
+"""
+Packed columnar spore store built from wave-spores/*.json.
+
+Layout of a store directory:
+  - amplitudes.npy   (N x 200 float64 or float32)
+  - delta_tier1.npy  (N x 32 int16, the spores' own stored codes)
+  - delta_tier3.npy  (N x 130 int16)
+  - meta.json        (header + columnar side table: id, tier, scores, tags, ...)
+
+Files rejected by spore_loader validation are left out of the store.
+
+The .npy blocks are opened with np.load(mmap_mode="r"), i.e. as np.memmap,
+so loading a store skips opening and parsing one JSON file per spore and
+never materialises the amplitudes as Python float lists. meta.json is still
+parsed whole; it holds the side table, so that parse grows with the corpus.
+
+Usage: python scripts/spore_store.py [--spores DIR] [--out DIR] [--dtype float32]
+"""
+
+import argparse
+import json
+import os
+from datetime import datetime, timezone
+
+import numpy as np
+
+import spore_loader
+
+STORE_VERSION = 1
+STORE_DIR = "spore-store"
+ARRAY_FIELDS = ("amplitudes", "delta_tier1", "delta_tier3")
+N_DIMS = 200
+TIER1_WIDTH = 32
+TIER3_WIDTH = 130
+BUILD_BATCH = 4096  # files parsed per loader pass while building
+
+
+def _source_stamp(spore_dir, fnames):
+    """Newest mtime among the source files (ns), used for staleness checks."""
+    return max((os.stat(os.path.join(spore_dir, f)).st_mtime_ns for f in fnames), default=0)
+
+
+def _fixed_row(values, width):
+    row = np.zeros(width, dtype=np.int16)
+    if values:
+        row[:min(len(values), width)] = values[:width]
+    return row
+
+
+def build_store(spore_dir, out_dir=STORE_DIR, dtype="float64", workers=None):
+    """
+    Pack every valid wave spore JSON in spore_dir into out_dir, parsing in
+    bounded batches. Invalid files are reported and left out. Returns the header.
+    """
+    source_files = sorted(f for f in os.listdir(spore_dir) if f.endswith(".json"))
+    # Each batch is reduced to compact arrays + metadata rows before the next
+    # one is parsed, so only one batch of full JSON documents is ever resident.
+    amp_blocks, t1_blocks, t3_blocks, meta_rows, files = [], [], [], [], []
+    for i in range(0, len(source_files), BUILD_BATCH):
+        loaded = spore_loader.load_spore_files(spore_dir, source_files[i:i + BUILD_BATCH],
+                                               workers=workers)
+        loaded.report()
+        amp_blocks.append(np.array([s["amplitudes"] for s in loaded.spores], dtype=dtype
+                                   ).reshape(-1, N_DIMS))
+        t1_blocks.append(np.array([_fixed_row(s.get("delta_tier1"), TIER1_WIDTH)
+                                   for s in loaded.spores], dtype=np.int16).reshape(-1, TIER1_WIDTH))
+        t3_blocks.append(np.array([_fixed_row(s.get("delta_tier3"), TIER3_WIDTH)
+                                   for s in loaded.spores], dtype=np.int16).reshape(-1, TIER3_WIDTH))
+        meta_rows.extend({k: v for k, v in s.items() if k not in ARRAY_FIELDS}
+                         for s in loaded.spores)
+        files.extend(loaded.files)
+
+    n = len(files)
+    columns = {}
+    for i, row in enumerate(meta_rows):
+        for key, value in row.items():
+            columns.setdefault(key, [None] * n)[i] = value
+
+    os.makedirs(out_dir, exist_ok=True)
+    for name, blocks, width, block_dtype in (
+            ("amplitudes.npy", amp_blocks, N_DIMS, dtype),
+            ("delta_tier1.npy", t1_blocks, TIER1_WIDTH, np.int16),
+            ("delta_tier3.npy", t3_blocks, TIER3_WIDTH, np.int16)):
+        np.save(os.path.join(out_dir, name),
+                np.concatenate(blocks) if blocks else np.zeros((0, width), dtype=block_dtype))
+
+    header = {
+        "version": STORE_VERSION,
+        "spore_count": n,
+        "dims": N_DIMS,
+        "dtype": np.dtype(dtype).name,
+        "source_dir": os.path.abspath(spore_dir),
+        "source_mtime_ns": _source_stamp(spore_dir, source_files),
+        "built_at": datetime.now(timezone.utc).isoformat(),
+        "source_files": source_files,
+        "files": files,
+        "columns": columns,
+    }
+    with open(os.path.join(out_dir, "meta.json"), "w") as f:
+        json.dump(header, f, indent=None, separators=(",", ":"))
+    return header
+
+
+class SporeStore:
+    """Memory-mapped view of a packed spore store."""
+
+    def __init__(self, path, mmap=True):
+        with open(os.path.join(path, "meta.json")) as f:
+            header = json.load(f)
+        if header.get("version") != STORE_VERSION:
+            raise ValueError(f"{path}: unsupported spore store version {header.get('version')}")
+        mode = "r" if mmap else None
+        self.path = path
+        self.header = header
+        self.files = header["files"]
+        self.columns = header["columns"]
+        self.amplitudes = np.load(os.path.join(path, "amplitudes.npy"), mmap_mode=mode)
+        self.delta_tier1 = np.load(os.path.join(path, "delta_tier1.npy"), mmap_mode=mode)
+        self.delta_tier3 = np.load(os.path.join(path, "delta_tier3.npy"), mmap_mode=mode)
+
+    def __len__(self):
+        return self.header["spore_count"]
+
+    @property
+    def ids(self):
+        return self.columns["id"]
+
+    def is_stale(self, spore_dir):
+        """True if spore_dir no longer matches the files the store was built from."""
+        fnames = sorted(f for f in os.listdir(spore_dir) if f.endswith(".json"))
+        return (fnames != self.header["source_files"]
+                or _source_stamp(spore_dir, fnames) != self.header["source_mtime_ns"])
+
+    def spore(self, i):
+        """Spore dict for row i; array fields are views into the mapped blocks."""
+        s = {key: col[i] for key, col in self.columns.items() if col[i] is not None}
+        s["amplitudes"] = self.amplitudes[i]
+        s["delta_tier1"] = self.delta_tier1[i]
+        s["delta_tier3"] = self.delta_tier3[i]
+        return s
+
+    def spores(self):
+        """All spores as dicts, in the same order as load_spores() (by filename)."""
+        return [self.spore(i) for i in range(len(self))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build packed spore store")
+    parser.add_argument("--spores", default="wave-spores")
+    parser.add_argument("--out", default=STORE_DIR)
+    parser.add_argument("--dtype", choices=("float64", "float32"), default="float64",
+                        help="Amplitude precision (float64 is bit-exact with the JSON)")
+    parser.add_argument("--workers", type=int, default=None,
+                        help="JSON loader processes (default: all cores)")
+    args = parser.parse_args()
+
+    header = build_store(args.spores, args.out, args.dtype, args.workers)
+    size = sum(os.path.getsize(os.path.join(args.out, f)) for f in os.listdir(args.out))
+    print(f"Packed {header['spore_count']} spores into {args.out} "
+          f"({size:,} bytes, amplitudes {header['dtype']})")
+
+
+if __name__ == "__main__":
+    main()
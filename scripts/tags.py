@@ -0,0 +1,365 @@
+"""
+Shared tag handling for the index pipeline and analysis scripts.
+
+  PrefixMatcher        one precompiled "starts with any of these prefixes"
+                       test, memoised per distinct tag
+  index_tags()         tags kept in tier1-index / spore-index-compact
+  semantic_tags()      tags left after every system prefix is stripped
+  TagVocab             interned tag strings <-> dense integer ids
+  TagIndex             tag -> spore inverted index (docs/data/tag-index.json)
+
+TagIndex keeps each tag's postings as sorted row numbers (CSR over the
+vocabulary) and hands out bitmaps (Python ints, bit i = row i) for set
+algebra, so a tag-filtered query is a handful of &, | and ~ on bitmaps and
+tag counts over a set of spores are one bincount instead of a list scan.
+
+tag-index.json rows follow its "ids" list (the order of every other
+per-spore output). A tag's postings are stored as a little-endian bitmap
+(base64) when at least 1/BITMAP_FRACTION of the spores carry it, otherwise
+as a list of row numbers, whichever is smaller.
+
+Usage: python scripts/tags.py [--data DIR] [--all TAG ...] [--any TAG ...]
+                              [--none TAG ...] [--top N]
+"""
+
+import argparse
+import base64
+import json
+import os
+import sys
+from array import array
+
+import numpy as np
+
+TAG_INDEX_FILE = "tag-index.json"
+TAG_INDEX_VERSION = 1
+BITMAP_FRACTION = 32
+
+# Dropped from the tag lists of tier1-index.json and spore-index-compact.txt
+INDEX_EXCLUDED_PREFIXES = ("#embed:", "#dna:", "#synthesis:", "#source:")
+
+# Stripped before semantic analysis (lens geometry, basin summaries)
+SYSTEM_TAG_PREFIXES = (
+    "#embed:", "#dna:", "#synthesis:", "#source:", "#calibration",
+    "#golden_connectome", "#P-series", "#public", "#auto-generated",
+    "#connectome:", "#substrate:", "#file:", "#repo:", "#commit:",
+    "#component:", "#lang:", "#structural-observation", "#attentional-pattern",
+)
+
+
+class PrefixMatcher:
+    """
+    Does a tag start with any of a fixed set of prefixes? The prefixes are
+    checked in one str.startswith call and the answer is cached per tag, so
+    the vocabulary (a few thousand tags) is only ever tested once.
+    """
+
+    def __init__(self, prefixes):
+        self.prefixes = tuple(prefixes)
+        self._seen = {}
+
+    def __call__(self, tag):
+        hit = self._seen.get(tag)
+        if hit is None:
+            hit = self._seen[tag] = tag.startswith(self.prefixes)
+        return hit
+
+    def strip(self, tags):
+        """The tags that do not match, in order."""
+        seen = self._seen
+        return [t for t in tags if not (seen[t] if t in seen else self(t))]
+
+
+is_index_excluded = PrefixMatcher(INDEX_EXCLUDED_PREFIXES)
+is_system_tag = PrefixMatcher(SYSTEM_TAG_PREFIXES)
+
+
+def index_tags(tags):
+    """Tags kept in the tier-1 and compact indexes."""
+    return is_index_excluded.strip(tags)
+
+
+def semantic_tags(tags):
+    """Filter to semantic-only tags, strip system/dna/embed prefixes."""
+    return is_system_tag.strip(tags)
+
+
+class TagVocab:
+    """Interned tag strings with dense integer ids, in first-seen order."""
+
+    def __init__(self, tags=()):
+        self.tags = []
+        self.ids = {}
+        for t in tags:
+            self.intern(t)
+
+    def __len__(self):
+        return len(self.tags)
+
+    def __getitem__(self, tag_id):
+        return self.tags[tag_id]
+
+    def __contains__(self, tag):
+        return tag in self.ids
+
+    def get(self, tag, default=None):
+        return self.ids.get(tag, default)
+
+    def intern(self, tag):
+        tag_id = self.ids.get(tag)
+        if tag_id is None:
+            tag = sys.intern(tag)
+            tag_id = self.ids[tag] = len(self.tags)
+            self.tags.append(tag)
+        return tag_id
+
+    def encode(self, tags):
+        return [self.intern(t) for t in tags]
+
+
+# ── Bitmaps ───────────────────────────────────────────────────────────────────
+
+def bitmap_from_rows(rows, n):
+    """Bitmap (int) with the given row bits set, for n rows."""
+    bits = np.zeros(n, dtype=bool)
+    bits[np.asarray(rows, dtype=np.int64)] = True
+    return int.from_bytes(np.packbits(bits, bitorder="little").tobytes(), "little")
+
+
+def bitmap_rows(bitmap, n):
+    """Sorted row numbers of the set bits of a bitmap over n rows."""
+    if not bitmap:
+        return np.zeros(0, dtype=np.int64)
+    raw = np.frombuffer(bitmap.to_bytes((n + 7) // 8, "little"), dtype=np.uint8)
+    return np.flatnonzero(np.unpackbits(raw, bitorder="little")[:n])
+
+
+class TagIndex:
+    """
+    Inverted index from tags to spore rows. postings are CSR: the rows of
+    vocab tag t are rows[indptr[t]:indptr[t + 1]], sorted.
+    """
+
+    def __init__(self, ids, vocab, indptr, rows, row_tags=None):
+        self.ids = ids
+        self.vocab = vocab
+        self.indptr = indptr
+        self.rows = rows
+        self.counts = np.diff(indptr)
+        # Forward view (row -> tag ids) for counting tags over a set of rows;
+        # the builder keeps each spore's own tag order, a loaded index has
+        # vocabulary order within a row
+        if row_tags is None:
+            owner = np.repeat(np.arange(len(vocab), dtype=np.uint32), self.counts)
+            row_tags = owner[np.argsort(rows, kind="stable")]
+        self.row_tags = row_tags
+        self.row_indptr = np.zeros(len(ids) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(rows, minlength=len(ids)), out=self.row_indptr[1:])
+        self._row_of = None
+        self._bitmaps = {}
+
+    @classmethod
+    def build(cls, ids, tag_lists):
+        """Index spores given their ids and tag lists (same order)."""
+        builder = TagIndexBuilder()
+        for row, tags in enumerate(tag_lists):
+            builder.add(row, tags)
+        return builder.finish(ids)
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def all(self):
+        """Bitmap of every spore."""
+        return (1 << len(self.ids)) - 1
+
+    def postings(self, tag):
+        """Sorted rows of the spores carrying `tag` (empty if unknown)."""
+        t = self.vocab.get(tag)
+        if t is None:
+            return self.rows[:0]
+        return self.rows[self.indptr[t]:self.indptr[t + 1]]
+
+    def count(self, tag):
+        t = self.vocab.get(tag)
+        return 0 if t is None else int(self.counts[t])
+
+    def bitmap(self, tag):
+        """Bitmap of the spores carrying `tag` (cached)."""
+        bm = self._bitmaps.get(tag)
+        if bm is None:
+            bm = self._bitmaps[tag] = bitmap_from_rows(self.postings(tag), len(self.ids))
+        return bm
+
+    def select(self, all_of=(), any_of=(), none_of=()):
+        """
+        Bitmap of the spores carrying every tag in all_of, at least one in
+        any_of (if given) and none in none_of.
+        """
+        bm = self.all
+        # Rarest first: the intersection shrinks fastest
+        for tag in sorted(all_of, key=self.count):
+            bm &= self.bitmap(tag)
+            if not bm:
+                return 0
+        if any_of:
+            either = 0
+            for tag in any_of:
+                either |= self.bitmap(tag)
+            bm &= either
+        for tag in none_of:
+            bm &= ~self.bitmap(tag)
+        return bm
+
+    def select_rows(self, bitmap):
+        return bitmap_rows(bitmap, len(self.ids))
+
+    def select_ids(self, bitmap):
+        return [self.ids[i] for i in self.select_rows(bitmap)]
+
+    def mask(self, bitmap, ids=None):
+        """
+        Boolean row mask of a bitmap, aligned to `ids` (another index's
+        order, e.g. tier1-index) when given; unknown ids are False.
+        """
+        m = np.zeros(len(self.ids), dtype=bool)
+        m[self.select_rows(bitmap)] = True
+        if ids is None or ids == self.ids:
+            return m
+        rows = self.rows_of(ids)
+        return np.where(rows >= 0, m[rows], False)
+
+    def rows_of(self, ids):
+        """Rows of the given spore ids (-1 for ids not in the index)."""
+        if self._row_of is None:
+            self._row_of = {sid: i for i, sid in enumerate(self.ids)}
+        return np.array([self._row_of.get(sid, -1) for sid in ids], dtype=np.int64)
+
+    def tag_counts(self, rows, exclude=None, top_n=None):
+        """
+        (tag, count) over the spores at `rows`, most common first, skipping
+        tags for which exclude(tag) is true (e.g. is_system_tag). Ties keep
+        first-seen order along `rows`, like Counter.most_common. Costs one
+        gather + bincount over the selected spores' tags, whatever the
+        corpus size.
+        """
+        rows = np.asarray(rows, dtype=np.int64)
+        starts = self.row_indptr[rows]
+        lengths = self.row_indptr[rows + 1] - starts
+        offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+        gathered = self.row_tags[offsets + np.arange(len(offsets))]
+        nz, first = np.unique(gathered, return_index=True)
+        counts = np.bincount(gathered, minlength=len(self.vocab))
+        order = nz[np.lexsort((first, -counts[nz]))]
+        out = []
+        for t in order:
+            tag = self.vocab[t]
+            if exclude is not None and exclude(tag):
+                continue
+            out.append((tag, int(counts[t])))
+            if top_n is not None and len(out) == top_n:
+                break
+        return out
+
+    # ── docs/data/tag-index.json ──────────────────────────────────────────────
+
+    def to_json(self):
+        """The tag-index.json document; tags in sorted order."""
+        n = len(self.ids)
+        tags = {}
+        for tag in sorted(self.vocab.tags):
+            rows = self.postings(tag)
+            if len(rows) * BITMAP_FRACTION >= n:
+                bits = np.zeros(n, dtype=bool)
+                bits[rows] = True
+                packed = np.packbits(bits, bitorder="little").tobytes()
+                tags[tag] = {"n": len(rows), "bitmap": base64.b64encode(packed).decode("ascii")}
+            else:
+                tags[tag] = {"n": len(rows), "rows": rows.tolist()}
+        return {"version": TAG_INDEX_VERSION, "spore_count": n, "tag_count": len(tags),
+                "bitmap_fraction": BITMAP_FRACTION, "ids": self.ids, "tags": tags}
+
+    @classmethod
+    def from_json(cls, doc):
+        if doc.get("version") != TAG_INDEX_VERSION:
+            raise ValueError(f"unsupported tag-index version {doc.get('version')}")
+        n = doc["spore_count"]
+        vocab = TagVocab()
+        indptr = [0]
+        chunks = []
+        for tag, entry in doc["tags"].items():
+            vocab.intern(tag)
+            if "bitmap" in entry:
+                raw = np.frombuffer(base64.b64decode(entry["bitmap"]), dtype=np.uint8)
+                rows = np.flatnonzero(np.unpackbits(raw, bitorder="little")[:n])
+            else:
+                rows = np.asarray(entry["rows"], dtype=np.int64)
+            chunks.append(rows.astype(np.uint32))
+            indptr.append(indptr[-1] + len(rows))
+        rows = np.concatenate(chunks) if chunks else np.zeros(0, dtype=np.uint32)
+        return cls(doc["ids"], vocab, np.asarray(indptr, dtype=np.int64), rows)
+
+    @classmethod
+    def load(cls, data_dir):
+        with open(os.path.join(data_dir, TAG_INDEX_FILE)) as f:
+            return cls.from_json(json.load(f))
+
+
+class TagIndexBuilder:
+    """Accumulates (row, tag) postings while spores stream past."""
+
+    def __init__(self):
+        self.vocab = TagVocab()
+        self.tag_ids = array("I")
+        self.row_ids = array("I")
+
+    def add(self, row, tags):
+        seen = set()
+        for t in tags:
+            if t not in seen:
+                seen.add(t)
+                self.tag_ids.append(self.vocab.intern(t))
+                self.row_ids.append(row)
+
+    def finish(self, ids):
+        tag_ids = np.frombuffer(self.tag_ids, dtype=np.uint32)
+        row_ids = np.frombuffer(self.row_ids, dtype=np.uint32)
+        # Sort postings by (tag, row); rows arrive ascending so a stable tag sort suffices
+        order = np.argsort(tag_ids, kind="stable")
+        counts = np.bincount(tag_ids, minlength=len(self.vocab))
+        indptr = np.zeros(len(self.vocab) + 1, dtype=np.int64)
+        np.cumsum(counts, out=indptr[1:])
+        return TagIndex(list(ids), self.vocab, indptr, row_ids[order].copy(), tag_ids.copy())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query the tag -> spore inverted index")
+    parser.add_argument("--data", default="docs/data")
+    parser.add_argument("--all", nargs="*", default=[], metavar="TAG",
+                        help="Spores must carry every one of these tags")
+    parser.add_argument("--any", nargs="*", default=[], metavar="TAG",
+                        help="Spores must carry at least one of these tags")
+    parser.add_argument("--none", nargs="*", default=[], metavar="TAG",
+                        help="Spores must carry none of these tags")
+    parser.add_argument("--top", type=int, default=15,
+                        help="Semantic tags to list for the selection")
+    args = parser.parse_args()
+
+    index = TagIndex.load(args.data)
+    print(f"{len(index)} spores, {len(index.vocab)} tags")
+    bm = index.select(args.all, args.any, args.none)
+    rows = index.select_rows(bm)
+    print(f"Selected {len(rows)} spores")
+    for sid in index.select_ids(bm)[:10]:
+        print(f"  {sid}")
+    if len(rows) > 10:
+        print(f"  ... {len(rows) - 10} more")
+    if len(rows):
+        print("Top semantic tags:")
+        for tag, c in index.tag_counts(rows, exclude=is_system_tag, top_n=args.top):
+            print(f"  {tag:<35} {c:>5}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,229 @@
+"""
+Binary tier index files: docs/data/tier1-index.bin (sidecar of
+tier1-index.json) and the codes-only tier2-index.bin / tier3-index.bin.
+
+Same content as the JSON, laid out so it can be used zero-copy via
+np.frombuffer (downloaded bytes) or np.memmap (local file). All integers and
+floats are little-endian; every section starts on an 8-byte boundary.
+
+  header (128 bytes)
+    magic        4s   b"EDT1"
+    version      u16  (2; version 1 files are tier-1 only)
+    index_tier   u16  1, 2 or 3
+    basis_hash   16s  ASCII
+    modes        u32
+    count        u32
+    computed_at  40s  ISO timestamp, NUL padded
+    offsets      6 x u64  codes, columns, id_offsets, tag_offsets, blob, end
+  codes        count x modes int16
+  columns      s5 f32[count], coh f32[count], res f32[count] (NaN = absent),
+               tier u8[count] (ASCII c/r/x, 0 = absent)
+  id_offsets   u32[count + 1] into blob
+  tag_offsets  u32[count + 1] into blob (tags of one spore joined by "\\n")
+  blob         UTF-8 strings
+
+Usage: python scripts/tier1_binary.py [--data DIR] [--check]
+"""
+
+import argparse
+import json
+import os
+import struct
+import time
+
+import numpy as np
+
+MAGIC = b"EDT1"
+BINARY_VERSION = 2
+HEADER = struct.Struct("<4sHH16sII40s6Q")
+HEADER_SIZE = 128
+TAG_SEP = "\n"
+
+
+def _align(n):
+    return (n + 7) & ~7
+
+
+def _string_table(strings):
+    """UTF-8 blob of the strings plus u32 offsets (len + 1)."""
+    encoded = [s.encode("utf-8") for s in strings]
+    offsets = np.zeros(len(encoded) + 1, dtype="<u4")
+    offsets[1:] = np.cumsum([len(b) for b in encoded])
+    return b"".join(encoded), offsets
+
+
+def pack(basis_hash, computed_at, ids, codes, index_tier=1, s5=None, coh=None, res=None,
+         tiers=None, tags=None):
+    """
+    Serialise a tier index from column arrays. Metadata columns are
+    optional (the tier-2/3 indexes carry codes and ids only); missing floats
+    are stored as NaN, missing tier characters as 0. Each row's tags may be
+    a list or an already TAG_SEP-joined string.
+    """
+    count, modes = codes.shape
+    nan = np.full(count, np.nan, dtype="<f4")
+    s5 = nan if s5 is None else np.asarray(s5, dtype="<f4")
+    coh = nan if coh is None else np.asarray(coh, dtype="<f4")
+    res = nan if res is None else np.asarray(res, dtype="<f4")
+    tier = (np.zeros(count, dtype=np.uint8) if tiers is None
+            else np.frombuffer("".join(tiers).encode("ascii"), dtype=np.uint8))
+    columns = s5.tobytes() + coh.tobytes() + res.tobytes() + tier.tobytes()
+
+    id_blob, id_offsets = _string_table(ids)
+    tag_blob, tag_offsets = _string_table([t if isinstance(t, str) else TAG_SEP.join(t)
+                                           for t in tags or [[]] * count])
+    tag_offsets += len(id_blob)
+
+    sections = [np.ascontiguousarray(codes, dtype="<i2").tobytes(), columns,
+                id_offsets.tobytes(), tag_offsets.tobytes(), id_blob + tag_blob]
+    offsets, pos = [], HEADER_SIZE
+    for data in sections:
+        offsets.append(pos)
+        pos = _align(pos + len(data))
+    offsets.append(pos)
+
+    header = HEADER.pack(MAGIC, BINARY_VERSION, index_tier, basis_hash.encode("ascii"),
+                         modes, count, computed_at.encode("ascii"), *offsets)
+    out = bytearray(pos)
+    out[:len(header)] = header
+    for off, data in zip(offsets, sections):
+        out[off:off + len(data)] = data
+    return bytes(out)
+
+
+def encode(tier1):
+    """Serialise a tier1-index.json envelope to bytes."""
+    entries = tier1["spores"]
+    codes = np.array([e["c"] for e in entries], dtype="<i2").reshape(len(entries), tier1["modes"])
+    return pack(tier1["basis_hash"], tier1["computed_at"], [e["id"] for e in entries], codes,
+                index_tier=tier1.get("tier", 1),
+                s5=[e["s5"] for e in entries],
+                coh=[e["coh"] for e in entries],
+                res=[e.get("res", np.nan) for e in entries],
+                tiers=[e["tier"] for e in entries],
+                tags=[e.get("tags", []) for e in entries])
+
+
+def write(path, tier1):
+    """Write the binary sidecar for a tier1 envelope; returns (path, size)."""
+    data = encode(tier1)
+    with open(path, "wb") as f:
+        f.write(data)
+    return path, len(data)
+
+
+class Tier1Binary:
+    """Zero-copy view of a tier index .bin buffer (tier 1, 2 or 3)."""
+
+    def __init__(self, buf):
+        buf = np.frombuffer(buf, dtype=np.uint8) if not isinstance(buf, np.ndarray) else buf
+        if len(buf) < HEADER_SIZE:
+            raise ValueError("tier1 binary: truncated header")
+        (magic, version, index_tier, basis_hash, modes, count, computed_at,
+         *offsets) = HEADER.unpack_from(buf[:HEADER.size].tobytes())
+        if magic != MAGIC:
+            raise ValueError(f"tier1 binary: bad magic {magic!r}")
+        if version not in (1, BINARY_VERSION):
+            raise ValueError(f"tier1 binary: unsupported version {version}")
+        if offsets[-1] > len(buf):
+            raise ValueError(f"tier1 binary: truncated ({len(buf)} < {offsets[-1]} bytes)")
+        codes_off, cols_off, ids_off, tags_off, blob_off, end = offsets
+
+        self.buf = buf
+        self.basis_hash = basis_hash.decode("ascii")
+        self.index_tier = index_tier or 1  # version 1 left this field 0
+        self.modes = modes
+        self.count = count
+        self.computed_at = computed_at.rstrip(b"\0").decode("ascii")
+        self.codes = buf[codes_off:codes_off + 2 * count * modes].view("<i2").reshape(count, modes)
+        cols = buf[cols_off:cols_off + 12 * count].view("<f4")
+        self.s5, self.coh, self.res = cols[:count], cols[count:2 * count], cols[2 * count:]
+        self.tier = buf[cols_off + 12 * count:cols_off + 13 * count]
+        self._id_offsets = buf[ids_off:ids_off + 4 * (count + 1)].view("<u4")
+        self._tag_offsets = buf[tags_off:tags_off + 4 * (count + 1)].view("<u4")
+        self._blob = buf[blob_off:end]
+
+    @classmethod
+    def open(cls, path, mmap=True):
+        """Map (or read) a tier index .bin file."""
+        if mmap:
+            return cls(np.memmap(path, dtype=np.uint8, mode="r"))
+        with open(path, "rb") as f:
+            return cls(f.read())
+
+    def __len__(self):
+        return self.count
+
+    def _string(self, offsets, i):
+        return self._blob[offsets[i]:offsets[i + 1]].tobytes().decode("utf-8")
+
+    def id(self, i):
+        return self._string(self._id_offsets, i)
+
+    @property
+    def ids(self):
+        return [self.id(i) for i in range(self.count)]
+
+    def tags(self, i):
+        joined = self._string(self._tag_offsets, i)
+        return joined.split(TAG_SEP) if joined else []
+
+    def entry(self, i):
+        """tier1-index.json entry for row i (same keys and rounding)."""
+        entry = {"id": self.id(i), "c": self.codes[i].tolist()}
+        if not np.isnan(self.s5[i]):
+            entry["s5"] = round(float(self.s5[i]), 3)
+        if not np.isnan(self.coh[i]):
+            entry["coh"] = round(float(self.coh[i]), 2)
+        if self.tier[i]:
+            entry["tier"] = chr(self.tier[i])
+        if not np.isnan(self.res[i]):
+            entry["res"] = round(float(self.res[i]), 3)
+        tags = self.tags(i)
+        if tags:
+            entry["tags"] = tags
+        return entry
+
+    def to_json(self):
+        """Rebuild the tier-N index envelope (tier1-index.json for tier 1)."""
+        return {
+            "basis_hash": self.basis_hash,
+            "tier": self.index_tier,
+            "modes": self.modes,
+            "spore_count": self.count,
+            "computed_at": self.computed_at,
+            "spores": [self.entry(i) for i in range(self.count)],
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Write / check the binary tier-1 index")
+    parser.add_argument("--data", default="docs/data", help="Directory with tier1-index.json")
+    parser.add_argument("--check", action="store_true",
+                        help="Only verify the existing .bin round-trips against the JSON")
+    args = parser.parse_args()
+
+    json_path = os.path.join(args.data, "tier1-index.json")
+    bin_path = os.path.join(args.data, "tier1-index.bin")
+
+    t0 = time.perf_counter()
+    with open(json_path) as f:
+        tier1 = json.load(f)
+    json_secs = time.perf_counter() - t0
+    if not args.check:
+        write(bin_path, tier1)
+
+    t0 = time.perf_counter()
+    with open(bin_path, "rb") as f:
+        view = Tier1Binary(f.read())
+    bin_secs = time.perf_counter() - t0
+    ok = view.to_json() == tier1
+    print(f"{json_path}: {os.path.getsize(json_path):,} bytes, parsed in {json_secs * 1000:.1f} ms")
+    print(f"{bin_path}: {os.path.getsize(bin_path):,} bytes, opened in {bin_secs * 1000:.2f} ms")
+    print(f"Round-trip: {'OK' if ok else 'MISMATCH'}")
+    if not ok:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
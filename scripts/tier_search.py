@@ -0,0 +1,406 @@
+"""
+Query engine over tier-1 delta-PCA codes.
+
+Loads tier1-index.bin (or tier1-index.json) into a contiguous (N x 32) int16
+matrix and projects a 200D query through delta-basis.json into the same
+coefficient space. Scoring converts SCORE_BLOCK rows of codes to float32 at
+a time, so the index keeps 68 bytes per spore resident (64 of codes, 4 of
+norm) instead of 1600 (200 float64 amplitudes).
+Similarity is cosine between deltas (amplitudes - barycenter), approximated
+by cosine between truncated coefficient vectors.
+
+Candidates can optionally be re-ranked exactly: with full amplitudes (from a
+packed store or the JSON loader), or with per-spore delta_tier3 codes for
+spores whose basis_hash matches the current basis. ProgressiveIndex instead
+refines tier-1 survivors with the tier2/tier3-index.bin codes, which share
+the current basis.
+
+Usage: python scripts/tier_search.py --eval [--store DIR | --spores DIR]
+                                     [--k 20] [--candidates 50 200 1000]
+"""
+
+import argparse
+import json
+import os
+import time
+
+import numpy as np
+
+import quantize
+import tier1_binary
+
+DATA_DIR = "docs/data"
+EVAL_QUERIES = 500
+EVAL_K = 20
+EVAL_CANDIDATES = (50, 200, 1000)
+SURVIVORS = (1000, 200)  # spores kept after the tier-1 and tier-2 stages
+QUERY_BLOCK = 64         # queries per gather in the refinement stages
+SCORE_BLOCK = 65536      # tier-1 rows converted to float32 per scoring step
+
+
+def _unit_rows(X):
+    return X / np.maximum(np.linalg.norm(X, axis=-1, keepdims=True), 1e-12)
+
+
+class Tier1Index:
+    """Tier-1 codes as one int16 matrix plus the basis needed to query them."""
+
+    def __init__(self, ids, codes, barycenter, eigenvectors, basis_hash, scales=None):
+        self.ids = ids
+        self.row_of = {sid: i for i, sid in enumerate(ids)}
+        self.codes = codes                              # (N, m) int16
+        self.barycenter = barycenter                    # (200,)
+        self.eigenvectors = eigenvectors                # (m, 200)
+        self.basis_hash = basis_hash
+        self.scales = (np.full(codes.shape[1], float(quantize.QUANT_SCALE))
+                       if scales is None else np.asarray(scales))
+        # Norms of the dequantized codes; the codes themselves stay int16
+        self.norms = np.empty(len(codes), dtype=np.float32)
+        for lo in range(0, len(codes), SCORE_BLOCK):
+            block = quantize.dequantize(codes[lo:lo + SCORE_BLOCK], self.scales)
+            self.norms[lo:lo + SCORE_BLOCK] = np.linalg.norm(block, axis=1)
+
+    @classmethod
+    def load(cls, data_dir=DATA_DIR):
+        """
+        Load the tier-1 codes + delta-basis.json from data_dir. The binary
+        sidecar (tier1-index.bin) is memory-mapped when present; otherwise
+        tier1-index.json is parsed.
+        """
+        with open(os.path.join(data_dir, "delta-basis.json")) as f:
+            basis = json.load(f)
+        bin_path = os.path.join(data_dir, "tier1-index.bin")
+        if os.path.exists(bin_path):
+            view = tier1_binary.Tier1Binary.open(bin_path)
+            basis_hash, ids, codes = view.basis_hash, view.ids, view.codes
+        else:
+            with open(os.path.join(data_dir, "tier1-index.json")) as f:
+                tier1 = json.load(f)
+            basis_hash, ids = tier1["basis_hash"], [e["id"] for e in tier1["spores"]]
+            codes = np.array([e["c"] for e in tier1["spores"]],
+                             dtype=np.int16).reshape(-1, tier1["modes"])
+        if basis_hash != basis["basis_hash"]:
+            raise ValueError(f"tier1-index basis {basis_hash} != "
+                             f"delta-basis {basis['basis_hash']}")
+        m = codes.shape[1]
+        return cls(ids, codes, np.array(basis["barycenter"]), np.array(basis["eigenvectors"][:m]),
+                   basis["basis_hash"], quantize.basis_scales(basis, m))
+
+    def __len__(self):
+        return len(self.ids)
+
+    @property
+    def modes(self):
+        return self.codes.shape[1]
+
+    @property
+    def uniform_scale(self):
+        return bool(np.all(self.scales == self.scales[0]))
+
+    def project(self, queries, directions=False):
+        """
+        Project 200D queries (Q x 200 or 200) into tier-1 coefficient space.
+        Amplitude vectors have the barycenter removed first; pass
+        directions=True for vectors already in delta space (e.g. lens vectors).
+        """
+        Q = np.atleast_2d(np.asarray(queries, dtype=np.float64))
+        if not directions:
+            Q = Q - self.barycenter
+        return Q @ self.eigenvectors.T
+
+    def score(self, queries, directions=False, integer=False):
+        """
+        Approximate cosine of every spore to each query: (Q x N).
+
+        Default path: float32 matmul against blocks of the codes. With
+        integer=True the query is quantized to int16 like the index and the
+        dot products are accumulated exactly in int64; this needs one scale
+        for every mode (the "global" scheme).
+        """
+        qc = self.project(queries, directions)
+        if integer:
+            if not self.uniform_scale:
+                raise ValueError("integer scoring needs uniform (global) quantization scales")
+            qq = np.clip(np.round(qc * self.scales[0]), -32768, 32767).astype(np.int64)
+            scores = np.empty((len(qq), len(self)))
+            for lo in range(0, len(self), SCORE_BLOCK):
+                hi = lo + SCORE_BLOCK
+                dots = qq @ self.codes[lo:hi].astype(np.int64).T
+                norms = self.norms[lo:hi].astype(np.float64) * self.scales[0]
+                scores[:, lo:hi] = dots / np.maximum(norms, 1e-12)
+            return scores / np.maximum(np.linalg.norm(qq, axis=1, keepdims=True), 1e-12)
+        return self.cosines(_unit_rows(qc.astype(np.float32)))
+
+    def cosines(self, unit_queries):
+        """
+        Cosine of every spore to unit-length coefficient queries (Q x m):
+        codes . (q / scales) / |dequantized codes|, SCORE_BLOCK rows at a time.
+        """
+        q = (unit_queries / self.scales).astype(np.float32)
+        scores = np.empty((len(q), len(self)), dtype=np.float32)
+        for lo in range(0, len(self), SCORE_BLOCK):
+            hi = lo + SCORE_BLOCK
+            block = self.codes[lo:hi].astype(np.float32)
+            scores[:, lo:hi] = (q @ block.T) / np.maximum(self.norms[lo:hi], 1e-12)
+        return scores
+
+    def search(self, queries, k=EVAL_K, directions=False, integer=False,
+               candidates=None, rerank=None, allowed=None):
+        """
+        Top-k search. Returns (scores [Q x k], rows [Q x k]) best-first.
+
+        allowed is an optional boolean row mask (e.g. a tag filter from
+        tags.TagIndex.mask(bitmap, index.ids)); other spores are never
+        returned. At most allowed.sum() results are returned.
+
+        With candidates and rerank set, the best `candidates` spores by
+        tier-1 score are re-scored by rerank(queries_delta, rows) -> scores,
+        e.g. amplitude_reranker() or tier3_reranker().
+        """
+        scores = self.score(queries, directions, integer)
+        n = len(self)
+        if allowed is not None:
+            scores = np.where(allowed, scores, -np.inf)
+            n = int(np.count_nonzero(allowed))
+            if n == 0:
+                empty = np.zeros((len(scores), 0))
+                return empty, empty.astype(np.int64)
+        pool = min(candidates or k, n)
+        top = np.argpartition(-scores, pool - 1, axis=1)[:, :pool]
+        if rerank is not None:
+            Q = np.atleast_2d(np.asarray(queries, dtype=np.float64))
+            deltas = Q if directions else Q - self.barycenter
+            cand_scores = np.stack([rerank(deltas[i], top[i]) for i in range(len(top))])
+        else:
+            cand_scores = np.take_along_axis(scores, top, axis=1)
+        kk = min(k, pool)
+        best = np.argsort(-cand_scores, axis=1)[:, :kk]
+        return np.take_along_axis(cand_scores, best, axis=1), np.take_along_axis(top, best, axis=1)
+
+
+class ProgressiveIndex:
+    """
+    Coarse-to-fine search over the tier-1/2/3 codes of one basis: tier-1
+    scores every spore, tier-2 (100 modes) re-scores the tier-1 survivors,
+    tier-3 (130 modes) re-scores the tier-2 survivors and picks the top k.
+    """
+
+    def __init__(self, tier1, tier2_codes, tier3_codes, eigenvectors, scales):
+        self.tier1 = tier1
+        self.stages = [("tier1", tier1.codes), ("tier2", tier2_codes), ("tier3", tier3_codes)]
+        self.scales = np.asarray(scales)                # (tier3 modes,)
+        self.norms = {name: np.linalg.norm(quantize.dequantize(codes, self.scales[:codes.shape[1]]),
+                                           axis=1)
+                      for name, codes in self.stages}
+        self.eigenvectors = eigenvectors                # (tier3 modes, 200)
+
+    @staticmethod
+    def _score_rows(codes, norms, rows, q):
+        """Cosine of q[i] to codes[rows[i]], gathered in blocks of queries."""
+        scores = np.empty(rows.shape, dtype=np.float32)
+        for i in range(0, len(rows), QUERY_BLOCK):
+            r = rows[i:i + QUERY_BLOCK]
+            cand = codes[r].astype(np.float32)                       # (b, s, m)
+            scores[i:i + QUERY_BLOCK] = (np.matmul(cand, q[i:i + QUERY_BLOCK, :, None])[..., 0]
+                                         / np.maximum(norms[r], 1e-12))
+        return scores
+
+    @classmethod
+    def load(cls, data_dir=DATA_DIR):
+        """Load tier1 (via Tier1Index.load) plus tier2/tier3-index.bin from data_dir."""
+        tier1 = Tier1Index.load(data_dir)
+        codes = {}
+        for tier in ("tier2", "tier3"):
+            view = tier1_binary.Tier1Binary.open(os.path.join(data_dir, f"{tier}-index.bin"))
+            if view.basis_hash != tier1.basis_hash:
+                raise ValueError(f"{tier}-index basis {view.basis_hash} != {tier1.basis_hash}")
+            if view.ids != tier1.ids:
+                raise ValueError(f"{tier}-index spores do not match tier1-index")
+            codes[tier] = view.codes
+        with open(os.path.join(data_dir, "delta-basis.json")) as f:
+            basis = json.load(f)
+        m = codes["tier3"].shape[1]
+        return cls(tier1, codes["tier2"], codes["tier3"], np.array(basis["eigenvectors"][:m]),
+                   quantize.basis_scales(basis, m))
+
+    def __len__(self):
+        return len(self.tier1)
+
+    def search(self, queries, k=EVAL_K, survivors=SURVIVORS, directions=False):
+        """
+        Returns (scores [Q x k], rows [Q x k], stats). stats has one dict per
+        stage: spores scored, spores kept, fraction pruned, multiply-adds per
+        query and seconds, plus the multiply-adds of an exact 200D scan.
+        """
+        Q = np.atleast_2d(np.asarray(queries, dtype=np.float64))
+        deltas = Q if directions else Q - self.tier1.barycenter
+        qc = (deltas @ self.eigenvectors.T).astype(np.float32)
+        n = len(self)
+        keeps = [min(s, n) for s in survivors] + [min(k, n)]
+
+        rows = np.broadcast_to(np.arange(n), (len(Q), n))
+        stats = []
+        for (name, codes), keep in zip(self.stages, keeps):
+            t0 = time.perf_counter()
+            m = codes.shape[1]
+            q = qc[:, :m] / np.maximum(np.linalg.norm(qc[:, :m], axis=1, keepdims=True), 1e-12)
+            if len(stats) == 0:
+                scores = self.tier1.cosines(q)
+            else:
+                # codes / scales . q == codes . (q / scales)
+                scores = self._score_rows(codes, self.norms[name], rows,
+                                           (q / self.scales[:m]).astype(np.float32))
+            scored = rows.shape[1]
+            top = np.argpartition(-scores, keep - 1, axis=1)[:, :keep]
+            scores = np.take_along_axis(scores, top, axis=1)
+            rows = np.take_along_axis(rows, top, axis=1)
+            stats.append({"stage": name, "modes": m, "scored": scored, "kept": keep,
+                          "pruned": 1 - keep / scored, "mults_per_query": scored * m,
+                          "seconds": time.perf_counter() - t0})
+        stats.append({"stage": "exact", "modes": deltas.shape[1], "scored": n,
+                      "mults_per_query": n * deltas.shape[1]})
+
+        best = np.argsort(-scores, axis=1)
+        return np.take_along_axis(scores, best, axis=1), np.take_along_axis(rows, best, axis=1), stats
+
+
+def _align(index, ids):
+    """Rows of `ids` in index order; every indexed spore must be present."""
+    row_of = {sid: i for i, sid in enumerate(ids)}
+    missing = [sid for sid in index.ids if sid not in row_of]
+    if missing:
+        raise ValueError(f"{len(missing)} indexed spores have no source row "
+                         f"(e.g. {missing[0]}); regenerate the indexes")
+    return np.array([row_of[sid] for sid in index.ids])
+
+
+def amplitude_reranker(index, ids, amplitudes):
+    """Exact 200D delta-cosine reranker; amplitudes rows are aligned with ids."""
+    order = _align(index, ids)
+    unit_deltas = _unit_rows(np.asarray(amplitudes, dtype=np.float64)[order] - index.barycenter)
+
+    def rerank(delta, rows):
+        return unit_deltas[rows] @ (delta / max(np.linalg.norm(delta), 1e-12))
+    return rerank
+
+
+def tier3_reranker(index, ids, delta_tier3, basis_hashes, eigenvectors):
+    """
+    Reranker over per-spore delta_tier3 codes. Only spores whose basis_hash
+    equals the index basis have comparable codes; the rest keep -inf so
+    they sink below the reranked candidates.
+    """
+    order = _align(index, ids)
+    codes = np.asarray(delta_tier3, dtype=np.float64)[order]
+    valid = np.array([basis_hashes[i] == index.basis_hash for i in order])
+    unit_codes = _unit_rows(codes)
+    evecs = np.asarray(eigenvectors)[:codes.shape[1]]
+
+    def rerank(delta, rows):
+        qc = evecs @ delta
+        s = unit_codes[rows] @ (qc / max(np.linalg.norm(qc), 1e-12))
+        return np.where(valid[rows], s, -np.inf)
+    return rerank
+
+
+# ── Evaluation ───────────────────────────────────────────────────────────────
+
+def exact_search(index, ids, amplitudes, queries, k=EVAL_K):
+    """Exact top-k by full 200D delta cosine, in index row order."""
+    rerank = amplitude_reranker(index, ids, amplitudes)
+    Q = np.atleast_2d(queries) - index.barycenter
+    all_rows = np.arange(len(index))
+    scores = np.stack([rerank(q, all_rows) for q in Q])
+    top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+    return top
+
+
+def recall(found, truth):
+    return float(np.mean([len(np.intersect1d(f, t)) / len(t) for f, t in zip(found, truth)]))
+
+
+def evaluate(index, ids, amplitudes, k=EVAL_K, candidates=EVAL_CANDIDATES, progressive=None,
+             seed=1):
+    """
+    recall@k of tier-1 search (float and integer scoring, with and without
+    exact reranking of the top candidates) and, if given, of a
+    ProgressiveIndex against the exact 200D search. Queries are spore
+    amplitudes with small noise added.
+    """
+    rng = np.random.default_rng(seed)
+    amps = np.asarray(amplitudes, dtype=np.float64)
+    base = amps[rng.integers(len(amps), size=EVAL_QUERIES)]
+    queries = base + 0.02 * rng.standard_normal(base.shape)
+    truth = exact_search(index, ids, amps, queries, k)
+    rerank = amplitude_reranker(index, ids, amps)
+
+    results = []
+    modes = [("tier1 float32", {})]
+    if index.uniform_scale:
+        modes.append(("tier1 int16", {"integer": True}))
+    for label, kwargs in modes:
+        t0 = time.perf_counter()
+        _, rows = index.search(queries, k, **kwargs)
+        results.append({"mode": label, "recall": recall(rows, truth),
+                        "qps": len(queries) / (time.perf_counter() - t0)})
+    for c in candidates:
+        t0 = time.perf_counter()
+        _, rows = index.search(queries, k, candidates=c, rerank=rerank)
+        results.append({"mode": f"tier1 + rerank@{c}", "recall": recall(rows, truth),
+                        "qps": len(queries) / (time.perf_counter() - t0)})
+    if progressive is not None:
+        t0 = time.perf_counter()
+        _, rows, stats = progressive.search(queries, k)
+        results.append({"mode": "progressive 1>2>3", "recall": recall(rows, truth),
+                        "qps": len(queries) / (time.perf_counter() - t0), "stages": stats})
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tier-1 coefficient search")
+    parser.add_argument("--data", default=DATA_DIR, help="Directory with tier1-index/delta-basis")
+    parser.add_argument("--store", default=None, help="Packed spore store for exact amplitudes")
+    parser.add_argument("--spores", default="wave-spores")
+    parser.add_argument("--eval", action="store_true", help="Report recall vs exact 200D search")
+    parser.add_argument("--k", type=int, default=EVAL_K)
+    parser.add_argument("--candidates", type=int, nargs="+", default=list(EVAL_CANDIDATES),
+                        help="Tier-1 candidate pool sizes to re-rank exactly")
+    args = parser.parse_args()
+
+    index = Tier1Index.load(args.data)
+    print(f"Tier-1 index: {len(index)} spores x {index.modes} int16 modes "
+          f"({index.codes.nbytes:,} bytes, basis {index.basis_hash})")
+    if not args.eval:
+        return
+
+    if args.store:
+        from spore_store import SporeStore
+        store = SporeStore(args.store)
+        ids, amps = store.ids, store.amplitudes
+    else:
+        import spore_loader
+        loaded = spore_loader.load_spore_dir(args.spores)
+        loaded.report()
+        ids = [s["id"] for s in loaded.spores]
+        amps = np.array([s["amplitudes"] for s in loaded.spores])
+    print(f"  Exact working set: {np.asarray(amps).nbytes:,} bytes "
+          f"({np.asarray(amps).nbytes / index.codes.nbytes:.0f}x the tier-1 codes)")
+
+    progressive = None
+    if os.path.exists(os.path.join(args.data, "tier3-index.bin")):
+        progressive = ProgressiveIndex.load(args.data)
+
+    print(f"\n  recall@{args.k} vs exact 200D search ({EVAL_QUERIES} queries):")
+    for r in evaluate(index, ids, amps, args.k, args.candidates, progressive):
+        print(f"    {r['mode']:<22} recall={r['recall']:.3f}  {r['qps']:8.0f} q/s")
+        for st in r.get("stages", []):
+            if st["stage"] == "exact":
+                print(f"      (exact 200D scan: {st['mults_per_query']:,} mult-adds/query)")
+                continue
+            print(f"      {st['stage']}: scored {st['scored']:>6} x {st['modes']:3d} modes, "
+                  f"kept {st['kept']:>5} ({st['pruned'] * 100:5.1f}% pruned), "
+                  f"{st['mults_per_query']:,} mult-adds/query, {st['seconds'] * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    main()